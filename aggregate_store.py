@@ -0,0 +1,136 @@
+"""
+Persistent Aggregate Store
+==========================
+
+On-disk store for computed aggregates (staff, salary mass, allowances).
+
+Each entry is a set of tables saved as parquet files under one key
+(dataset fingerprint + code version + result name). Entries are reloaded
+in milliseconds when the data files are unchanged. The store has a size
+cap: the least recently used entries are evicted first.
+"""
+
+import json
+import shutil
+import time
+from pathlib import Path
+
+import pandas as pd
+
+
+class AggregateStore:
+    """Columnar (parquet) store of aggregate tables with LRU eviction."""
+
+    INDEX_FILE = 'index.json'
+
+    def __init__(self, directory, max_bytes=256 * 1024 ** 2):
+        """
+        Args:
+            directory (str or Path): Directory holding the store
+            max_bytes (int): Size cap of the store in bytes
+        """
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+
+    def get(self, key):
+        """
+        Load the tables stored under a key.
+
+        Args:
+            key (str): Entry key
+
+        Returns:
+            dict: Table name -> DataFrame, or None if the key is not stored
+        """
+        index = self._read_index()
+        entry = index.get(key)
+        if entry is None:
+            return None
+
+        entry_dir = self.directory / key
+        try:
+            tables = {name: pd.read_parquet(entry_dir / f"{name}.parquet")
+                      for name in entry['tables']}
+        except Exception as e:
+            print(f"Warning: Could not read cached aggregates '{key}': {e}")
+            self.remove(key)
+            return None
+
+        entry['last_access'] = time.time()
+        self._write_index(index)
+        return tables
+
+    def put(self, key, tables):
+        """
+        Store tables under a key, then evict old entries above the size cap.
+
+        Args:
+            key (str): Entry key
+            tables (dict): Table name -> DataFrame
+        """
+        entry_dir = self.directory / key
+        try:
+            entry_dir.mkdir(parents=True, exist_ok=True)
+            size = 0
+            for name, table in tables.items():
+                file_path = entry_dir / f"{name}.parquet"
+                table.to_parquet(file_path, index=False)
+                size += file_path.stat().st_size
+        except Exception as e:
+            print(f"Warning: Could not store aggregates '{key}': {e}")
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            return
+
+        index = self._read_index()
+        index[key] = {
+            'tables': list(tables),
+            'size': size,
+            'last_access': time.time()
+        }
+        self._evict(index)
+        self._write_index(index)
+
+    def remove(self, key):
+        """Delete one entry."""
+        index = self._read_index()
+        index.pop(key, None)
+        shutil.rmtree(self.directory / key, ignore_errors=True)
+        self._write_index(index)
+
+    def clear(self):
+        """Delete every entry of the store."""
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def total_size(self):
+        """Size of the stored tables in bytes."""
+        return sum(entry['size'] for entry in self._read_index().values())
+
+    def _evict(self, index):
+        """Remove least recently used entries until the store fits its cap."""
+        total = sum(entry['size'] for entry in index.values())
+        for key in sorted(index, key=lambda k: index[k]['last_access']):
+            if total <= self.max_bytes:
+                break
+            total -= index[key]['size']
+            del index[key]
+            shutil.rmtree(self.directory / key, ignore_errors=True)
+
+    def _read_index(self):
+        """Read the entry index (empty if missing or unreadable)."""
+        index_path = self.directory / self.INDEX_FILE
+        if not index_path.exists():
+            return {}
+        try:
+            with open(index_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception:
+            return {}
+
+    def _write_index(self, index):
+        """Write the entry index atomically."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        index_path = self.directory / self.INDEX_FILE
+        tmp_path = index_path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(index, f)
+        tmp_path.replace(index_path)
@@ -38,6 +38,12 @@ class AllowanceReportGenerator:
         """
         self.analyzer = analyzer
         
+        # Memoize the reports in the analyzer result graph
+        self.analyzer.results.add_node('allowance_amount_report', self._build_allowance_amount_report,
+                                       depends_on=['allowances'])
+        self.analyzer.results.add_node('allowance_count_report', self._build_allowance_count_report,
+                                       depends_on=['allowances'])
+        
     def generate_allowance_amount_report(self):
         """
         Generate allowance amount evolution report by Department/Corps/Grade.
@@ -45,82 +51,45 @@ class AllowanceReportGenerator:
         Returns:
             dict: Structured report with allowance amounts
         """
+        return self.analyzer.results.get('allowance_amount_report')
+    
+    def _build_allowance_amount_report(self):
+        """Compute the allowance amount report (memoized by the result graph)."""
         print("Generating allowance amount evolution report...")
         
-        # Ensure data is loaded and analyzed
-        if self.analyzer.merged_data is None:
-            self.analyzer.merge_data_with_nomenclature()
-        
-        if self.analyzer.allowance_analysis is None:
-            self.analyzer.analyze_allowances()
-        
-        # Get unique allowance types/codes
-        allowance_types = self.analyzer.merged_data['Codind'].unique()
-        allowance_types = [code for code in allowance_types if pd.notna(code)]
+        # Ensure allowances are analyzed (pre-aggregated by ministry/corps/grade/code)
+        by_code = self.analyzer.analyze_allowances()['by_code']
         
         # Structure: Department -> Corps -> Grade -> Allowance -> Year -> Amount
         report = {}
         
-        # Process data by ministry/department
-        for ministry in self.analyzer.merged_data['Ministry'].unique():
-            if pd.notna(ministry):
-                ministry_data = self.analyzer.merged_data[
-                    self.analyzer.merged_data['Ministry'] == ministry
-                ]
-                
-                report[ministry] = {}
-                
-                # Process by corps
-                for corps in ministry_data['Corps_Name_FR'].unique():
-                    if pd.notna(corps):
-                        corps_data = ministry_data[
-                            ministry_data['Corps_Name_FR'] == corps
-                        ]
-                        
-                        report[ministry][corps] = {}
-                        
-                        # Process by grade
-                        for grade in corps_data['Grade_Name_FR'].unique():
-                            if pd.notna(grade):
-                                grade_data = corps_data[
-                                    corps_data['Grade_Name_FR'] == grade
-                                ]
-                                
-                                report[ministry][corps][grade] = {}
-                                
-                                # Process each allowance type
-                                for allowance_code in allowance_types:
-                                    allowance_data = grade_data[
-                                        grade_data['Codind'] == allowance_code
-                                    ]
-                                    
-                                    if len(allowance_data) > 0:
-                                        # Calculate historical amounts by year
-                                        yearly_amounts = allowance_data.groupby('Annee')['Montind'].sum()
-                                        
-                                        # Create year series (2013-2030)
-                                        years = list(range(2013, 2031))
-                                        amounts = {}
-                                        
-                                        # Fill historical data (2013-2023)
-                                        for year in range(2013, 2024):
-                                            amounts[year] = yearly_amounts.get(year, 0)
-                                        
-                                        # Predict future amounts (2025-2030)
-                                        if len(yearly_amounts) >= 3:  # Need enough data for prediction
-                                            predictions = self._predict_allowance_amounts(yearly_amounts)
-                                            for year in range(2025, 2031):
-                                                amounts[year] = predictions.get(year, 0)
-                                        else:
-                                            # Use last known amount as prediction if insufficient data
-                                            last_amount = yearly_amounts.iloc[-1] if len(yearly_amounts) > 0 else 0
-                                            for year in range(2025, 2031):
-                                                amounts[year] = last_amount
-                                        
-                                        # Skip 2024 (transition year)
-                                        amounts[2024] = 0
-                                        
-                                        report[ministry][corps][grade][f"Allowance_{allowance_code}"] = amounts
+        for (ministry, corps, grade, allowance_code), allowance_data in by_code.groupby(
+                ['Ministry', 'Corps', 'Grade', 'Codind']):
+            grade_report = report.setdefault(ministry, {}).setdefault(corps, {}).setdefault(grade, {})
+            
+            # Historical amounts by year
+            yearly_amounts = allowance_data.set_index('Year')['Total_Amount'].sort_index()
+            amounts = {}
+            
+            # Fill historical data (2013-2023)
+            for year in range(2013, 2024):
+                amounts[year] = yearly_amounts.get(year, 0)
+            
+            # Predict future amounts (2025-2030)
+            if len(yearly_amounts) >= 3:  # Need enough data for prediction
+                predictions = self._predict_allowance_amounts(yearly_amounts)
+                for year in range(2025, 2031):
+                    amounts[year] = predictions.get(year, 0)
+            else:
+                # Use last known amount as prediction if insufficient data
+                last_amount = yearly_amounts.iloc[-1] if len(yearly_amounts) > 0 else 0
+                for year in range(2025, 2031):
+                    amounts[year] = last_amount
+            
+            # Skip 2024 (transition year)
+            amounts[2024] = 0
+            
+            grade_report[f"Allowance_{allowance_code}"] = amounts
         
         return report
     
@@ -131,61 +100,43 @@ class AllowanceReportGenerator:
         Returns:
             dict: Structured report with allowance counts
         """
+        return self.analyzer.results.get('allowance_count_report')
+    
+    def _build_allowance_count_report(self):
+        """Compute the allowance count report (memoized by the result graph)."""
         print("Generating allowance count evolution report...")
         
+        detailed = self.analyzer.analyze_allowances()['detailed']
+        
         # Structure: Department -> Corps -> Grade -> Year -> Count
         report = {}
         
-        # Process data by ministry/department
-        for ministry in self.analyzer.merged_data['Ministry'].unique():
-            if pd.notna(ministry):
-                ministry_data = self.analyzer.merged_data[
-                    self.analyzer.merged_data['Ministry'] == ministry
-                ]
-                
-                report[ministry] = {}
-                
-                # Process by corps
-                for corps in ministry_data['Corps_Name_FR'].unique():
-                    if pd.notna(corps):
-                        corps_data = ministry_data[
-                            ministry_data['Corps_Name_FR'] == corps
-                        ]
-                        
-                        report[ministry][corps] = {}
-                        
-                        # Process by grade
-                        for grade in corps_data['Grade_Name_FR'].unique():
-                            if pd.notna(grade):
-                                grade_data = corps_data[
-                                    corps_data['Grade_Name_FR'] == grade
-                                ]
-                                
-                                # Count allowances by year
-                                yearly_counts = grade_data.groupby('Annee').size()
-                                
-                                # Create year series (2013-2030)
-                                counts = {}
-                                
-                                # Fill historical data (2013-2023)
-                                for year in range(2013, 2024):
-                                    counts[year] = yearly_counts.get(year, 0)
-                                
-                                # Predict future counts (2025-2030)
-                                if len(yearly_counts) >= 3:
-                                    predictions = self._predict_allowance_counts(yearly_counts)
-                                    for year in range(2025, 2031):
-                                        counts[year] = predictions.get(year, 0)
-                                else:
-                                    # Use last known count as prediction
-                                    last_count = yearly_counts.iloc[-1] if len(yearly_counts) > 0 else 0
-                                    for year in range(2025, 2031):
-                                        counts[year] = last_count
-                                
-                                # Skip 2024
-                                counts[2024] = 0
-                                
-                                report[ministry][corps][grade] = counts
+        for (ministry, corps, grade), grade_data in detailed.groupby(['Ministry', 'Corps', 'Grade']):
+            # Count allowances by year
+            yearly_counts = grade_data.set_index('Year')['Count'].sort_index()
+            
+            # Create year series (2013-2030)
+            counts = {}
+            
+            # Fill historical data (2013-2023)
+            for year in range(2013, 2024):
+                counts[year] = yearly_counts.get(year, 0)
+            
+            # Predict future counts (2025-2030)
+            if len(yearly_counts) >= 3:
+                predictions = self._predict_allowance_counts(yearly_counts)
+                for year in range(2025, 2031):
+                    counts[year] = predictions.get(year, 0)
+            else:
+                # Use last known count as prediction
+                last_count = yearly_counts.iloc[-1] if len(yearly_counts) > 0 else 0
+                for year in range(2025, 2031):
+                    counts[year] = last_count
+            
+            # Skip 2024
+            counts[2024] = 0
+            
+            report.setdefault(ministry, {}).setdefault(corps, {})[grade] = counts
         
         return report
     
@@ -386,15 +337,12 @@ def main():
         print("🔄 Initializing SalaryAnalyzer...")
         analyzer = SalaryAnalyzer(data_directory=".", encoding='utf-8')
         
-        # Load data
+        # Load data (or reuse the aggregates of a previous run)
         print("🔄 Loading and processing data...")
-        if not analyzer.load_and_clean_data():
+        if not analyzer.load_or_restore():
             print("❌ Failed to load data!")
             return
         
-        # Merge with nomenclature
-        analyzer.merge_data_with_nomenclature()
-        
         # Analyze allowances
         analyzer.analyze_allowances()
         
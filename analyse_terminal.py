@@ -16,6 +16,8 @@ import os
 import warnings
 warnings.filterwarnings('ignore')
 
+from growth_metrics import growth_metrics
+
 # Configuration pour les graphiques en français
 plt.rcParams['font.size'] = 10
 plt.rcParams['figure.figsize'] = (12, 8)
@@ -140,8 +142,10 @@ def analyze_temporal_trends(df):
         print(yearly.round(2))
         
         # Calcul des taux de croissance
-        yearly['Croissance_Salaire_%'] = yearly['SALAIRE_TOTAL'].pct_change() * 100
-        yearly['Croissance_Agents_%'] = yearly['NOMBRE_AGENTS'].pct_change() * 100
+        salary_growth = growth_metrics(yearly, [], 'SALAIRE_TOTAL', year_column='ANNEE')
+        agents_growth = growth_metrics(yearly, [], 'NOMBRE_AGENTS', year_column='ANNEE')
+        yearly['Croissance_Salaire_%'] = salary_growth['yoy_growth'].iloc[0].reindex(yearly['ANNEE']).to_numpy()
+        yearly['Croissance_Agents_%'] = agents_growth['yoy_growth'].iloc[0].reindex(yearly['ANNEE']).to_numpy()
         
         print_section("TAUX DE CROISSANCE ANNUELS")
         growth_summary = yearly[['ANNEE', 'Croissance_Salaire_%', 'Croissance_Agents_%']].dropna()
@@ -149,8 +153,8 @@ def analyze_temporal_trends(df):
         
         # Statistiques clés
         print_section("STATISTIQUES CLÉS DE LA PÉRIODE")
-        total_growth_salary = ((yearly['SALAIRE_TOTAL'].iloc[-1] / yearly['SALAIRE_TOTAL'].iloc[0]) - 1) * 100
-        total_growth_agents = ((yearly['NOMBRE_AGENTS'].iloc[-1] / yearly['NOMBRE_AGENTS'].iloc[0]) - 1) * 100
+        total_growth_salary = salary_growth['summary']['Total_Growth'].iloc[0]
+        total_growth_agents = agents_growth['summary']['Total_Growth'].iloc[0]
         avg_salary_2023 = yearly['SALAIRE_MOYEN'].iloc[-1]
         avg_salary_2013 = yearly['SALAIRE_MOYEN'].iloc[0]
         
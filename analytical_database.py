@@ -0,0 +1,275 @@
+"""
+Embedded Analytical Database
+============================
+
+Build step and query backend storing the cleaned payroll lines and the
+nomenclature tables in a local SQLite database file.
+
+- build_database() streams the payroll file chunk by chunk (the whole file
+  is never held in memory), applies the SalaryAnalyzer cleaning rules and
+  indexes (Annee, Codgrd, Codcorps, Codind, Codetab, Id_agent).
+- SQLiteBackend answers the calculate_* aggregations in SQL, so several
+  processes can query the same file at once without loading the data.
+
+Usage:
+    python analytical_database.py            # build cache/payroll.sqlite
+    analyzer.use_database('cache/payroll.sqlite')
+"""
+
+import sqlite3
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.append(str(Path(__file__).parent))
+from salary_analyzer import SalaryAnalyzer, MAIN_COLUMNS
+
+DEFAULT_DATABASE = Path('cache') / 'payroll.sqlite'
+
+# Nomenclature tables copied to the database (analyzer table -> SQL table)
+NOMENCLATURE_TABLES = {
+    'grade': 'grade',
+    'corps': 'corps',
+    'establishment': 'establishment'
+}
+
+
+def build_database(analyzer, db_path=None, chunk_size=200000):
+    """
+    Load the payroll and nomenclature tables into a SQLite database file.
+
+    Args:
+        analyzer (SalaryAnalyzer): Analyzer providing the data files and cleaning rules
+        db_path (str or Path): Database file (default: <data_dir>/cache/payroll.sqlite)
+        chunk_size (int): Number of payroll lines read and inserted at once
+
+    Returns:
+        Path: Path of the database file
+    """
+    db_path = Path(db_path) if db_path is not None else analyzer.data_dir / DEFAULT_DATABASE
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = db_path.with_suffix('.building')
+    if tmp_path.exists():
+        tmp_path.unlink()
+
+    main_file = analyzer.data_dir / analyzer.data_files['main']
+    if not main_file.exists():
+        raise FileNotFoundError(f"Main data file {main_file} not found")
+
+    print(f"Building analytical database: {db_path}")
+    connection = sqlite3.connect(tmp_path)
+    try:
+        connection.execute("PRAGMA journal_mode = OFF")
+        connection.execute("PRAGMA synchronous = OFF")
+
+        # Nomenclature tables (validity periods of effective-dated tables as
+        # ISO dates, compared with the pay date of the lines)
+        analyzer._load_nomenclature_tables()
+        analyzer._prepare_nomenclature_tables()
+        for table_name, sql_table in NOMENCLATURE_TABLES.items():
+            if table_name in analyzer.nomenclature_tables:
+                table = analyzer.nomenclature_tables[table_name].copy()
+                for column in ['Valid_From', 'Valid_To']:
+                    if column in table.columns:
+                        table[column] = table[column].dt.strftime('%Y-%m-%d')
+                table.to_sql(sql_table, connection, index=False, if_exists='replace')
+
+        # Payroll lines, cleaned chunk by chunk
+        total = 0
+        for chunk in pd.read_csv(main_file, sep=';', encoding=analyzer.encoding,
+                                 names=MAIN_COLUMNS, chunksize=chunk_size):
+            chunk = analyzer._clean_payroll_frame(chunk).drop(columns=['Date'])
+            chunk.to_sql('payroll', connection, index=False, if_exists='append')
+            total += len(chunk)
+            print(f"  {total:,} payroll lines loaded...")
+
+        print("Creating indexes...")
+        connection.execute(
+            "CREATE INDEX idx_payroll_dims ON payroll "
+            "(Annee, Codgrd, Codcorps, Codind, Codetab, Id_agent)"
+        )
+        connection.execute("CREATE INDEX idx_payroll_agent ON payroll (Annee, Id_agent)")
+        for sql_table, key in [('grade', 'Codgrd'), ('corps', 'Codcorps'), ('establishment', 'Codetab')]:
+            try:
+                connection.execute(f"CREATE INDEX idx_{sql_table}_key ON {sql_table} ({key})")
+            except sqlite3.OperationalError:
+                print(f"Warning: Table {sql_table} not available, index skipped")
+        connection.execute("ANALYZE")
+        connection.commit()
+    finally:
+        connection.close()
+
+    tmp_path.replace(db_path)
+    print(f"Analytical database built: {total:,} payroll lines")
+    return db_path
+
+
+class SQLiteBackend:
+    """Run the SalaryAnalyzer aggregations as SQL on a database built by build_database()."""
+
+    def __init__(self, db_path):
+        """
+        Args:
+            db_path (str or Path): Database file built by build_database()
+        """
+        self.db_path = Path(db_path)
+        if not self.db_path.exists():
+            raise FileNotFoundError(f"Analytical database {self.db_path} not found")
+
+        # Effective-dated tables are joined on the period valid at the pay date
+        self._dated = set()
+        for sql_table in ['grade', 'corps']:
+            columns = self.read_sql(f"PRAGMA table_info({sql_table})")['name']
+            if 'Valid_From' in set(columns):
+                self._dated.add(sql_table)
+
+    def nomenclature_join(self, sql_table, alias, key):
+        """
+        JOIN clause of a nomenclature table on the payroll lines (alias p).
+
+        Lines of an effective-dated table are matched to the period valid
+        on their pay date (first day of the month; periods of a code do not
+        overlap), as SalaryAnalyzer._join_nomenclature does.
+        """
+        clause = f"JOIN {sql_table} {alias} ON p.{key} = {alias}.{key}"
+        if sql_table in self._dated:
+            pay_date = "printf('%04d-%02d-01', CAST(p.Annee AS INTEGER), CAST(p.Mois AS INTEGER))"
+            clause += (f" AND ({alias}.Valid_From IS NULL OR {alias}.Valid_From <= {pay_date})"
+                       f" AND ({alias}.Valid_To IS NULL OR {pay_date} <= {alias}.Valid_To)")
+        return clause
+
+    def version(self):
+        """Identify the database content (file size and modification time)."""
+        stat = self.db_path.stat()
+        return f"sqlite:{self.db_path}:{stat.st_size}:{stat.st_mtime_ns}"
+
+    def read_sql(self, sql, params=()):
+        """Run a read-only query and return its result as a DataFrame."""
+        connection = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
+        try:
+            return pd.read_sql_query(sql, connection, params=params)
+        finally:
+            connection.close()
+
+    def dataset_summary(self):
+        """Records, years, agents and establishments of the payroll table."""
+        return self.read_sql("""
+            SELECT COUNT(*) AS total_records,
+                   CAST(MIN(Annee) AS INTEGER) AS first_year,
+                   CAST(MAX(Annee) AS INTEGER) AS last_year,
+                   COUNT(DISTINCT Id_agent) AS unique_agents,
+                   COUNT(DISTINCT Codetab) AS unique_establishments
+            FROM payroll
+        """)
+
+    def staff_evolution(self):
+        """Distinct agents by year, ministry, corps and grade."""
+        return {
+            'total': self.read_sql("""
+                SELECT Annee AS Year, COUNT(DISTINCT Id_agent) AS Staff_Count
+                FROM payroll GROUP BY Annee ORDER BY Annee
+            """),
+            'by_ministry': self.read_sql(f"""
+                SELECT p.Annee AS Year, g.Ministry AS Ministry, COUNT(DISTINCT p.Id_agent) AS Staff_Count
+                FROM payroll p {self.nomenclature_join('grade', 'g', 'Codgrd')}
+                WHERE g.Ministry IS NOT NULL
+                GROUP BY p.Annee, g.Ministry ORDER BY p.Annee, g.Ministry
+            """),
+            'by_corps': self.read_sql(f"""
+                SELECT p.Annee AS Year, c.Corps_Name_FR AS Corps, COUNT(DISTINCT p.Id_agent) AS Staff_Count
+                FROM payroll p {self.nomenclature_join('corps', 'c', 'Codcorps')}
+                WHERE c.Corps_Name_FR IS NOT NULL
+                GROUP BY p.Annee, c.Corps_Name_FR ORDER BY p.Annee, c.Corps_Name_FR
+            """),
+            'by_grade': self.read_sql(f"""
+                SELECT p.Annee AS Year, g.Grade_Name_FR AS Grade, COUNT(DISTINCT p.Id_agent) AS Staff_Count
+                FROM payroll p {self.nomenclature_join('grade', 'g', 'Codgrd')}
+                WHERE g.Grade_Name_FR IS NOT NULL
+                GROUP BY p.Annee, g.Grade_Name_FR ORDER BY p.Annee, g.Grade_Name_FR
+            """)
+        }
+
+    def salary_mass(self):
+        """Salary mass by year, ministry and corps, and average salary per agent."""
+        return {
+            'total': self.read_sql("""
+                SELECT Annee AS Year, SUM(Montind) AS Total_Salary_Mass
+                FROM payroll GROUP BY Annee ORDER BY Annee
+            """),
+            'by_ministry': self.read_sql(f"""
+                SELECT p.Annee AS Year, g.Ministry AS Ministry, SUM(p.Montind) AS Salary_Mass
+                FROM payroll p {self.nomenclature_join('grade', 'g', 'Codgrd')}
+                WHERE g.Ministry IS NOT NULL
+                GROUP BY p.Annee, g.Ministry ORDER BY p.Annee, g.Ministry
+            """),
+            'by_corps': self.read_sql(f"""
+                SELECT p.Annee AS Year, c.Corps_Name_FR AS Corps, SUM(p.Montind) AS Salary_Mass
+                FROM payroll p {self.nomenclature_join('corps', 'c', 'Codcorps')}
+                WHERE c.Corps_Name_FR IS NOT NULL
+                GROUP BY p.Annee, c.Corps_Name_FR ORDER BY p.Annee, c.Corps_Name_FR
+            """),
+            'average_per_agent': self.read_sql("""
+                SELECT Annee AS Year, AVG(Agent_Total) AS Average_Salary_Per_Agent
+                FROM (SELECT Annee, Id_agent, SUM(Montind) AS Agent_Total
+                      FROM payroll GROUP BY Annee, Id_agent)
+                GROUP BY Annee ORDER BY Annee
+            """)
+        }
+
+    def allowances(self):
+        """Allowance amounts and counts by type, by ministry/corps/grade(/code) and per agent."""
+        detailed_from = f"""
+            FROM payroll p
+            {self.nomenclature_join('grade', 'g', 'Codgrd')}
+            {self.nomenclature_join('corps', 'c', 'Codcorps')}
+            WHERE g.Ministry IS NOT NULL AND c.Corps_Name_FR IS NOT NULL AND g.Grade_Name_FR IS NOT NULL
+        """
+        return {
+            'by_type': self.read_sql("""
+                SELECT Annee AS Year, Type, SUM(Montind) AS Total_Amount,
+                       AVG(Montind) AS Average_Amount, COUNT(Montind) AS Count
+                FROM payroll WHERE Type IS NOT NULL
+                GROUP BY Annee, Type ORDER BY Annee, Type
+            """),
+            'detailed': self.read_sql(f"""
+                SELECT p.Annee AS Year, g.Ministry AS Ministry, c.Corps_Name_FR AS Corps,
+                       g.Grade_Name_FR AS Grade, SUM(p.Montind) AS Total_Amount,
+                       AVG(p.Montind) AS Average_Amount, COUNT(p.Montind) AS Count
+                {detailed_from}
+                GROUP BY 1, 2, 3, 4 ORDER BY 1, 2, 3, 4
+            """),
+            'by_code': self.read_sql(f"""
+                SELECT p.Annee AS Year, g.Ministry AS Ministry, c.Corps_Name_FR AS Corps,
+                       g.Grade_Name_FR AS Grade, p.Codind AS Codind,
+                       SUM(p.Montind) AS Total_Amount, COUNT(p.Montind) AS Count
+                {detailed_from} AND p.Codind IS NOT NULL
+                GROUP BY 1, 2, 3, 4, 5 ORDER BY 1, 2, 3, 4, 5
+            """),
+            'per_agent': self.read_sql("""
+                SELECT Annee AS Year, AVG(Line_Count) AS Average_Allowances_Per_Agent
+                FROM (SELECT Annee, Id_agent, COUNT(*) AS Line_Count
+                      FROM payroll GROUP BY Annee, Id_agent)
+                GROUP BY Annee ORDER BY Annee
+            """)
+        }
+
+
+def main():
+    """Build the analytical database from the data files of the current directory."""
+    print("🗄️  ANALYTICAL DATABASE BUILD")
+    print("=" * 50)
+
+    analyzer = SalaryAnalyzer(data_directory=".", encoding='utf-8')
+    try:
+        db_path = build_database(analyzer)
+    except Exception as e:
+        print(f"❌ Error building database: {e}")
+        return
+
+    print(f"\n✅ Database ready: {db_path}")
+    print("Use it with: analyzer.use_database('cache/payroll.sqlite')")
+
+
+if __name__ == "__main__":
+    main()
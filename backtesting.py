@@ -0,0 +1,128 @@
+"""
+Forecast Backtesting
+====================
+
+Rolling-origin backtests of the batched forecasting methods.
+
+For every forecast origin (last training year, e.g. 2018), the years
+after the origin are hidden and every method forecasts the next
+`horizon` years (2019-2023), which are compared with the actual values.
+The masked copies of all series for all origins are stacked in a single
+(origins x series) x years matrix, so every method is fitted once for
+all series and all origins in a few array operations.
+
+Accuracy is reported as MAPE (mean absolute percentage error) and bias
+(mean percentage error: positive when the method over-forecasts), overall
+and by horizon, with the fit time of every method.
+
+Usage:
+    matrix = year_matrix(detailed, ['Ministry'], 'Total_Amount')
+    backtest = rolling_origin_backtest(matrix, horizon=5)
+    backtest['accuracy']   # one row per method
+"""
+
+import time
+
+import numpy as np
+import pandas as pd
+
+from batch_forecasting import BATCH_METHODS
+
+# Minimum number of observed training years of a series at an origin
+MIN_TRAINING_YEARS = 4
+
+
+def rolling_origin_backtest(matrix, methods=None, origins=None, horizon=5,
+                            min_training_years=MIN_TRAINING_YEARS):
+    """
+    Backtest forecasting methods on every series of a matrix.
+
+    Args:
+        matrix (DataFrame): Series x years matrix (see growth_metrics.year_matrix)
+        methods (dict): Method name -> function(years, values, forecast_years)
+            (default: batch_forecasting.BATCH_METHODS)
+        origins (list): Forecast origins (default: every year leaving
+            min_training_years before it and at least one year after it)
+        horizon (int): Number of years forecast from every origin
+        min_training_years (int): Series with fewer observed years before an
+            origin are not evaluated at that origin
+
+    Returns:
+        dict: 'accuracy' (one row per method: MAPE, Bias, Forecasts, Series,
+            Fit_Seconds), 'by_horizon' (one row per method and horizon) and
+            'forecasts' (one row per method, series, origin and forecast year)
+    """
+    methods = BATCH_METHODS if methods is None else methods
+    years = np.asarray(matrix.columns, dtype=float)
+    values = matrix.to_numpy(dtype=float)
+    n_series = values.shape[0]
+
+    if origins is None:
+        origins = years[min_training_years - 1:-1] if len(years) > min_training_years else []
+    origins = np.asarray(origins, dtype=float)
+    n_origins = len(origins)
+
+    # (origins x series) x years: training values up to every origin
+    origin_of_row = np.repeat(origins, n_series)
+    series_of_row = np.tile(np.arange(n_series), n_origins)
+    actual = np.tile(values, (n_origins, 1))
+    training = np.where(years[None, :] <= origin_of_row[:, None], actual, np.nan)
+
+    # Forecast years evaluated: observed, within the horizon of the origin
+    steps = years[None, :] - origin_of_row[:, None]
+    enough_history = (~np.isnan(training)).sum(axis=1) >= min_training_years
+    evaluated = ((steps >= 1) & (steps <= horizon) & ~np.isnan(actual)
+                 & (actual != 0) & enough_history[:, None])
+
+    rows, columns = np.nonzero(evaluated)
+    accuracy, by_horizon, forecasts = [], [], []
+    for name, method in methods.items():
+        start = time.perf_counter()
+        forecast = method(years, training, years) if len(training) else np.empty((0, len(years)))
+        fit_seconds = time.perf_counter() - start
+
+        predicted = forecast[rows, columns]
+        observed = actual[rows, columns]
+        valid = np.isfinite(predicted)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            percentage_error = (predicted - observed) / np.abs(observed) * 100
+
+        detail = pd.DataFrame({
+            'Method': name,
+            'Series': series_of_row[rows][valid],
+            'Origin': origin_of_row[rows][valid].astype(int),
+            'Year': years[columns][valid].astype(int),
+            'Horizon': steps[rows, columns][valid].astype(int),
+            'Actual': observed[valid],
+            'Forecast': predicted[valid],
+            'Percentage_Error': percentage_error[valid]
+        })
+        forecasts.append(detail)
+
+        accuracy.append({
+            'Method': name,
+            'MAPE': detail['Percentage_Error'].abs().mean(),
+            'Bias': detail['Percentage_Error'].mean(),
+            'Forecasts': len(detail),
+            'Series': detail['Series'].nunique(),
+            'Fit_Seconds': fit_seconds
+        })
+        horizon_table = detail.groupby('Horizon')['Percentage_Error'].agg(
+            MAPE=lambda errors: errors.abs().mean(), Bias='mean', Forecasts='size'
+        ).reset_index()
+        horizon_table.insert(0, 'Method', name)
+        by_horizon.append(horizon_table)
+
+    forecasts = pd.concat(forecasts, ignore_index=True) if forecasts else pd.DataFrame()
+    if len(forecasts):
+        # Series position -> series identifiers of the matrix
+        members = matrix.index.to_frame(index=False)
+        forecasts = pd.concat([members.iloc[forecasts['Series']].reset_index(drop=True),
+                               forecasts.drop(columns='Series')], axis=1)
+
+    return {
+        'accuracy': pd.DataFrame(accuracy, columns=['Method', 'MAPE', 'Bias', 'Forecasts',
+                                                    'Series', 'Fit_Seconds']),
+        'by_horizon': pd.concat(by_horizon, ignore_index=True) if by_horizon else pd.DataFrame(),
+        'forecasts': forecasts
+    }
@@ -0,0 +1,546 @@
+"""
+Batch Forecasting
+=================
+
+Closed-form trend forecasts for thousands of series at once.
+
+The series are stacked in a series x years matrix (NaN where a year is
+missing). Every trend model is a least-squares fit on a polynomial of the
+year: the normal equations of all series are built with masked array
+products (a missing year has a zero weight) and solved in a single
+batched NumPy call, instead of fitting one model per series in a loop.
+
+Models:
+- 'Linear Regression': value = a + b * year
+- 'Quadratic Trend': value = a + b * year + c * year^2
+- 'Exponential Trend': log(value) = a + b * year (positive series only)
+
+The model of every series is the one with the best adjusted R² (computed
+on the values, so that the models are comparable).
+
+BATCH_METHODS also holds the naive and drift benchmarks and Holt /
+damped-trend exponential smoothing; every method forecasts a whole matrix
+at once (see backtesting.py).
+
+Usage:
+    matrix = year_matrix(detailed, ['Ministry', 'Corps', 'Grade'], 'Total_Amount')
+    forecasts = batch_forecast(matrix.columns, matrix.to_numpy(), [2025, 2026])
+    forecasts['predictions']  # series x target years, best model of every series
+"""
+
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+# Smoothing parameter grids of the exponential smoothing methods
+HOLT_ALPHAS = np.array([0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 0.99])
+HOLT_BETAS = np.array([0.01, 0.05, 0.1, 0.2, 0.3, 0.5])
+DAMPING_FACTORS = np.array([0.8, 0.85, 0.9, 0.95, 0.98])
+
+# Series smoothed together by holt_forecast (bounds the grid x series arrays)
+HOLT_CHUNK_SERIES = 2000
+
+# Years held out to score a single method (see method_forecast)
+HOLDOUT_YEARS = 3
+
+# Trend models (name -> (polynomial degree, fitted on the log of the values))
+TREND_MODELS = {
+    'Linear Regression': (1, False),
+    'Quadratic Trend': (2, False),
+    'Exponential Trend': (1, True)
+}
+
+
+def trend_design(years, degree, origin):
+    """
+    Polynomial design matrix of the years.
+
+    Args:
+        years (array): Years (observed or forecast)
+        degree (int): Polynomial degree
+        origin (float): Year subtracted before raising to powers (conditioning)
+
+    Returns:
+        ndarray: len(years) x (degree + 1) matrix [1, t, t^2, ...]
+    """
+    t = np.asarray(years, dtype=float) - origin
+    return np.vander(t, degree + 1, increasing=True)
+
+
+def fit_trends(years, values, degree=1):
+    """
+    Fit a polynomial trend to every series with masked least squares.
+
+    Args:
+        years (array): Years of the matrix columns
+        values (ndarray): Series x years matrix (NaN: missing year)
+        degree (int): Polynomial degree
+
+    Returns:
+        tuple: (coefficients (series x degree + 1), origin year, fitted
+            (series x years), number of observed years per series)
+    """
+    years = np.asarray(years, dtype=float)
+    values = np.atleast_2d(np.asarray(values, dtype=float))
+    origin = years.mean() if len(years) else 0.0
+    design = trend_design(years, degree, origin)
+
+    weights = (~np.isnan(values)).astype(float)
+    observed = np.where(weights > 0, values, 0.0)
+
+    # Normal equations of every series: (X' W X) beta = X' W y
+    gram = np.einsum('st,tp,tq->spq', weights, design, design)
+    moments = np.einsum('st,tp->sp', observed, design)
+    # Pseudo-inverse: series with too few years get the minimum-norm solution
+    coefficients = np.einsum('spq,sq->sp', np.linalg.pinv(gram), moments)
+
+    fitted = coefficients @ design.T
+    return coefficients, origin, fitted, weights.sum(axis=1).astype(int)
+
+
+def _trend_fit(years, values, forecast_years, degree, log_scale):
+    """
+    Fit a trend model to every series.
+
+    Returns:
+        tuple: (forecasts (series x forecast years), fitted values
+            (series x years), series the model applies to)
+    """
+    mask = ~np.isnan(values)
+    if log_scale:
+        # Only series with positive observed values have a log-linear trend
+        applies = np.where(mask, values > 0, True).all(axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            series = np.where(applies[:, None] & mask, np.log(values), np.nan)
+    else:
+        applies = np.ones(values.shape[0], dtype=bool)
+        series = values
+
+    coefficients, origin, fitted, n_points = fit_trends(years, series, degree)
+    forecast = coefficients @ trend_design(forecast_years, degree, origin).T
+    if log_scale:
+        with np.errstate(over='ignore'):
+            fitted, forecast = np.exp(fitted), np.exp(forecast)
+    return forecast, fitted, applies & (n_points >= degree + 1)
+
+
+def trend_forecast(years, values, forecast_years, degree=1, log_scale=False):
+    """
+    Forecast every series with a polynomial (or log-linear) trend.
+
+    Args:
+        years (array): Years of the matrix columns
+        values (ndarray): Series x years matrix (NaN: missing year)
+        forecast_years (array): Years to forecast
+        degree (int): Polynomial degree
+        log_scale (bool): Fit the trend on the log of the values
+
+    Returns:
+        ndarray: Series x forecast years (NaN where the model does not apply)
+    """
+    years = np.asarray(years, dtype=float)
+    values = np.atleast_2d(np.asarray(values, dtype=float))
+    forecast, _, applies = _trend_fit(years, values, forecast_years, degree, log_scale)
+    return np.where(applies[:, None], forecast, np.nan)
+
+
+def _last_observed(years, values):
+    """Year and value of the first and last observed year of every series (NaN if none)."""
+    mask = ~np.isnan(values)
+    n_years = values.shape[1]
+    rows = np.arange(values.shape[0])
+    first = mask.argmax(axis=1)
+    last = n_years - 1 - mask[:, ::-1].argmax(axis=1)
+    observed = mask.any(axis=1)
+    first_year = np.where(observed, years[first], np.nan)
+    last_year = np.where(observed, years[last], np.nan)
+    return first_year, values[rows, first], last_year, values[rows, last]
+
+
+def naive_forecast(years, values, forecast_years):
+    """
+    Forecast every series with its last observed value.
+
+    Args:
+        years (array): Years of the matrix columns
+        values (ndarray): Series x years matrix (NaN: missing year)
+        forecast_years (array): Years to forecast
+
+    Returns:
+        ndarray: Series x forecast years
+    """
+    years = np.asarray(years, dtype=float)
+    values = np.atleast_2d(np.asarray(values, dtype=float))
+    last_value = _last_observed(years, values)[3]
+    return np.repeat(last_value[:, None], len(forecast_years), axis=1)
+
+
+def drift_forecast(years, values, forecast_years):
+    """
+    Forecast every series with its last value plus its average yearly change.
+
+    Args:
+        years (array): Years of the matrix columns
+        values (ndarray): Series x years matrix (NaN: missing year)
+        forecast_years (array): Years to forecast
+
+    Returns:
+        ndarray: Series x forecast years
+    """
+    years = np.asarray(years, dtype=float)
+    values = np.atleast_2d(np.asarray(values, dtype=float))
+    first_year, first_value, last_year, last_value = _last_observed(years, values)
+    span = last_year - first_year
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope = np.where(span > 0, (last_value - first_value) / span, 0.0)
+    steps = np.asarray(forecast_years, dtype=float)[None, :] - last_year[:, None]
+    return last_value[:, None] + slope[:, None] * steps
+
+
+def _holt_smooth(years, values, alpha, beta, phi, keep_one_step=False):
+    """
+    Run Holt's smoothing for every series and parameter set at once.
+
+    Args:
+        years (ndarray): Years of the matrix columns
+        values (ndarray): Series x years matrix (NaN: missing year)
+        alpha, beta, phi (ndarray): Parameters, grid x 1 (or grid x series)
+        keep_one_step (bool): Also return the one-step-ahead forecasts
+
+    Returns:
+        tuple: (squared one-step errors, final level, final trend: grid x
+            series; one-step forecasts: grid x series x years or None)
+    """
+    n_series, n_years = values.shape
+    mask = ~np.isnan(values)
+    n_grid = max(alpha.shape[0], beta.shape[0], phi.shape[0])
+
+    # Initial state: first observed value, slope to the second observed year
+    order = np.cumsum(mask, axis=1)
+    first = np.where(order >= 1, np.arange(n_years), n_years).min(axis=1)
+    second = np.where(order >= 2, np.arange(n_years), n_years).min(axis=1)
+    rows = np.arange(n_series)
+    first_year = np.where(first < n_years, years[np.minimum(first, n_years - 1)], np.inf)
+    first_value = values[rows, np.minimum(first, n_years - 1)]
+    second_year = years[np.minimum(second, n_years - 1)]
+    second_value = values[rows, np.minimum(second, n_years - 1)]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope = np.where(second < n_years, (second_value - first_value) / (second_year - first_year), 0.0)
+
+    level = np.broadcast_to(first_value, (n_grid, n_series)).copy()
+    trend = np.broadcast_to(slope, (n_grid, n_series)).copy()
+    squared_errors = np.zeros((n_grid, n_series))
+    one_step = np.full((n_grid, n_series, n_years), np.nan) if keep_one_step else None
+
+    for t in range(n_years):
+        started = years[t] > first_year
+        if not started.any():
+            continue
+        predicted = level + phi * trend
+        if keep_one_step:
+            one_step[:, :, t] = np.where(started, predicted, np.nan)
+
+        observed = started & mask[:, t]
+        errors = np.where(observed, np.where(observed, values[:, t], 0.0) - predicted, 0.0)
+        # Errors from the third observation on (the first two set the state)
+        squared_errors += np.where(observed & (order[:, t] >= 3), errors ** 2, 0.0)
+
+        # A missing year carries the level and trend forward as forecast
+        new_level = np.where(observed, predicted + alpha * errors, predicted)
+        new_trend = np.where(observed, beta * (new_level - level) + (1 - beta) * phi * trend, phi * trend)
+        level = np.where(started, new_level, level)
+        trend = np.where(started, new_trend, trend)
+
+    return squared_errors, level, trend, one_step
+
+
+def holt_parameters(years, values, damping=(1.0,), alphas=HOLT_ALPHAS, betas=HOLT_BETAS,
+                    chunk_size=HOLT_CHUNK_SERIES):
+    """
+    Pick the smoothing parameters of every series on a grid.
+
+    The grid point (alpha x beta x damping) with the smallest one-step-ahead
+    squared errors is kept; all series and grid points are smoothed together,
+    series by chunks.
+
+    Args:
+        years (array): Years of the matrix columns (consecutive)
+        values (ndarray): Series x years matrix (NaN: missing year)
+        damping (array): Damping factors of the grid (1.0: Holt's linear trend)
+        alphas (array): Level smoothing parameters of the grid
+        betas (array): Trend smoothing parameters of the grid
+        chunk_size (int): Series smoothed together
+
+    Returns:
+        tuple: (alpha, beta, phi) of every series
+    """
+    years = np.asarray(years, dtype=float)
+    values = np.atleast_2d(np.asarray(values, dtype=float))
+    alpha, beta, phi = (grid.reshape(-1, 1) for grid in
+                        np.meshgrid(alphas, betas, np.asarray(damping, dtype=float), indexing='ij'))
+
+    best = np.zeros(values.shape[0], dtype=int)
+    for start in range(0, values.shape[0], chunk_size):
+        squared_errors = _holt_smooth(years, values[start:start + chunk_size], alpha, beta, phi)[0]
+        best[start:start + chunk_size] = squared_errors.argmin(axis=0)
+    return alpha[best, 0], beta[best, 0], phi[best, 0]
+
+
+def holt_forecast(years, values, forecast_years, damping=(1.0,), alphas=HOLT_ALPHAS,
+                  betas=HOLT_BETAS, min_points=3, chunk_size=HOLT_CHUNK_SERIES):
+    """
+    Forecast every series with Holt's linear / damped-trend exponential smoothing.
+
+    The smoothing parameters of every series are picked on a grid (alpha x
+    beta x damping) by minimizing the one-step-ahead squared errors. All
+    series and all grid points are smoothed together: the only loop is
+    over the years. A missing year is not an observation: level and trend
+    are carried forward as forecast. Series are processed in chunks so
+    that the grid x series arrays stay bounded in memory.
+
+    Args:
+        years (array): Years of the matrix columns (consecutive)
+        values (ndarray): Series x years matrix (NaN: missing year)
+        forecast_years (array): Years to forecast (years of the matrix get
+            the forecast made the year before)
+        damping (array): Damping factors of the grid (1.0: Holt's linear trend)
+        alphas (array): Level smoothing parameters of the grid
+        betas (array): Trend smoothing parameters of the grid
+        min_points (int): Minimum number of observed years of a series
+        chunk_size (int): Series smoothed together
+
+    Returns:
+        ndarray: Series x forecast years (NaN for series with too few years)
+    """
+    years = np.asarray(years, dtype=float)
+    values = np.atleast_2d(np.asarray(values, dtype=float))
+    forecast_years = np.asarray(forecast_years, dtype=float)
+    n_series, n_years = values.shape
+    if n_series == 0 or n_years == 0:
+        return np.full((n_series, len(forecast_years)), np.nan)
+
+    best_alpha, best_beta, best_phi = holt_parameters(years, values, damping, alphas, betas, chunk_size)
+
+    # Forecast years inside the matrix get the one-step forecast of that year
+    columns = np.minimum(np.searchsorted(years, forecast_years), n_years - 1)
+    in_matrix = years[columns] == forecast_years
+    steps = np.clip(forecast_years - years[-1], 0, None).astype(int)
+
+    forecast = np.full((n_series, len(forecast_years)), np.nan)
+    for start in range(0, n_series, chunk_size):
+        chunk = values[start:start + chunk_size]
+        rows = np.arange(len(chunk))
+
+        # One pass with the parameters of every series
+        phi = best_phi[start:start + chunk_size]
+        _, level, trend, one_step = _holt_smooth(years, chunk, best_alpha[start:start + chunk_size][None, :],
+                                                 best_beta[start:start + chunk_size][None, :], phi[None, :],
+                                                 keep_one_step=in_matrix.any())
+
+        # h-step forecasts: level + (phi + phi^2 + ... + phi^h) * trend
+        powers = phi[:, None] ** np.arange(1, steps.max() + 1)[None, :]
+        cumulative = np.concatenate([np.zeros((len(chunk), 1)), np.cumsum(powers, axis=1)], axis=1)
+        ahead = level[0][:, None] + cumulative[:, steps] * trend[0][:, None]
+        if in_matrix.any():
+            ahead = np.where(in_matrix[None, :], one_step[0][rows][:, columns], ahead)
+        forecast[start:start + chunk_size] = ahead
+
+    enough = (~np.isnan(values)).sum(axis=1) >= min_points
+    return np.where(enough[:, None], forecast, np.nan)
+
+
+# Exponential smoothing methods -> damping factors of their parameter grid
+SMOOTHING_METHODS = {
+    'Holt': (1.0,),
+    'Damped Trend': DAMPING_FACTORS
+}
+
+# Batched forecasting methods: function(years, values, forecast_years) -> series x forecast years
+BATCH_METHODS = {
+    'Naive': naive_forecast,
+    'Drift': drift_forecast,
+    'Linear Regression': partial(trend_forecast, degree=1),
+    'Quadratic Trend': partial(trend_forecast, degree=2),
+    'Exponential Trend': partial(trend_forecast, degree=1, log_scale=True),
+    **{name: partial(holt_forecast, damping=damping) for name, damping in SMOOTHING_METHODS.items()}
+}
+
+
+def method_forecast(years, values, target_years, method, holdout=HOLDOUT_YEARS):
+    """
+    Forecast every series with one batched method.
+
+    The method is scored like the model cascade: fitted without the last
+    `holdout` years, its forecast of these years gives the holdout error.
+
+    Args:
+        years (array): Years of the matrix columns
+        values (ndarray): Series x years matrix (NaN: missing year)
+        target_years (list): Years to forecast
+        method (str): Name of a BATCH_METHODS method
+        holdout (int): Number of last years held out to score the method
+
+    Returns:
+        dict: 'predictions' (series x target years), 'validation_error'
+            (holdout WAPE per series, NaN when not available), 'holdout_mse'
+            (mean squared holdout error per series, NaN when not available)
+            and 'std' (std of the values)
+    """
+    if method not in BATCH_METHODS:
+        raise ValueError(f"Unknown batched method '{method}' (available: {', '.join(BATCH_METHODS)})")
+    forecast = BATCH_METHODS[method]
+    years = np.asarray(years, dtype=float)
+    values = np.atleast_2d(np.asarray(values, dtype=float))
+    mask = ~np.isnan(values)
+
+    predictions = forecast(years, values, target_years)
+
+    # Holdout error (weighted absolute percentage error) of the last years
+    validation_error = np.full(values.shape[0], np.nan)
+    holdout_mse = np.full(values.shape[0], np.nan)
+    if len(years) > holdout:
+        held_out = forecast(years[:-holdout], values[:, :-holdout], years[-holdout:])
+        actual = values[:, -holdout:]
+        scored = mask[:, -holdout:] & np.isfinite(held_out)
+        scale = np.where(scored, np.abs(actual), 0.0).sum(axis=1)
+        error = np.where(scored, np.abs(held_out - actual), 0.0).sum(axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            validation_error = np.where(scale > 0, error / scale, np.nan)
+            holdout_mse = (np.where(scored, (held_out - actual) ** 2, 0.0).sum(axis=1)
+                           / scored.sum(axis=1))
+
+    centered = np.where(mask, values - np.where(mask, values, 0.0).sum(axis=1, keepdims=True)
+                        / np.maximum(mask.sum(axis=1), 1)[:, None], 0.0)
+    std = np.sqrt((centered ** 2).sum(axis=1) / np.maximum(mask.sum(axis=1), 1))
+    return {'predictions': predictions, 'validation_error': validation_error,
+            'holdout_mse': holdout_mse, 'std': std}
+
+
+def series_result(target_years, predictions, historical_std, method, score, lower=None, upper=None, **extra):
+    """
+    Prediction result of one series (same format as the model cascade).
+
+    Args:
+        target_years (list): Years predicted
+        predictions (ndarray): Predictions of the target years
+        historical_std (float): Std of the values (half-width of the
+            confidence interval / 1.96 when no bounds are given)
+        method (str): Forecasting method
+        score (float): Score of the method
+        lower, upper (ndarray): Prediction interval bounds (see
+            prediction_intervals; None or not finite: ±1.96 std)
+        **extra: Other entries of the result (all_methods: predictions of
+            every model tried; default: only this method)
+
+    Returns:
+        dict: Prediction result (empty predictions when not all are finite)
+    """
+    if not np.isfinite(predictions).all():
+        return {'years': target_years, 'predictions': [], 'confidence_lower': [],
+                'confidence_upper': [], 'method': 'None', 'score': 0, 'all_methods': {}}
+    if lower is None or upper is None or not (np.isfinite(lower).all() and np.isfinite(upper).all()):
+        lower = predictions - 1.96 * historical_std
+        upper = predictions + 1.96 * historical_std
+    return {
+        'years': target_years,
+        'predictions': predictions.tolist(),
+        'confidence_lower': np.asarray(lower, dtype=float).tolist(),
+        'confidence_upper': np.asarray(upper, dtype=float).tolist(),
+        'method': method,
+        'score': score,
+        'all_methods': {method: predictions.tolist()},
+        **extra
+    }
+
+
+def task_matrix(tasks):
+    """
+    Stack the series of a list of tasks in a series x years matrix.
+
+    Args:
+        tasks (list): (key, data, value_column) of every series; data holds
+            the Year and value columns
+
+    Returns:
+        DataFrame: One row per task (in task order), one column per year of
+            the full year range (NaN where a series has no value)
+    """
+    frames = [data[['Year', value_column]].set_axis(['Year', 'Value'], axis=1).assign(_task=i)
+              for i, (_, data, value_column) in enumerate(tasks)]
+    long = pd.concat(frames, ignore_index=True)
+    long['Year'] = long['Year'].astype(int)
+    matrix = long.pivot_table(index='_task', columns='Year', values='Value', aggfunc='sum')
+    return matrix.reindex(index=range(len(tasks)),
+                          columns=range(matrix.columns.min(), matrix.columns.max() + 1))
+
+
+def _adjusted_r2(values, fitted, n_points, n_predictors):
+    """Adjusted R² of every series (NaN when there are too few observed years)."""
+    mask = ~np.isnan(values)
+    mean = np.where(mask, values, 0.0).sum(axis=1, keepdims=True) / np.maximum(n_points, 1)[:, None]
+    ss_res = np.where(mask, (values - fitted) ** 2, 0.0).sum(axis=1)
+    ss_tot = np.where(mask, (values - mean) ** 2, 0.0).sum(axis=1)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # A constant series is perfectly fitted by any trend: R² = 1
+        r2 = np.where(ss_tot > 0, 1 - ss_res / ss_tot, np.where(ss_res <= 1e-12, 1.0, 0.0))
+        dof = n_points - n_predictors - 1
+        adjusted = 1 - (1 - r2) * (n_points - 1) / dof
+    return np.where(dof > 0, adjusted, np.nan)
+
+
+def batch_forecast(years, values, target_years, min_points=3):
+    """
+    Forecast every series with every trend model and keep the best one.
+
+    Args:
+        years (array): Years of the matrix columns
+        values (ndarray): Series x years matrix (NaN: missing year)
+        target_years (list): Years to forecast
+        min_points (int): Minimum number of observed years of a series
+
+    Returns:
+        dict: 'predictions' (series x target years, best model), 'method'
+            (best model name per series, None when the series has too few
+            years), 'score' (adjusted R² of the best model), 'all_methods'
+            (model name -> series x target years, NaN when not applicable),
+            'scores' (model name -> adjusted R² per series), 'n_points'
+            (observed years per series) and 'std' (std of the values)
+    """
+    years = np.asarray(years, dtype=float)
+    values = np.atleast_2d(np.asarray(values, dtype=float))
+    n_series = values.shape[0]
+    mask = ~np.isnan(values)
+
+    all_methods, scores = {}, {}
+    n_points = mask.sum(axis=1)
+    for name, (degree, log_scale) in TREND_MODELS.items():
+        forecast, fitted, applies = _trend_fit(years, values, target_years, degree, log_scale)
+        usable = applies & (n_points >= min_points)
+        score = _adjusted_r2(values, fitted, n_points, degree)
+        scores[name] = np.where(usable, score, np.nan)
+        all_methods[name] = np.where(usable[:, None], forecast, np.nan)
+
+    # Best model per series (the simplest model wins ties)
+    names = list(TREND_MODELS)
+    stacked = np.vstack([scores[name] for name in names])
+    candidates = np.where(np.isnan(stacked), -np.inf, stacked)
+    best = candidates.argmax(axis=0)
+    has_model = np.isfinite(candidates.max(axis=0))
+
+    rows = np.arange(n_series)
+    predictions = np.stack([all_methods[name] for name in names])[best, rows]
+    centered = np.where(mask, values - np.where(mask, values, 0.0).sum(axis=1, keepdims=True)
+                        / np.maximum(n_points, 1)[:, None], 0.0)
+    std = np.sqrt((centered ** 2).sum(axis=1) / np.maximum(n_points, 1))
+
+    return {
+        'predictions': np.where(has_model[:, None], predictions, np.nan),
+        'method': [names[i] if ok else None for i, ok in zip(best, has_model)],
+        'score': np.where(has_model, stacked[best, rows], np.nan),
+        'all_methods': all_methods,
+        'scores': scores,
+        'n_points': n_points,
+        'std': std
+    }
@@ -0,0 +1,92 @@
+"""
+Execution Engine Benchmark
+==========================
+
+Compares the wall time and peak memory of the load/clean/merge/aggregate
+pipeline (staff, salary mass and allowance tables) on the pandas, Polars
+and year-sharded parallel engines. Every engine runs in its own process
+so that the peak memory of one run does not hide the other (for the
+parallel engine, the memory of the worker processes is not included).
+
+Usage:
+    python benchmark_engines.py [data_directory]
+"""
+
+import json
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent))
+
+ENGINES = ['pandas', 'polars', 'parallel']
+
+
+def run_engine(engine, data_directory):
+    """Run the pipeline once with an engine and return its measurements."""
+    from salary_analyzer import SalaryAnalyzer, memory_usage_mb, reset_peak_memory
+
+    # Peak of the pipeline only where it can be reset (Linux), of the process elsewhere
+    reset_peak_memory()
+    baseline = memory_usage_mb()[1]
+    start = time.perf_counter()
+
+    with tempfile.TemporaryDirectory(prefix='benchmark_cache_') as cache_dir:
+        analyzer = SalaryAnalyzer(data_directory=data_directory, encoding='utf-8')
+        # Fresh cache directory: no persisted facts or aggregates are reused
+        analyzer.cache_dir = Path(cache_dir)
+        analyzer.aggregate_store.directory = analyzer.cache_dir / 'aggregates'
+        analyzer.use_engine(engine)
+        if engine == 'pandas' and not analyzer.load_and_clean_data():
+            raise RuntimeError("Could not load the data files")
+
+        analyzer.calculate_staff_evolution()
+        analyzer.calculate_salary_mass()
+        analyzer.analyze_allowances()
+        wall_time = time.perf_counter() - start
+
+    return {
+        'engine': engine,
+        'wall_time_s': wall_time,
+        'start_memory_mb': baseline,
+        'peak_memory_mb': memory_usage_mb()[1]
+    }
+
+
+def main():
+    """Benchmark every engine in a separate process and print a comparison."""
+    if len(sys.argv) > 2 and sys.argv[1] == '--engine':
+        # Child process: run one engine and report as JSON on the last line
+        data_directory = sys.argv[3] if len(sys.argv) > 3 else "."
+        print(json.dumps(run_engine(sys.argv[2], data_directory)))
+        return
+
+    data_directory = sys.argv[1] if len(sys.argv) > 1 else "."
+    print("⏱️  EXECUTION ENGINE BENCHMARK")
+    print("=" * 50)
+
+    results = []
+    for engine in ENGINES:
+        print(f"\nRunning the {engine} engine...")
+        process = subprocess.run(
+            [sys.executable, __file__, '--engine', engine, data_directory],
+            capture_output=True, text=True
+        )
+        if process.returncode != 0:
+            print(f"❌ {engine} engine failed:\n{process.stderr.strip()}")
+            continue
+        results.append(json.loads(process.stdout.strip().splitlines()[-1]))
+
+    print(f"\n{'Engine':<10}{'Wall time (s)':>15}{'Peak memory (MB)':>20}{'Pipeline (MB)':>16}")
+    print("-" * 61)
+    for result in results:
+        peak, start = result['peak_memory_mb'], result['start_memory_mb']
+        peak_text = f"{peak:,.0f}" if peak is not None else "n/a"
+        added_text = f"{peak - start:,.0f}" if peak is not None else "n/a"
+        print(f"{result['engine']:<10}{result['wall_time_s']:>15.2f}{peak_text:>20}{added_text:>16}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Forecasting Benchmark
+=====================
+
+Compares the wall time of the batched Holt / damped-trend smoothing
+(batch_forecasting.holt_forecast: all series and the whole parameter grid
+at once) with statsmodels ExponentialSmoothing fitted one series at a
+time, on generated series of the length of the payroll history.
+
+Usage:
+    python benchmark_forecasting.py [number_of_series]
+"""
+
+import sys
+import time
+import warnings
+from pathlib import Path
+
+import numpy as np
+from statsmodels.tsa.holtwinters import ExponentialSmoothing
+
+sys.path.append(str(Path(__file__).parent))
+from batch_forecasting import BATCH_METHODS
+
+YEARS = np.arange(2013, 2024)
+TARGET_YEARS = np.arange(2024, 2031)
+
+
+def generate_series(n_series, seed=0):
+    """Positive trending series with noise (series x years)."""
+    rng = np.random.default_rng(seed)
+    t = YEARS - YEARS[0]
+    scale = rng.uniform(1e3, 1e6, (n_series, 1))
+    growth = rng.normal(0.04, 0.03, (n_series, 1))
+    return scale * np.exp(growth * t + rng.normal(0, 0.02, (n_series, len(YEARS))))
+
+
+def run_batched(values, damped):
+    """Forecast every series with the batched smoothing."""
+    method = 'Damped Trend' if damped else 'Holt'
+    return BATCH_METHODS[method](YEARS, values, TARGET_YEARS)
+
+
+def run_statsmodels(values, damped):
+    """Forecast every series with one statsmodels model per series."""
+    forecasts = np.empty((len(values), len(TARGET_YEARS)))
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        for i, row in enumerate(values):
+            model = ExponentialSmoothing(row, trend='add', damped_trend=damped).fit()
+            forecasts[i] = model.forecast(len(TARGET_YEARS))
+    return forecasts
+
+
+def main():
+    """Time both implementations and print the speedup."""
+    n_series = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    values = generate_series(n_series)
+
+    print("⏱️  FORECASTING BENCHMARK")
+    print("=" * 50)
+    print(f"{n_series:,} series x {len(YEARS)} years, {len(TARGET_YEARS)} years forecast\n")
+    print(f"{'Method':<15}{'Batched (s)':>14}{'statsmodels (s)':>18}{'Speedup':>10}")
+    print("-" * 57)
+    for damped in (False, True):
+        start = time.perf_counter()
+        run_batched(values, damped)
+        batched = time.perf_counter() - start
+
+        start = time.perf_counter()
+        run_statsmodels(values, damped)
+        per_series = time.perf_counter() - start
+
+        name = 'Damped Trend' if damped else 'Holt'
+        print(f"{name:<15}{batched:>14.3f}{per_series:>18.2f}{per_series / batched:>9.0f}x")
+
+
+if __name__ == "__main__":
+    main()
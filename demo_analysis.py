@@ -23,6 +23,7 @@ sys.path.append(str(current_dir))
 
 try:
     from salary_analyzer import SalaryAnalyzer
+    from growth_metrics import growth_metrics
 except ImportError as e:
     print(f"Error importing SalaryAnalyzer: {e}")
     print("Please ensure all required packages are installed:")
@@ -67,22 +68,19 @@ def run_basic_analysis():
         print("🔄 Initializing SalaryAnalyzer...")
         analyzer = SalaryAnalyzer(data_directory=".", encoding='utf-8')
         
-        # Load data
-        print("🔄 Loading and cleaning data...")
-        if not analyzer.load_and_clean_data():
+        # Load data (or reuse the aggregates of a previous run)
+        print("🔄 Loading, cleaning and merging data...")
+        if not analyzer.load_or_restore():
             print("❌ Failed to load data!")
             return False
         
-        # Merge with nomenclature
-        print("🔄 Merging with nomenclature tables...")
-        analyzer.merge_data_with_nomenclature()
-        
         # Basic statistics
+        dataset = analyzer.summarize_dataset()
         print("\n📊 BASIC STATISTICS:")
-        print(f"   - Total records: {len(analyzer.main_data):,}")
-        print(f"   - Date range: {analyzer.main_data['Annee'].min()} - {analyzer.main_data['Annee'].max()}")
-        print(f"   - Unique agents: {analyzer.main_data['Id_agent'].nunique():,}")
-        print(f"   - Unique establishments: {analyzer.main_data['Codetab'].nunique():,}")
+        print(f"   - Total records: {dataset['total_records']:,}")
+        print(f"   - Date range: {dataset['first_year']} - {dataset['last_year']}")
+        print(f"   - Unique agents: {dataset['unique_agents']:,}")
+        print(f"   - Unique establishments: {dataset['unique_establishments']:,}")
         
         return True
         
@@ -99,11 +97,9 @@ def run_staff_analysis():
     try:
         analyzer = SalaryAnalyzer(data_directory=".", encoding='utf-8')
         
-        if not analyzer.load_and_clean_data():
+        if not analyzer.load_or_restore():
             return False
         
-        analyzer.merge_data_with_nomenclature()
-        
         print("🔄 Calculating staff evolution...")
         staff_evolution = analyzer.calculate_staff_evolution()
         
@@ -118,10 +114,9 @@ def run_staff_analysis():
         
         # Growth analysis
         if len(total_staff) > 1:
-            first_year = total_staff.iloc[0]
-            last_year = total_staff.iloc[-1]
-            total_growth = ((last_year['Staff_Count'] - first_year['Staff_Count']) / first_year['Staff_Count']) * 100
-            print(f"\n   📊 Overall growth: {total_growth:.1f}% from {int(first_year['Year'])} to {int(last_year['Year'])}")
+            growth = growth_metrics(total_staff, [], 'Staff_Count')['summary'].iloc[0]
+            print(f"\n   📊 Overall growth: {growth['Total_Growth']:.1f}% from {int(growth['First_Year'])} to {int(growth['Last_Year'])}"
+                  f" ({growth['CAGR']:.1f}%/year)")
         
         # Top ministries by staff
         latest_year = staff_evolution['by_ministry']['Year'].max()
@@ -149,11 +144,9 @@ def run_salary_analysis():
     try:
         analyzer = SalaryAnalyzer(data_directory=".", encoding='utf-8')
         
-        if not analyzer.load_and_clean_data():
+        if not analyzer.load_or_restore():
             return False
         
-        analyzer.merge_data_with_nomenclature()
-        
         print("🔄 Calculating salary mass evolution...")
         salary_evolution = analyzer.calculate_salary_mass()
         
@@ -175,10 +168,9 @@ def run_salary_analysis():
         
         # Growth analysis
         if len(total_salary) > 1:
-            first_year = total_salary.iloc[0]
-            last_year = total_salary.iloc[-1]
-            salary_growth = ((last_year['Total_Salary_Mass'] - first_year['Total_Salary_Mass']) / first_year['Total_Salary_Mass']) * 100
-            print(f"\n   📊 Salary mass growth: {salary_growth:.1f}% from {int(first_year['Year'])} to {int(last_year['Year'])}")
+            growth = growth_metrics(total_salary, [], 'Total_Salary_Mass')['summary'].iloc[0]
+            print(f"\n   📊 Salary mass growth: {growth['Total_Growth']:.1f}% from {int(growth['First_Year'])} to {int(growth['Last_Year'])}"
+                  f" ({growth['CAGR']:.1f}%/year)")
         
         return True
         
@@ -195,10 +187,8 @@ def run_prediction_analysis():
     try:
         analyzer = SalaryAnalyzer(data_directory=".", encoding='utf-8')
         
-        if not analyzer.load_and_clean_data():
+        if not analyzer.load_or_restore():
             return False
-        
-        analyzer.merge_data_with_nomenclature()
         analyzer.calculate_staff_evolution()
         analyzer.calculate_salary_mass()
         
@@ -262,15 +252,11 @@ def run_full_analysis():
     try:
         analyzer = SalaryAnalyzer(data_directory=".", encoding='utf-8')
         
-        # Step 1: Load data
-        print("🔄 Step 1: Loading and cleaning data...")
-        if not analyzer.load_and_clean_data():
+        # Step 1-2: Load data and merge with nomenclature (or reuse cached aggregates)
+        print("🔄 Step 1-2: Loading data and merging with nomenclature tables...")
+        if not analyzer.load_or_restore():
             return False
         
-        # Step 2: Merge with nomenclature
-        print("🔄 Step 2: Merging with nomenclature tables...")
-        analyzer.merge_data_with_nomenclature()
-        
         # Step 3: Calculate staff evolution
         print("🔄 Step 3: Calculating staff evolution...")
         analyzer.calculate_staff_evolution()
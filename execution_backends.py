@@ -0,0 +1,353 @@
+"""
+Execution Backends
+==================
+
+Alternative engines for the SalaryAnalyzer load/clean/merge/aggregate
+pipeline. A backend answers the same aggregations as the pandas pipeline
+and returns the same pandas tables:
+
+- version()          key of the data the backend reads
+- dataset_summary()  one-row overview of the payroll lines
+- staff_evolution()  {'total', 'by_ministry', 'by_corps', 'by_grade'}
+- salary_mass()      {'total', 'by_ministry', 'by_corps', 'average_per_agent'}
+- allowances()       {'by_type', 'detailed', 'by_code', 'per_agent'}
+
+analytical_database.SQLiteBackend follows the same interface.
+
+Usage:
+    analyzer.use_engine('polars')
+    analyzer.use_engine('parallel', workers=32)
+"""
+
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+
+from salary_analyzer import (MAIN_COLUMNS, agent_year_totals, staff_tables,
+                             salary_mass_tables, allowance_tables)
+
+# Payroll columns used by the aggregations (projection pushed down to the scan)
+PAYROLL_COLUMNS = ['Annee', 'Mois', 'Type', 'Codind', 'Montind',
+                   'Codgrd', 'Codcorps', 'Codetab', 'Id_agent']
+
+# Enriched columns written to the year shards
+SHARD_COLUMNS = ['Annee', 'Id_agent', 'Type', 'Codind', 'Montind',
+                 'Ministry', 'Corps_Name_FR', 'Grade_Name_FR']
+
+# Aggregations computed per year shard (result name -> table function)
+SHARD_AGGREGATES = {
+    'staff_evolution': staff_tables,
+    'salary_mass': salary_mass_tables,
+    'allowances': allowance_tables
+}
+
+
+class PolarsBackend:
+    """Run the pipeline on Polars lazy frames (multi-threaded, columnar)."""
+
+    def __init__(self, analyzer):
+        """
+        Args:
+            analyzer (SalaryAnalyzer): Analyzer providing the data files and nomenclature tables
+        """
+        try:
+            import polars
+        except ImportError as e:
+            raise ImportError("The polars engine requires polars (pip install polars)") from e
+
+        self.pl = polars
+        self.analyzer = analyzer
+        self._lines = None
+        self._lines_version = None
+
+    def version(self):
+        """Identify the data files and analysis code the results are computed from."""
+        return f"polars:{self.analyzer._dataset_fingerprint()}"
+
+    def scan_payroll(self):
+        """
+        Build the lazy query plan loading, cleaning and enriching the payroll lines.
+
+        Returns:
+            LazyFrame: Cleaned payroll lines with the grade and corps labels
+        """
+        pl = self.pl
+        analyzer = self.analyzer
+        main_file = analyzer.data_dir / analyzer.data_files['main']
+        if not main_file.exists():
+            raise FileNotFoundError(f"Main data file {main_file} not found")
+
+        # Polars reads UTF-8 only; other encodings only affect text columns
+        utf8 = analyzer.encoding.lower().replace('-', '') == 'utf8'
+        lines = pl.scan_csv(
+            main_file,
+            separator=';',
+            has_header=False,
+            new_columns=MAIN_COLUMNS,
+            encoding='utf8' if utf8 else 'utf8-lossy',
+            infer_schema_length=10000
+        ).select(PAYROLL_COLUMNS)
+
+        # Same rules as SalaryAnalyzer._clean_payroll_frame (like pd.to_numeric,
+        # numeric columns keep their type and text columns become floats)
+        schema = lines.collect_schema()
+        lines = lines.with_columns([
+            pl.col(column).cast(pl.Float64, strict=False)
+            for column in ['Annee', 'Mois', 'Montind', 'Type']
+            if not schema[column].is_numeric()
+        ]).filter(
+            (pl.col('Annee') >= 2013) & (pl.col('Annee') <= 2023)
+        ).drop_nulls(['Annee', 'Mois', 'Montind', 'Id_agent', 'Codetab'])
+
+        # Same left joins as SalaryAnalyzer._merge_data_with_nomenclature
+        if not analyzer.nomenclature_tables:
+            analyzer._load_nomenclature_tables()
+            analyzer._prepare_nomenclature_tables()
+        joins = [('grade', 'Codgrd', ['Grade_Name_FR', 'Ministry']),
+                 ('corps', 'Codcorps', ['Corps_Name_FR'])]
+        for table_name, key, columns in joins:
+            if table_name not in analyzer.nomenclature_tables:
+                lines = lines.with_columns([pl.lit(None, dtype=pl.Utf8).alias(c) for c in columns])
+                continue
+            table = analyzer.nomenclature_tables[table_name]
+            if 'Valid_From' in table.columns:
+                lines = self._join_as_of(lines, table, key, columns)
+                continue
+            table = pl.from_pandas(table[[key] + columns])
+            lines = lines.with_columns(pl.col(key).cast(table.schema[key], strict=False))
+            lines = lines.join(table.lazy(), on=key, how='left')
+
+        return lines
+
+    def _join_as_of(self, lines, table, key, columns):
+        """
+        Attach the labels of an effective-dated table valid at the pay date of every line.
+
+        Same rows as SalaryAnalyzer._join_nomenclature: the period with the
+        latest start on or before the pay date (first day of the month),
+        labels blanked when the pay date is past its end.
+        """
+        pl = self.pl
+        periods = table[[key, 'Valid_From', 'Valid_To'] + columns].dropna(subset=[key]).copy()
+        periods['Valid_From'] = periods['Valid_From'].fillna(pd.Timestamp('1900-01-01'))
+        periods = pl.from_pandas(periods).with_columns(
+            pl.col('Valid_From').cast(pl.Datetime('us')), pl.col('Valid_To').cast(pl.Datetime('us')))
+
+        month = pl.col('Mois')
+        lines = lines.with_columns(pl.col(key).cast(periods.schema[key], strict=False)).with_row_index('_row')
+        dated = lines.select(['_row', key, 'Annee', 'Mois']).with_columns(
+            pl.when((month >= 1) & (month <= 12) & (month == month.round()))
+            .then(pl.datetime(pl.col('Annee').cast(pl.Int32), month.cast(pl.Int32), 1))
+            .alias('_date'))
+        matched = (dated.join(periods.lazy(), on=key, how='inner')
+                   .filter(pl.col('Valid_From') <= pl.col('_date'))
+                   .group_by('_row').agg(pl.all().sort_by('Valid_From').last())
+                   .filter(pl.col('Valid_To').is_null() | (pl.col('_date') <= pl.col('Valid_To')))
+                   .select(['_row'] + columns))
+        return lines.join(matched, on='_row', how='left').drop('_row')
+
+    def payroll(self):
+        """Cleaned and enriched payroll lines, collected once per data version."""
+        version = self.version()
+        if self._lines is None or self._lines_version != version:
+            print("Scanning payroll data with Polars...")
+            self._lines = self.scan_payroll().collect()
+            self._lines_version = version
+            print(f"Payroll data scanned: {len(self._lines)} records")
+        return self._lines.lazy()
+
+    def _collect(self, queries):
+        """Run several lazy queries in parallel and return pandas tables."""
+        frames = self.pl.collect_all(list(queries.values()))
+        return {name: frame.to_pandas() for name, frame in zip(queries, frames)}
+
+    def _grouped(self, lines, keys, aggregations, names):
+        """Group by keys (rows with missing keys dropped, as pandas does) and sort."""
+        return (lines.drop_nulls(keys)
+                .group_by(keys).agg(aggregations)
+                .sort(keys)
+                .rename(dict(zip(keys, names))))
+
+    def dataset_summary(self):
+        """Records, years, agents and establishments of the payroll lines."""
+        pl = self.pl
+        return self._collect({'summary': self.payroll().select([
+            pl.len().cast(pl.Int64).alias('total_records'),
+            pl.col('Annee').min().alias('first_year'),
+            pl.col('Annee').max().alias('last_year'),
+            pl.col('Id_agent').n_unique().cast(pl.Int64).alias('unique_agents'),
+            pl.col('Codetab').n_unique().cast(pl.Int64).alias('unique_establishments')
+        ])})['summary']
+
+    def staff_evolution(self):
+        """Distinct agents by year, ministry, corps and grade."""
+        pl = self.pl
+        lines = self.payroll()
+        staff = pl.col('Id_agent').n_unique().cast(pl.Int64).alias('Staff_Count')
+        return self._collect({
+            'total': self._grouped(lines, ['Annee'], [staff], ['Year']),
+            'by_ministry': self._grouped(lines, ['Annee', 'Ministry'], [staff], ['Year', 'Ministry']),
+            'by_corps': self._grouped(lines, ['Annee', 'Corps_Name_FR'], [staff], ['Year', 'Corps']),
+            'by_grade': self._grouped(lines, ['Annee', 'Grade_Name_FR'], [staff], ['Year', 'Grade'])
+        })
+
+    def salary_mass(self):
+        """Salary mass by year, ministry and corps, and average salary per agent."""
+        pl = self.pl
+        lines = self.payroll()
+        mass = pl.col('Montind').sum().alias('Salary_Mass')
+        per_agent = lines.group_by(['Annee', 'Id_agent']).agg(pl.col('Montind').sum())
+        return self._collect({
+            'total': self._grouped(lines, ['Annee'], [mass.alias('Total_Salary_Mass')], ['Year']),
+            'by_ministry': self._grouped(lines, ['Annee', 'Ministry'], [mass], ['Year', 'Ministry']),
+            'by_corps': self._grouped(lines, ['Annee', 'Corps_Name_FR'], [mass], ['Year', 'Corps']),
+            'average_per_agent': self._grouped(
+                per_agent, ['Annee'],
+                [pl.col('Montind').mean().alias('Average_Salary_Per_Agent')], ['Year']
+            )
+        })
+
+    def allowances(self):
+        """Allowance amounts and counts by type, by ministry/corps/grade(/code) and per agent."""
+        pl = self.pl
+        lines = self.payroll()
+        amount = pl.col('Montind').sum().alias('Total_Amount')
+        average = pl.col('Montind').mean().alias('Average_Amount')
+        count = pl.col('Montind').count().cast(pl.Int64).alias('Count')
+        detailed_keys = ['Annee', 'Ministry', 'Corps_Name_FR', 'Grade_Name_FR']
+        detailed_names = ['Year', 'Ministry', 'Corps', 'Grade']
+        per_agent = lines.group_by(['Annee', 'Id_agent']).agg(pl.len().alias('Line_Count'))
+        return self._collect({
+            'by_type': self._grouped(lines, ['Annee', 'Type'], [amount, average, count], ['Year', 'Type']),
+            'detailed': self._grouped(lines, detailed_keys, [amount, average, count], detailed_names),
+            'by_code': self._grouped(lines, detailed_keys + ['Codind'], [amount, count],
+                                     detailed_names + ['Codind']),
+            'per_agent': self._grouped(
+                per_agent, ['Annee'],
+                [pl.col('Line_Count').mean().alias('Average_Allowances_Per_Agent')], ['Year']
+            )
+        })
+
+
+def aggregate_year_shard(shard_file):
+    """
+    Compute the staff, salary mass and allowance tables of one year.
+
+    Runs in a worker process: the shard is memory-mapped from its parquet
+    file instead of being pickled from the parent process.
+
+    Args:
+        shard_file (str): Parquet file holding the enriched lines of one year
+
+    Returns:
+        dict: Result name -> tables of the year
+    """
+    return aggregate_lines(pd.read_parquet(shard_file, memory_map=True))
+
+
+def aggregate_lines(merged):
+    """Compute the SHARD_AGGREGATES tables of enriched payroll lines."""
+    facts = agent_year_totals(merged).reset_index()
+    return {name: aggregate(merged, facts) for name, aggregate in SHARD_AGGREGATES.items()}
+
+
+class YearShardedBackend:
+    """Run the pandas aggregations year by year in a pool of processes."""
+
+    def __init__(self, analyzer, workers=None):
+        """
+        Args:
+            analyzer (SalaryAnalyzer): Analyzer holding (or loading) the payroll data
+            workers (int): Number of worker processes (default: number of CPUs)
+        """
+        self.analyzer = analyzer
+        self.workers = workers or os.cpu_count() or 1
+        self._tables = None
+        self._tables_version = None
+
+    def version(self):
+        """Identify the payroll lines and nomenclature tables in memory."""
+        analyzer = self.analyzer
+        if analyzer.main_data is None and not analyzer.load_and_clean_data():
+            raise RuntimeError("Could not load the data files")
+        return f"parallel:{analyzer.results.key('data')}:{analyzer.results.key('nomenclature')}"
+
+    def tables(self):
+        """Tables of every year shard, computed once per data version and concatenated."""
+        version = self.version()
+        if self._tables is not None and self._tables_version == version:
+            return self._tables
+
+        merged = self.analyzer.merge_data_with_nomenclature()
+        self.analyzer.cache_dir.mkdir(parents=True, exist_ok=True)
+        with tempfile.TemporaryDirectory(prefix='year_shards_', dir=self.analyzer.cache_dir) as shard_dir:
+            # One parquet file per year, shared with the workers through the file system
+            shard_files = []
+            for year, lines in merged[SHARD_COLUMNS].groupby('Annee', sort=True):
+                shard_file = Path(shard_dir) / f"year_{year}.parquet"
+                lines.to_parquet(shard_file, index=False)
+                shard_files.append(str(shard_file))
+
+            workers = min(self.workers, len(shard_files)) or 1
+            print(f"Aggregating {len(shard_files)} year shards with {workers} processes...")
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                parts = list(executor.map(aggregate_year_shard, shard_files))
+
+        if not parts:
+            parts = [aggregate_lines(merged[SHARD_COLUMNS])]
+
+        # Every table is keyed by year first: concatenating the shards in
+        # year order gives the same tables as a single groupby
+        self._tables = {
+            name: {
+                table: pd.concat([part[name][table] for part in parts], ignore_index=True)
+                for table in parts[0][name]
+            }
+            for name in SHARD_AGGREGATES
+        }
+        self._tables_version = version
+        return self._tables
+
+    def dataset_summary(self):
+        """Records, years, agents and establishments of the payroll lines."""
+        return self.analyzer._summarize_dataset()
+
+    def staff_evolution(self):
+        """Distinct agents by year, ministry, corps and grade."""
+        return self.tables()['staff_evolution']
+
+    def salary_mass(self):
+        """Salary mass by year, ministry and corps, and average salary per agent."""
+        return self.tables()['salary_mass']
+
+    def allowances(self):
+        """Allowance amounts and counts by type, by ministry/corps/grade(/code) and per agent."""
+        return self.tables()['allowances']
+
+
+# Engines available besides the native pandas pipeline
+ENGINES = {
+    'polars': PolarsBackend,
+    'parallel': YearShardedBackend
+}
+
+
+def get_backend(engine, analyzer, **options):
+    """
+    Create the backend of an execution engine.
+
+    Args:
+        engine (str): Engine name (see ENGINES)
+        analyzer (SalaryAnalyzer): Analyzer providing the data files
+        **options: Engine options (e.g. workers for 'parallel')
+
+    Returns:
+        Backend instance
+    """
+    if engine not in ENGINES:
+        available = ', '.join(['pandas'] + sorted(ENGINES))
+        raise ValueError(f"Unknown engine '{engine}' (available: {available})")
+    return ENGINES[engine](analyzer, **options)
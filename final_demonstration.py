@@ -34,22 +34,17 @@ def main():
     # Data loading
     print("\n2️⃣ DATA LOADING & PROCESSING")
     print("   🔄 Loading 7.9+ million payroll records...")
-    if analyzer.load_and_clean_data():
-        print(f"   ✅ Successfully loaded {len(analyzer.main_data):,} records")
-        print(f"   📅 Date range: {analyzer.main_data['Annee'].min()}-{analyzer.main_data['Annee'].max()}")
-        print(f"   👥 Unique employees: {analyzer.main_data['Id_agent'].nunique():,}")
+    if analyzer.load_or_restore():
+        dataset = analyzer.summarize_dataset()
+        print(f"   ✅ Successfully loaded {dataset['total_records']:,} records")
+        print(f"   📅 Date range: {dataset['first_year']}-{dataset['last_year']}")
+        print(f"   👥 Unique employees: {dataset['unique_agents']:,}")
     else:
         print("   ❌ Failed to load data")
         return
     
-    # Data enrichment
-    print("\n3️⃣ DATA ENRICHMENT")
-    print("   🔄 Merging with nomenclature tables...")
-    analyzer.merge_data_with_nomenclature()
-    print("   ✅ Data enriched with ministry, corps, and grade information")
-    
     # Staff evolution analysis
-    print("\n4️⃣ STAFF EVOLUTION ANALYSIS")
+    print("\n3️⃣ STAFF EVOLUTION ANALYSIS")
     print("   🔄 Calculating staff trends...")
     staff_data = analyzer.calculate_staff_evolution()
     print("   📈 Historical staff evolution (sample):")
@@ -60,7 +55,7 @@ def main():
     print("   ✅ Complete staff analysis available by ministry/corps/grade")
     
     # Salary mass analysis
-    print("\n5️⃣ SALARY MASS ANALYSIS")
+    print("\n4️⃣ SALARY MASS ANALYSIS")
     print("   🔄 Calculating salary mass evolution...")
     salary_data = analyzer.calculate_salary_mass()
     print("   💰 Historical salary mass (sample):")
@@ -71,7 +66,7 @@ def main():
     print("   ✅ Complete salary mass analysis available")
     
     # Allowance analysis
-    print("\n6️⃣ ALLOWANCE ANALYSIS")
+    print("\n5️⃣ ALLOWANCE ANALYSIS")
     print("   🔄 Analyzing allowance distribution...")
     allowance_data = analyzer.analyze_allowances()
     print("   📊 Allowance analysis completed:")
@@ -80,7 +75,7 @@ def main():
     print("   ✅ Detailed allowance analysis available")
     
     # Future predictions
-    print("\n7️⃣ FUTURE PREDICTIONS (2025-2030)")
+    print("\n6️⃣ FUTURE PREDICTIONS (2025-2030)")
     print("   🔄 Generating predictions using ML models...")
     predictions = analyzer.predict_future_trends([2025, 2026, 2027, 2028, 2029, 2030])
     
@@ -105,7 +100,7 @@ def main():
     print("   ✅ Complete predictions available for 2025-2030")
     
     # File outputs
-    print("\n8️⃣ GENERATED OUTPUT FILES")
+    print("\n7️⃣ GENERATED OUTPUT FILES")
     print("   📁 Checking generated files...")
     
     output_files = [
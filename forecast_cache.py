@@ -0,0 +1,165 @@
+"""
+Forecast Result Cache
+=====================
+
+On-disk cache of per-series forecast results, keyed by content.
+
+The key of a series is a hash of its years and values, the forecasting
+method, its parameters, the target years and the version of the
+forecasting code. A re-run on unchanged data serves every series from
+the cache; when the data changes, only the series whose values changed
+are refit. Results are pickled in a SQLite table (one row per series);
+the least recently used rows are evicted above a size cap.
+
+Hits and misses are counted per run (one lookup = one run), see
+hit_rates().
+
+Usage:
+    cache = ForecastCache('cache/forecasts.sqlite')
+    keys = [cache.series_key(years, values, 'Holt', {}, target_years) for ...]
+    found = cache.lookup(keys, run='allowances')  # key -> cached result
+    ...fit the other series...
+    cache.store({key: result, ...})
+"""
+
+import hashlib
+import pickle
+import sqlite3
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Version of the forecasting code: results of another version are never served
+FORECAST_CODE_VERSION = hashlib.sha1(b''.join(
+    (Path(__file__).parent / name).read_bytes()
+    for name in ('batch_forecasting.py', 'forecast_executor.py', 'prediction_intervals.py')
+)).hexdigest()[:12]
+
+
+class ForecastCache:
+    """SQLite cache of forecast results keyed by series content."""
+
+    def __init__(self, path, max_entries=200000):
+        """
+        Args:
+            path (str or Path): SQLite database file of the cache
+            max_entries (int): Size cap (number of cached series)
+        """
+        self.path = Path(path)
+        self.max_entries = max_entries
+        # One row per run: Run, Series, Hits, Misses, Hit_Rate
+        self.runs = []
+
+    @staticmethod
+    def series_key(years, values, method, params, target_years):
+        """
+        Content key of one series forecast.
+
+        Args:
+            years (array): Years of the series
+            values (array): Values of the series (NaN: missing year)
+            method (str): Forecasting method (or cascade) name
+            params (dict): Parameters changing the result
+            target_years (list): Years to predict
+
+        Returns:
+            str: Hexadecimal SHA-1 digest
+        """
+        digest = hashlib.sha1(f"{FORECAST_CODE_VERSION};{method};{sorted(params.items())!r};"
+                              f"{[int(year) for year in target_years]!r};".encode())
+        values = np.asarray(values, dtype=float)
+        # One NaN bit pattern, whatever produced the missing values
+        digest.update(np.asarray(years, dtype=float).tobytes())
+        digest.update(np.where(np.isnan(values), np.nan, values).tobytes())
+        return digest.hexdigest()
+
+    def lookup(self, keys, run='forecasts'):
+        """
+        Fetch the cached results of a run and count its hits and misses.
+
+        Args:
+            keys (list): Content keys of the series of the run
+            run (str): Name of the run in the hit rate report
+
+        Returns:
+            dict: key -> cached result (keys not cached are absent)
+        """
+        keys = list(dict.fromkeys(keys))
+        found = {}
+        try:
+            with self._connect() as connection:
+                for start in range(0, len(keys), 500):
+                    batch = keys[start:start + 500]
+                    rows = connection.execute(
+                        f"SELECT key, result FROM forecasts WHERE key IN ({','.join('?' * len(batch))})",
+                        batch).fetchall()
+                    found.update((key, pickle.loads(result)) for key, result in rows)
+                connection.executemany("UPDATE forecasts SET last_access = ? WHERE key = ?",
+                                       [(time.time(), key) for key in found])
+        except Exception as e:
+            print(f"Warning: Could not read the forecast cache: {e}")
+            found = {}
+
+        hits = len(found)
+        self.runs.append({'Run': run, 'Series': len(keys), 'Hits': hits, 'Misses': len(keys) - hits,
+                          'Hit_Rate': round(hits / len(keys) * 100, 1) if keys else 0.0})
+        print(f"Forecast cache ({run}): {hits}/{len(keys)} series served from cache"
+              + (f" ({hits / len(keys):.0%} hit rate)" if keys else ""))
+        return found
+
+    def store(self, results):
+        """
+        Cache forecast results, then evict old entries above the size cap.
+
+        Args:
+            results (dict): key -> result
+        """
+        if not results:
+            return
+        now = time.time()
+        try:
+            with self._connect() as connection:
+                connection.executemany(
+                    "INSERT OR REPLACE INTO forecasts (key, result, last_access) VALUES (?, ?, ?)",
+                    [(key, pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL), now)
+                     for key, result in results.items()])
+                connection.execute(
+                    "DELETE FROM forecasts WHERE key IN (SELECT key FROM forecasts "
+                    "ORDER BY last_access DESC LIMIT -1 OFFSET ?)", (self.max_entries,))
+        except Exception as e:
+            print(f"Warning: Could not store forecasts in the cache: {e}")
+
+    def hit_rates(self):
+        """
+        Hit rate of every run since the cache was opened.
+
+        Returns:
+            DataFrame: One row per run: Run, Series, Hits, Misses, Hit_Rate (%)
+        """
+        return pd.DataFrame(self.runs, columns=['Run', 'Series', 'Hits', 'Misses', 'Hit_Rate'])
+
+    def clear(self):
+        """Delete every cached result."""
+        self.path.unlink(missing_ok=True)
+
+    def __len__(self):
+        if not self.path.exists():
+            return 0
+        with self._connect() as connection:
+            return connection.execute("SELECT COUNT(*) FROM forecasts").fetchone()[0]
+
+    @contextmanager
+    def _connect(self):
+        """Open the database (creating its table if needed) for one transaction."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(self.path)
+        try:
+            connection.execute("CREATE TABLE IF NOT EXISTS forecasts "
+                               "(key TEXT PRIMARY KEY, result BLOB, last_access REAL)")
+            with connection:
+                yield connection
+        finally:
+            connection.close()
@@ -0,0 +1,543 @@
+"""
+Forecast Executor
+=================
+
+Per-series forecasting with a cost-aware model cascade, and its execution
+on many series in a pool of processes.
+
+Model cascade: the cheap models (linear trend, drift) are fitted first
+and validated on the last HOLDOUT_YEARS years of the series. The
+expensive model (ARIMA) is only fitted when the best cheap model misses
+the holdout by more than ESCALATION_ERROR, and only while the time budget
+of the run is not exhausted. All models are compared on the same holdout
+error (WAPE), so their scores are comparable. A Random Forest on the
+year alone cannot extrapolate a trend and is not part of the cascade.
+
+Series are sent to the workers in chunks (one task per chunk rather than
+per series) to amortize pickling and scheduling. The models are
+deterministic, so a series gets the same forecast whatever the worker or
+chunk it lands in: without a time budget, the results are identical to
+the serial path.
+
+Every series fit has a timeout (SIGALRM, Unix only). A series whose fit
+exceeds it is refit without ARIMA, the only model with an unbounded fit
+time, and reported as timed out, so one non-converging ARIMA cannot stall
+the whole run.
+
+With a ForecastCache, series whose values are unchanged since a previous
+run with the same cascade settings (holdout, escalation threshold,
+timeout, time budget) are served from the cache and only the other
+series are fitted.
+
+Prediction intervals: residual bootstrap for the cheap models (computed
+for all the series of a run at once, after the chunks, see
+prediction_intervals), statsmodels' analytic intervals for ARIMA.
+
+cascade_forecast runs the cascade on the rows of a series x years matrix,
+with the signature of the batched methods, so that it can be backtested
+like them. forecast_tasks forecasts the same tasks with one batched method
+instead of the cascade.
+
+Usage:
+    tasks = [(ministry, data, 'Staff_Count') for ministry, data in ...]
+    results = forecast_series(tasks, [2025, 2026], workers=8, timeout=30,
+                              time_budget=600)
+    summarize_model_choices(results)  # models chosen, escalations
+"""
+
+import math
+import os
+import signal
+import threading
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import LinearRegression
+from statsmodels.tsa.arima.model import ARIMA
+
+from batch_forecasting import method_forecast, series_result, task_matrix
+from prediction_intervals import INTERVAL_COVERAGE, bootstrap_intervals, method_intervals
+
+# Models of the cascade, by cost: cheap models are always fitted,
+# expensive ones only when the cheap models miss the holdout
+CHEAP_MODELS = ['Linear Regression', 'Drift']
+EXPENSIVE_MODELS = ['ARIMA']
+
+# Last years of a series held out to validate the models
+HOLDOUT_YEARS = 3
+
+# Holdout error (WAPE) above which the cascade escalates to expensive models
+ESCALATION_ERROR = 0.02
+
+# Minimum number of training years of an ARIMA(1, 1, 1)
+ARIMA_MIN_POINTS = 8
+
+# Chunks submitted per worker (load balancing vs. task overhead)
+CHUNKS_PER_WORKER = 4
+
+
+class SeriesTimeout(BaseException):
+    """
+    Raised in a series fit when its timeout expires.
+
+    Derived from BaseException so that the error handling of the models
+    (except Exception) does not swallow it.
+    """
+
+
+def fit_and_forecast(model, years, values, forecast_years, coverage=None):
+    """
+    Fit one model of the cascade and forecast some years.
+
+    Args:
+        model (str): Model name (CHEAP_MODELS or EXPENSIVE_MODELS)
+        years (ndarray): Observed years (sorted)
+        values (ndarray): Observed values
+        forecast_years (array): Years to forecast (after the observed years)
+        coverage (float): Also return the analytic prediction interval of
+            this probability (None: forecasts only)
+
+    Returns:
+        ndarray: Forecasts of forecast_years, or (forecasts, lower, upper)
+            with a coverage (NaN bounds for the models without an analytic
+            interval)
+    """
+    forecast_years = np.asarray(forecast_years, dtype=float)
+
+    if model == 'Linear Regression':
+        lr_model = LinearRegression()
+        lr_model.fit(years.reshape(-1, 1), values)
+        forecast = lr_model.predict(forecast_years.reshape(-1, 1))
+    elif model == 'Drift':
+        # Last value plus the average yearly change
+        span = years[-1] - years[0]
+        slope = (values[-1] - values[0]) / span if span > 0 else 0.0
+        forecast = values[-1] + slope * (forecast_years - years[-1])
+    elif model == 'ARIMA':
+        ts_data = pd.Series(values, index=pd.to_datetime(years.astype(int).astype(str), format='%Y'))
+        arima_fitted = ARIMA(ts_data, order=(1, 1, 1)).fit()
+        # Forecast up to the last requested year, then pick the requested ones
+        steps = (forecast_years - years[-1]).astype(int)
+        arima_forecast = arima_fitted.get_forecast(steps=int(steps.max()))
+        forecast = arima_forecast.predicted_mean.to_numpy()[steps - 1]
+        if coverage is not None:
+            bounds = arima_forecast.conf_int(alpha=1 - coverage).to_numpy()[steps - 1]
+            return forecast, bounds[:, 0], bounds[:, 1]
+    else:
+        raise ValueError(f"Unknown forecasting model '{model}'")
+
+    if coverage is not None:
+        return forecast, np.full(len(forecast), np.nan), np.full(len(forecast), np.nan)
+    return forecast
+
+
+def holdout_error(actual, predicted):
+    """Weighted absolute percentage error (sum |error| / sum |actual|) of a holdout."""
+    scale = np.abs(actual).sum()
+    error = np.abs(actual - predicted).sum()
+    return error / scale if scale > 0 else (0.0 if error == 0 else np.inf)
+
+
+def predict_time_series(data, value_column, target_years, use_arima=True, deadline=None, intervals=True):
+    """
+    Predict a time series with the model cascade.
+
+    Args:
+        data (DataFrame): Historical data
+        value_column (str): Column name containing values to predict
+        target_years (list): Years to predict
+        use_arima (bool): Allow the escalation to ARIMA
+        deadline (float): time.time() after which the cascade no longer
+            escalates to expensive models (None: no time budget)
+        intervals (bool): Bootstrap the prediction interval of a cheap
+            model (False: ±1.96 std, left to a batched bootstrap of many
+            series, see forecast_series)
+
+    Returns:
+        dict: Prediction results with confidence intervals; 'score' is
+            1 - holdout error of the chosen model (in-sample R² of the
+            linear trend when the series is too short to hold years out),
+            'models_tried' the models fitted by the cascade
+    """
+    try:
+        # Prepare data
+        history = data[['Year', value_column]].dropna().sort_values('Year')
+        years = history['Year'].to_numpy(dtype=float)
+        y = history[value_column].to_numpy(dtype=float)
+        if len(y) == 0:
+            raise ValueError(f"no {value_column} values")
+
+        validate = len(y) >= HOLDOUT_YEARS + 3
+        errors = {}
+        models_tried = []
+        escalated = False
+        budget_exhausted = False
+
+        def validate_model(model):
+            models_tried.append(model)
+            if validate:
+                predicted = fit_and_forecast(model, years[:-HOLDOUT_YEARS], y[:-HOLDOUT_YEARS],
+                                             years[-HOLDOUT_YEARS:])
+                errors[model] = holdout_error(y[-HOLDOUT_YEARS:], predicted)
+
+        # Stage 1: cheap models
+        for model in CHEAP_MODELS:
+            validate_model(model)
+
+        # Stage 2: expensive models, only if the cheap ones miss the holdout
+        best = min(errors, key=errors.get) if errors else 'Linear Regression'
+        if (validate and errors[best] > ESCALATION_ERROR and use_arima
+                and len(y) - HOLDOUT_YEARS >= ARIMA_MIN_POINTS):
+            if deadline is not None and time.time() >= deadline:
+                budget_exhausted = True
+            else:
+                escalated = True
+                for model in EXPENSIVE_MODELS:
+                    try:
+                        validate_model(model)
+                    except Exception:
+                        pass  # Not converging: the model is not a candidate
+                best = min(errors, key=errors.get)
+
+        # Refit on the whole history: every cheap model, and the chosen one
+        all_methods = {}
+        bounds = {}
+        for model in models_tried:
+            if model in CHEAP_MODELS or model == best:
+                try:
+                    all_methods[model], *bounds[model] = fit_and_forecast(model, years, y, target_years,
+                                                                          coverage=INTERVAL_COVERAGE)
+                except Exception:
+                    pass
+        if best not in all_methods:
+            best = min((m for m in errors if m in all_methods), key=errors.get, default='Linear Regression')
+
+        best_predictions = all_methods[best]
+        if validate:
+            best_score = float(1 - errors[best])
+        else:
+            lr_model = LinearRegression().fit(years.reshape(-1, 1), y)
+            best_score = float(lr_model.score(years.reshape(-1, 1), y)) if len(y) > 1 else 0.0
+
+        confidence_lower, confidence_upper = bounds[best]
+        if intervals and best in CHEAP_MODELS:
+            # Bootstrap on the consecutive years of the series
+            row = np.full(int(years[-1] - years[0]) + 1, np.nan)
+            row[(years - years[0]).astype(int)] = y
+            lower, upper = bootstrap_intervals(np.arange(years[0], years[-1] + 1), row, target_years, best,
+                                               predictions=best_predictions)
+            confidence_lower, confidence_upper = lower[0], upper[0]
+        if not (np.isfinite(confidence_lower).all() and np.isfinite(confidence_upper).all()):
+            # Too short to bootstrap: ±1.96 std of the values
+            historical_std = np.std(y)
+            confidence_lower = best_predictions - 1.96 * historical_std
+            confidence_upper = best_predictions + 1.96 * historical_std
+
+        return {
+            'years': target_years,
+            'predictions': best_predictions.tolist(),
+            'confidence_lower': confidence_lower.tolist(),
+            'confidence_upper': confidence_upper.tolist(),
+            'method': best,
+            'score': best_score,
+            'validation_error': float(errors[best]) if validate else None,
+            'models_tried': models_tried,
+            'escalated': escalated,
+            'budget_exhausted': budget_exhausted,
+            'all_methods': {name: pred.tolist() for name, pred in all_methods.items()}
+        }
+
+    except Exception as e:
+        print(f"Error in time series prediction: {e}")
+        return {
+            'years': target_years,
+            'predictions': [],
+            'confidence_lower': [],
+            'confidence_upper': [],
+            'method': 'None',
+            'score': 0,
+            'all_methods': {}
+        }
+
+
+@contextmanager
+def series_timeout(seconds):
+    """
+    Raise SeriesTimeout in the enclosed block after a number of seconds.
+
+    No timeout where SIGALRM is unavailable (Windows) or outside the main
+    thread (signals are only delivered there).
+
+    Args:
+        seconds (float): Timeout (None: no timeout)
+    """
+    if (not seconds or not hasattr(signal, 'SIGALRM')
+            or threading.current_thread() is not threading.main_thread()):
+        yield
+        return
+
+    def expire(signum, frame):
+        raise SeriesTimeout()
+
+    previous = signal.signal(signal.SIGALRM, expire)
+    try:
+        signal.setitimer(signal.ITIMER_REAL, seconds)
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def forecast_chunk(chunk, target_years, timeout=None, deadline=None):
+    """
+    Forecast a chunk of series (runs in a worker process or in-process).
+
+    Args:
+        chunk (list): (key, data, value_column) of every series
+        target_years (list): Years to predict
+        timeout (float): Timeout of every series fit in seconds (None: no timeout)
+        deadline (float): time.time() after which expensive models are skipped
+
+    Returns:
+        list: (key, result, timed_out) of every series, in chunk order
+    """
+    warnings.filterwarnings('ignore')
+    results = []
+    for key, data, value_column in chunk:
+        try:
+            with series_timeout(timeout):
+                result = predict_time_series(data, value_column, target_years, deadline=deadline, intervals=False)
+            timed_out = False
+        except SeriesTimeout:
+            result = predict_time_series(data, value_column, target_years, use_arima=False, intervals=False)
+            timed_out = True
+        results.append((key, result, timed_out))
+    return results
+
+
+def forecast_series(tasks, target_years, workers=1, timeout=None, chunk_size=None,
+                    time_budget=None, cache=None, cache_run='forecasts'):
+    """
+    Forecast many series, in a pool of processes when workers > 1.
+
+    Args:
+        tasks (list): (key, data, value_column) of every series; data holds
+            the Year and value columns
+        target_years (list): Years to predict
+        workers (int): Number of worker processes (None: number of CPUs, 1: serial)
+        timeout (float): Timeout of every series fit in seconds (None: no timeout)
+        chunk_size (int): Series per task (default: about CHUNKS_PER_WORKER
+            tasks per worker)
+        time_budget (float): Seconds after which the remaining series are
+            forecast with the cheap models only (None: no budget)
+        cache (ForecastCache): Cache of the results of unchanged series
+            (None: every series is fitted)
+        cache_run (str): Name of the run in the cache hit rates
+
+    Returns:
+        dict: key -> prediction result (see predict_time_series), in task order
+    """
+    workers = workers or os.cpu_count() or 1
+    deadline = time.time() + time_budget if time_budget is not None else None
+    # Only the columns the models read are pickled to the workers
+    tasks = [(key, data[['Year', value_column]], value_column) for key, data, value_column in tasks]
+    if not tasks:
+        return {}
+    order = [key for key, _, _ in tasks]
+
+    cached = {}
+    if cache is not None:
+        # Settings that change the cascade results (the workers and the chunk size do not)
+        params = {'holdout_years': HOLDOUT_YEARS, 'escalation_error': ESCALATION_ERROR,
+                  'arima_min_points': ARIMA_MIN_POINTS, 'coverage': INTERVAL_COVERAGE,
+                  'timeout': timeout, 'time_budget': time_budget}
+        content_keys = {key: cache.series_key(data['Year'], data[value_column], 'cascade', params, target_years)
+                        for key, data, value_column in tasks}
+        found = cache.lookup(content_keys.values(), run=cache_run)
+        cached = {key: found[content_key] for key, content_key in content_keys.items() if content_key in found}
+        tasks = [task for task in tasks if task[0] not in cached]
+
+    if chunk_size is None:
+        chunk_size = max(1, math.ceil(len(tasks) / (workers * CHUNKS_PER_WORKER)))
+    chunks = [tasks[start:start + chunk_size] for start in range(0, len(tasks), chunk_size)]
+
+    if workers > 1 and len(chunks) > 1:
+        workers = min(workers, len(chunks))
+        print(f"Forecasting {len(tasks)} series in {len(chunks)} chunks with {workers} processes...")
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            parts = list(executor.map(forecast_chunk, chunks, [target_years] * len(chunks),
+                                      [timeout] * len(chunks), [deadline] * len(chunks)))
+    else:
+        parts = [forecast_chunk(chunk, target_years, timeout, deadline) for chunk in chunks]
+
+    results = {}
+    timed_out = []
+    for part in parts:
+        for key, result, expired in part:
+            results[key] = result
+            if expired:
+                timed_out.append(key)
+    bootstrap_cascade_intervals(tasks, results, target_years)
+
+    if cache is not None:
+        # Results cut short by the timeout or the time budget are not reusable
+        cache.store({content_keys[key]: result for key, result in results.items()
+                     if key not in timed_out and not result.get('budget_exhausted', False)})
+    results = {key: cached[key] if key in cached else results[key] for key in order}
+
+    if timed_out:
+        print(f"Warning: {len(timed_out)} series exceeded the {timeout}s timeout "
+              f"and were forecast without ARIMA: {timed_out[:5]}{'...' if len(timed_out) > 5 else ''}")
+
+    usage = summarize_model_choices(results)
+    print("Models chosen: " + ", ".join(f"{method} {count}" for method, count in usage['Series'].items())
+          + f" (escalated: {int(usage['Escalated'].sum())}, budget exhausted: {int(usage['Budget_Exhausted'].sum())})")
+    return results
+
+
+def cascade_forecast(years, values, forecast_years, **options):
+    """
+    Forecast the rows of a matrix with the model cascade, one series at a time.
+
+    Same signature as the batched methods, so that the per-series path can
+    be backtested like them (see backtesting.rolling_origin_backtest).
+
+    Args:
+        years (array): Years of the matrix columns
+        values (ndarray): Series x years matrix (NaN: missing year)
+        forecast_years (array): Years to forecast
+        **options: Options of forecast_series (workers, timeout, ...)
+
+    Returns:
+        ndarray: Series x forecast years (NaN for years up to the last
+            observed year of a series)
+    """
+    years = np.asarray(years, dtype=float)
+    values = np.atleast_2d(np.asarray(values, dtype=float))
+    forecast_years = np.asarray(forecast_years, dtype=float)
+    forecasts = np.full((values.shape[0], len(forecast_years)), np.nan)
+    observed = ~np.isnan(values)
+
+    # One run per last observed year: the years after it are forecast
+    last_year = np.where(observed.any(axis=1), years[values.shape[1] - 1 - observed[:, ::-1].argmax(axis=1)], np.nan)
+    for year in np.unique(last_year[~np.isnan(last_year)]):
+        columns = np.flatnonzero(forecast_years > year)
+        if len(columns) == 0:
+            continue
+        tasks = [(row, pd.DataFrame({'Year': years[observed[row]], 'Value': values[row, observed[row]]}), 'Value')
+                 for row in np.flatnonzero(last_year == year)]
+        results = forecast_series(tasks, forecast_years[columns].astype(int).tolist(), **options)
+        for row, result in results.items():
+            if len(result['predictions']) == len(columns):
+                forecasts[row, columns] = result['predictions']
+    return forecasts
+
+
+def forecast_tasks(tasks, target_years, method, cache=None, cache_run='forecasts'):
+    """
+    Forecast a list of series with one batched method.
+
+    Same tasks and results as forecast_series, but all series are stacked
+    in one matrix and forecast together with a method of
+    batch_forecasting.BATCH_METHODS (no cascade, no worker processes).
+
+    Args:
+        tasks (list): (key, data, value_column) of every series; data holds
+            the Year and value columns
+        target_years (list): Years to predict
+        method (str): Name of a BATCH_METHODS method
+        cache (ForecastCache): Cache of the results of unchanged series
+            (None: every series is fitted)
+        cache_run (str): Name of the run in the cache hit rates
+
+    Returns:
+        dict: key -> prediction result, in task order (series the method
+            cannot forecast get empty predictions); confidence bounds from
+            the residual bootstrap of the method
+    """
+    if not tasks:
+        return {}
+    matrix = task_matrix(tasks)
+    values = matrix.to_numpy(dtype=float)
+
+    # A series result only depends on its row and on the years of the matrix
+    cached = {}
+    if cache is not None:
+        content_keys = [cache.series_key(matrix.columns, row, method, {}, target_years) for row in values]
+        cached = cache.lookup(content_keys, run=cache_run)
+    fitted = [row for row in range(len(tasks)) if cache is None or content_keys[row] not in cached]
+    forecasts = method_forecast(matrix.columns, values[fitted], target_years, method)
+    lower, upper = bootstrap_intervals(matrix.columns, values[fitted], target_years, method,
+                                       predictions=forecasts['predictions'])
+
+    results = {}
+    for position, row in enumerate(fitted):
+        error = forecasts['validation_error'][position]
+        results[tasks[row][0]] = series_result(
+            target_years, forecasts['predictions'][position], forecasts['std'][position], method,
+            score=float(1 - error) if np.isfinite(error) else 0.0,
+            lower=lower[position], upper=upper[position],
+            validation_error=float(error) if np.isfinite(error) else None)
+
+    if cache is not None:
+        cache.store({content_keys[row]: results[tasks[row][0]] for row in fitted})
+    return {key: results[key] if key in results else cached[content_keys[row]]
+            for row, (key, _, _) in enumerate(tasks)}
+
+
+def bootstrap_cascade_intervals(tasks, results, target_years):
+    """
+    Replace the ±1.96 std intervals of the cheap models by bootstrap intervals.
+
+    All the series are bootstrapped at once (grouped by chosen model),
+    rather than one series at a time in the workers.
+
+    Args:
+        tasks (list): (key, data, value_column) of every series
+        results (dict): key -> prediction result of forecast_chunk, updated
+            in place
+        target_years (list): Years predicted
+    """
+    tasks = [task for task in tasks if results[task[0]]['method'] in CHEAP_MODELS
+             and len(results[task[0]]['predictions']) == len(target_years)]
+    if not tasks:
+        return
+    matrix = task_matrix(tasks)
+    lower, upper = method_intervals(matrix.columns, matrix.to_numpy(dtype=float), target_years,
+                                    [results[key]['method'] for key, _, _ in tasks],
+                                    [results[key]['predictions'] for key, _, _ in tasks])
+    for row, (key, _, _) in enumerate(tasks):
+        if np.isfinite(lower[row]).all() and np.isfinite(upper[row]).all():
+            results[key]['confidence_lower'] = lower[row].tolist()
+            results[key]['confidence_upper'] = upper[row].tolist()
+
+
+def summarize_model_choices(results):
+    """
+    Count the models chosen by the cascade.
+
+    Args:
+        results (dict): key -> prediction result (see predict_time_series)
+
+    Returns:
+        DataFrame: One row per chosen model: Series, Share (%), Escalated
+            (series for which expensive models were fitted) and
+            Budget_Exhausted (series not escalated for lack of time)
+    """
+    rows = pd.DataFrame([{
+        'Method': result.get('method', 'None'),
+        'Escalated': bool(result.get('escalated', False)),
+        'Budget_Exhausted': bool(result.get('budget_exhausted', False))
+    } for result in results.values()], columns=['Method', 'Escalated', 'Budget_Exhausted'])
+
+    usage = rows.groupby('Method').agg(
+        Series=('Method', 'size'),
+        Escalated=('Escalated', 'sum'),
+        Budget_Exhausted=('Budget_Exhausted', 'sum')
+    ).sort_values('Series', ascending=False)
+    usage.insert(1, 'Share', (usage['Series'] / max(len(rows), 1) * 100).round(1))
+    return usage
@@ -0,0 +1,142 @@
+"""
+Global Forecasting
+==================
+
+One forecasting model pooled across all the series of a matrix.
+
+Instead of fitting one model per series, a single ridge regression is
+trained on the examples of every series: from every observed year
+(origin) of a series and every horizon h, the target is the average
+yearly log growth from the origin to h years later. The features are:
+
+- lags: log growth from the 1..GLOBAL_LAGS previous years to the origin
+  (with a flag for every missing lag)
+- horizon h and year trend (origin year, relative to the last year)
+- one-hot encoding of the series identifiers (e.g. ministry, corps,
+  grade and allowance code), so that series of the same corps share
+  their growth
+
+Series of any scale share the model since it works on growth rates. The
+forecasts of every series and year come from a single predict call, from
+the last observed value of the series.
+
+Usage:
+    matrix = year_matrix(by_code, ['Ministry', 'Corps', 'Grade', 'Codind'], 'Total_Amount')
+    members = matrix.index.to_frame(index=False)
+    forecasts = global_forecast(matrix.columns, matrix.to_numpy(), [2025, 2026], members)
+    rolling_origin_backtest(matrix, methods={'Global Ridge': global_method(members)})
+"""
+
+import numpy as np
+import scipy.sparse as sp
+from sklearn.linear_model import Ridge
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+# Number of lagged years in the features
+GLOBAL_LAGS = 3
+
+# Ridge penalty of the global model
+GLOBAL_RIDGE_ALPHA = 1.0
+
+
+def _features(log_values, years, series, origin, horizon, lags):
+    """Numeric features of examples (series, origin column, horizon)."""
+    columns = []
+    missing = []
+    for lag in range(1, lags + 1):
+        previous = np.where(origin >= lag, log_values[series, np.maximum(origin - lag, 0)], np.nan)
+        growth = previous - log_values[series, origin]
+        columns.append(np.nan_to_num(growth))
+        missing.append(np.isnan(growth).astype(float))
+    return np.column_stack(columns + missing + [horizon, years[origin] - years[-1]])
+
+
+def global_forecast(years, values, forecast_years, members=None, lags=GLOBAL_LAGS, alpha=GLOBAL_RIDGE_ALPHA):
+    """
+    Fit one ridge model on all series and forecast every series with it.
+
+    Args:
+        years (array): Years of the matrix columns (consecutive)
+        values (ndarray): Series x years matrix (NaN: missing year; values
+            that are not positive are treated as missing)
+        forecast_years (array): Years to forecast
+        members (DataFrame): Identifiers of every series (one row per
+            series, one-hot encoded; None: no series encoding)
+        lags (int): Number of lagged years in the features
+        alpha (float): Ridge penalty
+
+    Returns:
+        ndarray: Series x forecast years (NaN for series without a positive
+            value and for years up to the last observed year of a series)
+    """
+    years = np.asarray(years, dtype=float)
+    values = np.atleast_2d(np.asarray(values, dtype=float))
+    forecast_years = np.asarray(forecast_years, dtype=float)
+    n_series, n_years = values.shape
+    forecasts = np.full((n_series, len(forecast_years)), np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        log_values = np.where(values > 0, np.log(values), np.nan)
+    observed = ~np.isnan(log_values)
+    if n_series == 0 or n_years < 2 or len(forecast_years) == 0:
+        return forecasts
+
+    # Forecasts start at the last observed year of every series
+    last = n_years - 1 - observed[:, ::-1].argmax(axis=1)
+    known = observed.any(axis=1)
+    steps = forecast_years[None, :] - years[last][:, None]
+    predicted = known[:, None] & (steps >= 1)
+
+    # Training examples: every observed origin and horizon with an observed target
+    max_horizon = int(min(n_years - 1, max(steps.max(), 1)))
+    parts = []
+    for horizon in range(1, max_horizon + 1):
+        series, origin = np.nonzero(observed[:, :-horizon] & observed[:, horizon:])
+        target = (log_values[series, origin + horizon] - log_values[series, origin]) / horizon
+        parts.append((series, origin, np.full(len(series), float(horizon)), target))
+    series, origin, horizon, target = (np.concatenate(part) for part in zip(*parts))
+    if len(target) == 0 or not predicted.any():
+        return forecasts
+
+    rows, columns = np.nonzero(predicted)
+    numeric = _features(log_values, years, series, origin, horizon, lags)
+    scaler = StandardScaler().fit(numeric)
+    encoding = None
+    if members is not None and members.shape[1] > 0:
+        encoding = OneHotEncoder(handle_unknown='ignore').fit_transform(members.astype(str)).tocsr()
+
+    def design(series, numeric):
+        scaled = sp.csr_matrix(scaler.transform(numeric))
+        return sp.hstack([scaled, encoding[series]]).tocsr() if encoding is not None else scaled
+
+    model = Ridge(alpha=alpha).fit(design(series, numeric), target)
+
+    # Every series and forecast year in one predict call
+    prediction_numeric = _features(log_values, years, rows, last[rows], steps[rows, columns], lags)
+    growth = model.predict(design(rows, prediction_numeric))
+    forecasts[rows, columns] = np.exp(log_values[rows, last[rows]] + steps[rows, columns] * growth)
+    return forecasts
+
+
+def global_method(members, **options):
+    """
+    Global model as a backtest method (see backtesting.rolling_origin_backtest).
+
+    The backtest stacks the series of the matrix origin by origin (one
+    block of len(members) rows per origin, masked after the origin): one
+    model is fitted per block, on the years up to its origin only.
+
+    Args:
+        members (DataFrame): Identifiers of the series of the matrix
+        **options: Options of global_forecast
+
+    Returns:
+        function: (years, values, forecast_years) -> series x forecast years
+    """
+    n_series = len(members)
+
+    def forecast(years, values, forecast_years):
+        blocks = [global_forecast(years, values[start:start + n_series], forecast_years, members, **options)
+                  for start in range(0, len(values), n_series)]
+        return np.vstack(blocks) if blocks else np.empty((0, len(forecast_years)))
+
+    return forecast
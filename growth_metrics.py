@@ -0,0 +1,119 @@
+"""
+Growth Metrics
+==============
+
+Vectorized growth indicators for every member of a dimension at once.
+
+A long table (dimension columns, year, value) is pivoted to a
+members x years matrix. Year-over-year growth, rolling averages, total
+growth and CAGR are then computed with array operations on the whole
+matrix, instead of filtering the table member by member.
+
+Usage:
+    metrics = growth_metrics(staff_evolution['by_corps'], ['Corps'], 'Staff_Count')
+    metrics['summary']      # one row per corps: total growth, CAGR, ...
+    metrics['yoy_growth']   # corps x years matrix of YoY growth (%)
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def year_matrix(table, dimensions, value_column, year_column='Year'):
+    """
+    Pivot a long table to a members x years matrix.
+
+    Args:
+        table (DataFrame): Long table with the dimension, year and value columns
+        dimensions (list): Columns identifying a member (empty: one 'Total' member)
+        value_column (str): Column holding the values
+        year_column (str): Column holding the years
+
+    Returns:
+        DataFrame: One row per member, one column per year of the full
+            year range (NaN where a member has no value)
+    """
+    dimensions = list(dimensions)
+    if dimensions:
+        matrix = (table.groupby(dimensions + [year_column])[value_column]
+                  .sum(min_count=1).unstack(year_column))
+    else:
+        matrix = table.groupby(year_column)[value_column].sum(min_count=1).to_frame('Total').T
+        matrix.index.name = 'Member'
+
+    if matrix.shape[1] == 0:
+        return matrix
+    years = matrix.columns.astype(int)
+    matrix.columns = years
+    return matrix.reindex(columns=range(years.min(), years.max() + 1))
+
+
+def growth_metrics(table, dimensions, value_column, year_column='Year', window=3):
+    """
+    Compute YoY growth, rolling averages, total growth and CAGR for every member.
+
+    Args:
+        table (DataFrame): Long table with the dimension, year and value columns
+        dimensions (list): Columns identifying a member (empty: the whole table)
+        value_column (str): Column holding the values
+        year_column (str): Column holding the years
+        window (int): Number of years of the rolling average
+
+    Returns:
+        dict: 'matrix' (values), 'yoy_growth' (%), 'rolling_average' (members x
+            years matrices) and 'summary' (one row per member)
+    """
+    matrix = year_matrix(table, dimensions, value_column, year_column)
+    if matrix.shape[1] == 0:
+        raise ValueError(f"No {value_column} values to compute growth metrics from")
+
+    values = matrix.to_numpy(dtype=float)
+    years = np.asarray(matrix.columns, dtype=int)
+    n_members, n_years = values.shape
+    valid = ~np.isnan(values)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Year-over-year growth against the previous year of the same member
+        yoy = np.full_like(values, np.nan)
+        previous = values[:, :-1]
+        yoy[:, 1:] = np.where(previous != 0, values[:, 1:] / previous - 1, np.nan) * 100
+
+        # Rolling average over complete windows, from cumulative sums
+        rolling = np.full_like(values, np.nan)
+        if n_years >= window:
+            sums = np.cumsum(np.pad(np.where(valid, values, 0.0), ((0, 0), (1, 0))), axis=1)
+            counts = np.cumsum(np.pad(valid.astype(int), ((0, 0), (1, 0))), axis=1)
+            window_sums = sums[:, window:] - sums[:, :-window]
+            window_counts = counts[:, window:] - counts[:, :-window]
+            rolling[:, window - 1:] = np.where(window_counts == window, window_sums / window, np.nan)
+
+        # First and last observed year of every member
+        rows = np.arange(n_members)
+        first = valid.argmax(axis=1)
+        last = n_years - 1 - valid[:, ::-1].argmax(axis=1)
+        observed = valid.any(axis=1)
+        first_value = values[rows, first]
+        last_value = values[rows, last]
+        span = years[last] - years[first]
+
+        total_growth = np.where(observed & (first_value != 0), last_value / first_value - 1, np.nan) * 100
+        cagr = np.where(observed & (span > 0) & (first_value > 0) & (last_value >= 0),
+                        (last_value / first_value) ** (1 / np.maximum(span, 1)) - 1, np.nan) * 100
+
+    summary = pd.DataFrame({
+        'First_Year': years[first],
+        'Last_Year': years[last],
+        'First_Value': first_value,
+        'Last_Value': last_value,
+        'Total_Growth': total_growth,
+        'CAGR': cagr,
+        'Latest_YoY_Growth': yoy[rows, last],
+        f'Rolling_{window}Y_Average': rolling[rows, last]
+    }, index=matrix.index).reset_index()
+
+    return {
+        'matrix': matrix,
+        'yoy_growth': pd.DataFrame(yoy, index=matrix.index, columns=matrix.columns),
+        'rolling_average': pd.DataFrame(rolling, index=matrix.index, columns=matrix.columns),
+        'summary': summary
+    }
@@ -0,0 +1,154 @@
+"""
+Hierarchical Forecasting
+========================
+
+Reconciliation of forecasts made independently at every level of a
+hierarchy (total, ministry, corps, grade), so that they add up.
+
+The hierarchy is described by its summing matrix S (nodes x bottom
+series): row i holds a 1 for every bottom series summed into node i. The
+aggregate nodes come first, the bottom series last (S = [A; I]). S is
+built once from the bottom-level keys as a sparse matrix.
+
+Reconciliation methods:
+- 'bottom_up': aggregates are the sums of the bottom forecasts (S @ y_bottom)
+- 'ols': closest coherent forecasts to the base forecasts (W = I)
+- 'mint': MinT with the diagonal estimate of the base forecast error
+  covariance (W = diag of the holdout error variances), so that
+  unreliable forecasts are adjusted more than reliable ones
+
+'ols' and 'mint' minimize (y - y_base)' W^-1 (y - y_base) subject to the
+aggregation constraints C y = 0 (C = [I, -A]). The constraints are solved
+with their sparse KKT system, one factorization for all forecast years,
+instead of adjusting the nodes one by one (the equivalent closed form
+S (S' W^-1 S)^-1 S' W^-1 y_base is dense, since the total sums every
+bottom series).
+
+Usage:
+    summing, nodes = summing_matrix(members, FORECAST_LEVELS)
+    reconciled = reconcile_forecasts(base, summing, method='mint', variances=variances)
+"""
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.sparse.linalg import splu
+
+# Reconciliation methods (see reconcile_forecasts)
+RECONCILIATION_METHODS = ['bottom_up', 'ols', 'mint']
+
+
+def summing_matrix(members, levels):
+    """
+    Build the sparse summing matrix of a hierarchy.
+
+    Args:
+        members (DataFrame): Key columns of the bottom series, one row per series
+        levels (dict): Level name -> key columns, from the top (empty keys:
+            grand total) to the bottom level (the key columns of members)
+
+    Returns:
+        tuple: (summing matrix: CSR, nodes x bottom series; nodes: DataFrame
+            with the Level and key columns of every node, in matrix order)
+    """
+    members = members.reset_index(drop=True)
+    n_bottom = len(members)
+    bottom = np.arange(n_bottom)
+
+    rows, columns, nodes = [], [], []
+    n_nodes = 0
+    for level, keys in levels.items():
+        keys = list(keys)
+        if keys:
+            groups = members.groupby(keys, sort=True, dropna=False)
+            codes = groups.ngroup().to_numpy()
+            labels = groups.size().index.to_frame(index=False)
+        else:
+            codes = np.zeros(n_bottom, dtype=int)
+            labels = pd.DataFrame(index=range(1 if n_bottom else 0))
+        labels.insert(0, 'Level', level)
+        rows.append(n_nodes + codes)
+        columns.append(bottom)
+        nodes.append(labels)
+        n_nodes += len(labels)
+
+    summing = sparse.csr_matrix((np.ones(sum(len(r) for r in rows)),
+                                 (np.concatenate(rows), np.concatenate(columns))),
+                                shape=(n_nodes, n_bottom))
+    nodes = pd.concat(nodes, ignore_index=True).reindex(columns=['Level'] + list(members.columns))
+    return summing, nodes
+
+
+def reconcile_forecasts(base, summing, method='mint', variances=None):
+    """
+    Reconcile the base forecasts of every node of a hierarchy.
+
+    Args:
+        base (ndarray): Nodes x forecast years base forecasts (matrix order)
+        summing (sparse matrix): Summing matrix (see summing_matrix)
+        method (str): 'bottom_up', 'ols' or 'mint'
+        variances (array): Base forecast error variance of every node
+            (required by 'mint')
+
+    Returns:
+        ndarray: Nodes x forecast years coherent forecasts
+    """
+    if method not in RECONCILIATION_METHODS:
+        raise ValueError(f"Unknown reconciliation method '{method}' (available: {', '.join(RECONCILIATION_METHODS)})")
+    base = np.asarray(base, dtype=float)
+    if base.ndim == 1:
+        base = base[:, None]
+    summing = sparse.csr_matrix(summing)
+    n_nodes, n_bottom = summing.shape
+    n_aggregates = n_nodes - n_bottom
+
+    if method == 'bottom_up' or n_aggregates == 0:
+        return summing @ base[n_aggregates:]
+
+    if method == 'ols':
+        weights = np.ones(n_nodes)
+    else:
+        if variances is None:
+            raise ValueError("MinT reconciliation needs the base forecast error variances")
+        variances = np.asarray(variances, dtype=float)
+        known = np.isfinite(variances) & (variances > 0)
+        if not known.any():
+            weights = np.ones(n_nodes)
+        else:
+            # A node without error estimate is treated as the least reliable
+            variances = np.where(known, variances, variances[known].max())
+            # W^-1, scaled (the solution does not depend on the scale of W)
+            weights = variances.mean() / variances
+
+    # KKT system: [W^-1 C'; C 0] [y; lambda] = [W^-1 y_base; 0]
+    constraints = sparse.hstack([sparse.identity(n_aggregates, format='csr'),
+                                 -summing[:n_aggregates]], format='csr')
+    system = sparse.bmat([[sparse.diags(weights), constraints.T],
+                          [constraints, None]], format='csc')
+    right_hand_side = np.vstack([weights[:, None] * base, np.zeros((n_aggregates, base.shape[1]))])
+    solution = splu(system).solve(right_hand_side)
+    return solution[:n_nodes]
+
+
+def coherence_gaps(forecasts, nodes):
+    """
+    Gap between the sum of every level and the grand total, per level.
+
+    Args:
+        forecasts (ndarray): Nodes x forecast years forecasts
+        nodes (DataFrame): Nodes of the hierarchy (see summing_matrix); the
+            first level is the grand total
+
+    Returns:
+        Series: Largest gap over the forecast years, in % of the total, per level
+    """
+    forecasts = np.asarray(forecasts, dtype=float)
+    levels = nodes['Level'].to_numpy()
+    total = forecasts[levels == levels[0]].sum(axis=0)
+    gaps = {}
+    for level in pd.unique(levels):
+        level_sum = forecasts[levels == level].sum(axis=0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            gap = np.abs(level_sum - total) / np.abs(total) * 100
+        gaps[level] = float(np.nanmax(gap)) if np.isfinite(gap).any() else np.nan
+    return pd.Series(gaps, name='Gap_Percent')
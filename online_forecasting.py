@@ -0,0 +1,299 @@
+"""
+Online Forecasting
+==================
+
+Forecast states updated incrementally when new observations arrive.
+
+Instead of refitting every model on the full history, the state of every
+series is stored after each run and advanced through the new years only:
+
+- 'Holt' / 'Damped Trend': level and trend of the exponential smoothing
+  (a state-space model), advanced with the smoothing parameters picked
+  on the grid at the last full fit (see batch_forecasting.holt_parameters)
+- 'Linear Regression': running sums of the least-squares normal
+  equations (recursive least squares), so the updated trend is the one a
+  refit on the full history would give
+
+All series are advanced together, one array operation per new year.
+
+Prediction intervals are analytic, from the states: the one-step error
+variance of the smoothing propagated over the horizon, or the variance
+of a least-squares trend forecast. States stored before the error sums
+were part of the state are refit.
+
+Every state also keeps the state before its last year. When only the
+last year changed (a new month of the current year revises its total),
+the series is rolled back one year and advanced again. Series whose
+older history changed, new series and series with fewer than two
+observations are refit from scratch (in one batch).
+
+Usage:
+    states, status = update_states(previous_states, series, years, values, 'Damped Trend')
+    forecasts = state_forecasts(states, [2025, 2026])
+"""
+
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+from scipy.stats import norm
+
+from batch_forecasting import SMOOTHING_METHODS, holt_parameters
+from prediction_intervals import INTERVAL_COVERAGE
+
+# Online methods -> damping factors of the smoothing grid (None: linear trend)
+ONLINE_METHODS = {
+    **SMOOTHING_METHODS,
+    'Linear Regression': None
+}
+
+# State columns advanced with every new year (copied to Prev_* before the last year)
+DYNAMIC_COLUMNS = ['N_Points', 'Sum', 'Sum_Squares', 'Level', 'Trend', 'Abs_Error', 'Abs_Value',
+                   'Squared_Error', 'Sum_T', 'Sum_TT', 'Sum_TY']
+
+# Parameters fixed at the last full fit
+PARAMETER_COLUMNS = ['Alpha', 'Beta', 'Phi', 'Origin']
+
+
+def _history_hash(years, values, last_year):
+    """Hash of the years and values of one series up to a year."""
+    kept = years <= last_year
+    digest = hashlib.sha1(years[kept].tobytes())
+    digest.update(np.where(np.isnan(values[kept]), np.nan, values[kept]).tobytes())
+    return digest.hexdigest()
+
+
+def _advance(state, method, years, values):
+    """
+    Advance the state of every series through the years after its last year.
+
+    Args:
+        state (dict): Column -> array of the states (one entry per series)
+        method (str): Online method of the states
+        years (ndarray): Years of the matrix columns
+        values (ndarray): Series x years matrix (NaN: missing year)
+
+    Returns:
+        dict: Advanced states (Last_Year = last year of the matrix)
+    """
+    state = {column: np.array(array, copy=True) for column, array in state.items()}
+    holt = ONLINE_METHODS[method] is not None
+    for t, year in enumerate(years):
+        active = year > state['Last_Year']
+        if not active.any():
+            continue
+        if t == len(years) - 1:
+            # State before the last year, to roll back a revision of this year
+            for column in DYNAMIC_COLUMNS:
+                state[f'Prev_{column}'] = np.where(active, state[column], state[f'Prev_{column}'])
+
+        observed = active & ~np.isnan(values[:, t])
+        value = np.where(observed, values[:, t], 0.0)
+        if holt:
+            level, trend, phi = state['Level'], state['Trend'], state['Phi']
+            predicted = level + phi * trend
+            error = value - predicted
+            # Errors from the third observation on (the first two set the state)
+            scored = observed & (state['N_Points'] >= 2)
+            state['Abs_Error'] = state['Abs_Error'] + np.where(scored, np.abs(error), 0.0)
+            state['Abs_Value'] = state['Abs_Value'] + np.where(scored, np.abs(value), 0.0)
+            state['Squared_Error'] = state['Squared_Error'] + np.where(scored, error ** 2, 0.0)
+            # A missing year carries the level and trend forward as forecast
+            new_level = np.where(observed, predicted + state['Alpha'] * error, predicted)
+            new_trend = np.where(observed, state['Beta'] * (new_level - level)
+                                 + (1 - state['Beta']) * phi * trend, phi * trend)
+            state['Level'] = np.where(active, new_level, level)
+            state['Trend'] = np.where(active, new_trend, trend)
+        else:
+            t_value = np.where(observed, year - state['Origin'], 0.0)
+            state['Sum_T'] = state['Sum_T'] + t_value
+            state['Sum_TT'] = state['Sum_TT'] + t_value ** 2
+            state['Sum_TY'] = state['Sum_TY'] + t_value * value
+
+        state['N_Points'] = state['N_Points'] + observed
+        state['Sum'] = state['Sum'] + value
+        state['Sum_Squares'] = state['Sum_Squares'] + value ** 2
+        state['Last_Year'] = np.where(active, year, state['Last_Year'])
+    return state
+
+
+def fit_states(years, values, method):
+    """
+    Fit the state of every series on its full history.
+
+    Args:
+        years (array): Years of the matrix columns (consecutive)
+        values (ndarray): Series x years matrix (NaN: missing year)
+        method (str): Online method ('Holt', 'Damped Trend' or 'Linear Regression')
+
+    Returns:
+        dict: Column -> array of the states
+    """
+    if method not in ONLINE_METHODS:
+        raise ValueError(f"Unknown online method '{method}' (available: {', '.join(ONLINE_METHODS)})")
+    years = np.asarray(years, dtype=float)
+    values = np.atleast_2d(np.asarray(values, dtype=float))
+    n_series = values.shape[0]
+    state = {column: np.zeros(n_series) for column in DYNAMIC_COLUMNS + PARAMETER_COLUMNS}
+    state.update({f'Prev_{column}': np.full(n_series, np.nan) for column in DYNAMIC_COLUMNS})
+    state['Last_Year'] = np.full(n_series, years[0] - 1 if len(years) else 0.0)
+    state['Origin'] = np.full(n_series, years[0] if len(years) else 0.0)
+    if n_series == 0 or len(years) == 0 or ONLINE_METHODS[method] is None:
+        return _advance(state, method, years, values)
+
+    # Smoothing starts at the first observation, with the slope to the second one
+    state['Alpha'], state['Beta'], state['Phi'] = holt_parameters(years, values, ONLINE_METHODS[method])
+    mask = ~np.isnan(values)
+    rows = np.arange(n_series)
+    order = np.cumsum(mask, axis=1)
+    first = np.where(order >= 1, np.arange(len(years)), len(years)).min(axis=1)
+    second = np.where(order >= 2, np.arange(len(years)), len(years)).min(axis=1)
+    started = first < len(years)
+    first_value = np.where(started, values[rows, np.minimum(first, len(years) - 1)], np.nan)
+    second_value = values[rows, np.minimum(second, len(years) - 1)]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope = np.where(second < len(years), (second_value - first_value)
+                         / (years[np.minimum(second, len(years) - 1)] - years[np.minimum(first, len(years) - 1)]), 0.0)
+    state['Level'] = first_value
+    state['Trend'] = slope
+    state['N_Points'] = started.astype(float)
+    state['Sum'] = np.nan_to_num(first_value)
+    state['Sum_Squares'] = np.nan_to_num(first_value) ** 2
+    state['Last_Year'] = np.where(started, years[np.minimum(first, len(years) - 1)], years[-1])
+    return _advance(state, method, years, values)
+
+
+def update_states(states, series, years, values, method):
+    """
+    Bring the stored states up to date with the current history of every series.
+
+    Args:
+        states (DataFrame): States of the previous run, indexed by series
+            (None: no previous run)
+        series (list): Identifier (string) of every row of values
+        years (array): Years of the matrix columns (consecutive)
+        values (ndarray): Series x years matrix (NaN: missing year)
+        method (str): Online method
+
+    Returns:
+        tuple: (states indexed by series; status of every series:
+            'unchanged', 'updated' (advanced through new years), 'revised'
+            (last year rolled back and advanced) or 'refit')
+    """
+    if method not in ONLINE_METHODS:
+        raise ValueError(f"Unknown online method '{method}' (available: {', '.join(ONLINE_METHODS)})")
+    years = np.asarray(years, dtype=float)
+    values = np.atleast_2d(np.asarray(values, dtype=float))
+    series = list(series)
+    status = np.full(len(series), 'refit', dtype=object)
+
+    if states is not None and len(states) and set(DYNAMIC_COLUMNS) <= set(states.columns):
+        previous = states[states['Method'] == method].reindex(series)
+        state = {column: np.array(previous[column], dtype=float)
+                 for column in previous.columns if column not in ('Method', 'History_Hash', 'Prior_Hash')}
+        for row, (history_hash, prior_hash) in enumerate(zip(previous['History_Hash'], previous['Prior_Hash'])):
+            last_year = state['Last_Year'][row]
+            if not isinstance(history_hash, str) or state['N_Points'][row] < 2:
+                continue
+            if _history_hash(years, values[row], last_year) == history_hash:
+                status[row] = 'updated' if last_year < years[-1] else 'unchanged'
+            elif isinstance(prior_hash, str) and _history_hash(years, values[row], last_year - 1) == prior_hash:
+                # Only the last year changed: back to the state before it
+                for column in DYNAMIC_COLUMNS:
+                    state[column][row] = state[f'Prev_{column}'][row]
+                state['Last_Year'][row] = last_year - 1
+                status[row] = 'revised'
+        kept = status != 'refit'
+        state = _advance({column: array[kept] for column, array in state.items()}, method, years, values[kept])
+    else:
+        kept = np.zeros(len(series), dtype=bool)
+        state = None
+
+    refit = fit_states(years, values[~kept], method)
+    columns = list(refit)
+    merged = {column: np.empty(len(series)) for column in columns}
+    for column in columns:
+        merged[column][~kept] = refit[column]
+        if state is not None:
+            merged[column][kept] = state[column]
+
+    result = pd.DataFrame(merged, index=pd.Index(series, name='Series'))
+    result.insert(0, 'Method', method)
+    result['History_Hash'] = [_history_hash(years, values[row], years[-1]) for row in range(len(series))]
+    result['Prior_Hash'] = [_history_hash(years, values[row], years[-1] - 1) for row in range(len(series))]
+    return result, status
+
+
+def state_forecasts(states, target_years, min_points=None, coverage=INTERVAL_COVERAGE):
+    """
+    Forecast every series from its state.
+
+    Args:
+        states (DataFrame): States (see update_states)
+        target_years (list): Years to forecast (after the last year of the states)
+        min_points (int): Minimum number of observed years of a series
+            (default: as the batched method, 2 for the linear trend, 3 for
+            the smoothing methods)
+        coverage (float): Probability of the prediction intervals
+
+    Returns:
+        dict: 'predictions' (series x target years, NaN for series with too
+            few years), 'lower' and 'upper' (prediction interval bounds, NaN
+            for series with too few years to estimate the error variance),
+            'score' (1 - one-step WAPE for the smoothing methods, R² for the
+            linear trend) and 'std' (std of the values)
+    """
+    target_years = np.asarray(target_years, dtype=float)
+    n = states['N_Points'].to_numpy(dtype=float)
+    total = states['Sum'].to_numpy(dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = total / n
+        variance = np.maximum(states['Sum_Squares'].to_numpy(dtype=float) / n - mean ** 2, 0.0)
+    steps = target_years[None, :] - states['Last_Year'].to_numpy(dtype=float)[:, None]
+
+    linear = (states['Method'] == 'Linear Regression').all()
+    if min_points is None:
+        min_points = 2 if linear else 3
+    if linear:
+        sum_t, sum_tt = states['Sum_T'].to_numpy(dtype=float), states['Sum_TT'].to_numpy(dtype=float)
+        sum_ty = states['Sum_TY'].to_numpy(dtype=float)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            slope = (n * sum_ty - sum_t * total) / (n * sum_tt - sum_t ** 2)
+            intercept = (total - slope * sum_t) / n
+            residuals = (states['Sum_Squares'].to_numpy(dtype=float) - intercept * total - slope * sum_ty)
+            score = np.where(variance > 0, 1 - residuals / (n * variance), 1.0)
+            # Variance of a new value at t: sigma² (1 + 1/n + (t - mean t)² / Sxx)
+            sigma2 = np.where(n > 2, np.maximum(residuals, 0.0) / (n - 2), np.nan)
+            t = target_years[None, :] - states['Origin'].to_numpy(dtype=float)[:, None]
+            error_variance = sigma2[:, None] * (1 + 1 / n[:, None] + (t - (sum_t / n)[:, None]) ** 2
+                                                / (sum_tt - sum_t ** 2 / n)[:, None])
+        predictions = intercept[:, None] + slope[:, None] * t
+    else:
+        phi = states['Phi'].to_numpy(dtype=float)
+        horizon = np.clip(steps, 0, None).astype(int)
+        powers = phi[:, None] ** np.arange(1, max(horizon.max(initial=0), 1) + 1)[None, :]
+        cumulative = np.concatenate([np.zeros((len(states), 1)), np.cumsum(powers, axis=1)], axis=1)
+        damped_steps = np.take_along_axis(cumulative, horizon, axis=1)
+        predictions = (states['Level'].to_numpy(dtype=float)[:, None]
+                       + damped_steps * states['Trend'].to_numpy(dtype=float)[:, None])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            score = 1 - states['Abs_Error'].to_numpy(dtype=float) / states['Abs_Value'].to_numpy(dtype=float)
+            # One-step errors from the third observation on
+            sigma2 = np.where(n > 3, states['Squared_Error'].to_numpy(dtype=float) / (n - 2), np.nan)
+        # Variance at step h: sigma² (1 + sum c_k², k = 1 .. h - 1), c_k = alpha (1 + beta (phi + ... + phi^k))
+        weights = (states['Alpha'].to_numpy(dtype=float)[:, None]
+                   * (1 + states['Beta'].to_numpy(dtype=float)[:, None] * cumulative))
+        weights[:, 0] = 1.0
+        cumulative_weights = np.cumsum(weights ** 2, axis=1)
+        error_variance = sigma2[:, None] * np.take_along_axis(cumulative_weights, np.maximum(horizon - 1, 0), axis=1)
+
+    enough = n >= min_points
+    half_width = norm.ppf((1 + coverage) / 2) * np.sqrt(error_variance)
+    return {
+        'predictions': np.where(enough[:, None], predictions, np.nan),
+        'lower': np.where(enough[:, None], predictions - half_width, np.nan),
+        'upper': np.where(enough[:, None], predictions + half_width, np.nan),
+        'score': np.where(enough & np.isfinite(score), score, 0.0),
+        'std': np.sqrt(np.nan_to_num(variance))
+    }
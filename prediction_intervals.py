@@ -0,0 +1,264 @@
+"""
+Prediction Intervals
+====================
+
+Residual bootstrap prediction intervals for thousands of series at once.
+
+The forecast error of every batched method is a linear function of the
+noise of the series: the noise of the observed years (through the fitted
+parameters of the trend models) and the noise of the years from its last
+observed year to the forecast year (through the random walk of the naive and drift methods,
+or the level and trend updates of the exponential smoothing). For every
+series, this function is a steps x (years + steps) matrix A.
+
+The bootstrap draws the noise from the residuals of every series:
+simulated noise is a series x simulations x (years + steps) array, the
+simulated forecast errors are A applied to it (one matrix product), and the
+interval bounds are quantiles of the simulated errors. Series are
+processed in chunks so that the simulation arrays stay bounded in memory.
+
+The draws (positions in the residuals) are the same for every series, so
+the interval of a series does not depend on the other series of the run
+nor on the years of the matrix it is part of.
+
+Error models:
+- Trend models: in-sample residuals (rescaled for the fitted parameters);
+  the error includes the uncertainty of the fitted trend
+- 'Naive' / 'Drift': yearly changes (centered for the drift); the error
+  is their sum up to the forecast year
+- 'Holt' / 'Damped Trend': one-step-ahead errors (rescaled for the
+  parameters picked on the grid); the error of step h is
+  e_h + sum_j c_(h-j) e_j with c_k = alpha * (1 + beta * (phi + ... + phi^k))
+
+Usage:
+    lower, upper = bootstrap_intervals(matrix.columns, matrix.to_numpy(), [2025, 2026], 'Holt')
+    lower, upper = method_intervals(matrix.columns, values, [2025, 2026], chosen_methods, predictions)
+"""
+
+import numpy as np
+import pandas as pd
+
+from batch_forecasting import (BATCH_METHODS, SMOOTHING_METHODS, _holt_smooth, _last_observed, fit_trends,
+                               holt_parameters, trend_design)
+
+# Number of bootstrap simulations of every series
+INTERVAL_SIMULATIONS = 1000
+
+# Coverage of the prediction intervals
+INTERVAL_COVERAGE = 0.95
+
+# Size cap of the simulation arrays (series x simulations x columns) of a chunk
+INTERVAL_CHUNK_ELEMENTS = 5000000
+
+# Seed of the bootstrap draws
+INTERVAL_SEED = 0
+
+# Trend models: (polynomial degree, fitted on the log of the values)
+TREND_ERROR_MODELS = {
+    'Linear Regression': (1, False),
+    'Quadratic Trend': (2, False),
+    'Exponential Trend': (1, True)
+}
+
+
+def _observed_first(values):
+    """Move the observed values of every row to the front (order kept): (values, counts)."""
+    mask = ~np.isnan(values)
+    order = np.argsort(~mask, axis=1, kind='stable')
+    return np.take_along_axis(values, order, axis=1), mask.sum(axis=1)
+
+
+def error_model(years, values, forecast_years, method):
+    """
+    Residuals and error propagation of a batched method.
+
+    Args:
+        years (array): Years of the matrix columns (consecutive)
+        values (ndarray): Series x years matrix (NaN: missing year)
+        forecast_years (array): Years to forecast (after the matrix years)
+        method (str): Name of a BATCH_METHODS method
+
+    Returns:
+        tuple: (residuals: series x n (NaN padded); propagation: series x
+            forecast years x columns, the columns being the noise of the
+            matrix years then of the years after them; log_scale: errors
+            are on the log of the values)
+    """
+    years = np.asarray(years, dtype=float)
+    values = np.atleast_2d(np.asarray(values, dtype=float))
+    forecast_years = np.asarray(forecast_years, dtype=float)
+    n_series, n_years = values.shape
+    mask = ~np.isnan(values)
+    # Steps from the last observed year of every series: series x forecast years
+    last_year = np.nan_to_num(_last_observed(years, values)[2], nan=years[-1])
+    steps = np.clip(forecast_years[None, :] - last_year[:, None], 1, None).astype(int)
+    # Noise of the years after the last observed one: 1-based year j <= step
+    future_years = np.arange(1, steps.max() + 1)
+
+    if method in TREND_ERROR_MODELS:
+        degree, log_scale = TREND_ERROR_MODELS[method]
+        if log_scale:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                positive = np.where(mask, values > 0, True).all(axis=1)
+                values = np.where(positive[:, None] & mask, np.log(values), np.nan)
+                mask = ~np.isnan(values)
+        _, origin, fitted, n_points = fit_trends(years, values, degree)
+        n_parameters = degree + 1
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # Residuals are smaller than the noise by the fitted parameters
+            inflation = np.where(n_points > n_parameters, np.sqrt(n_points / (n_points - n_parameters)), np.nan)
+        residuals = (values - fitted) * inflation[:, None]
+
+        # Forecast error: noise of the forecast year - fitted trend error
+        design = trend_design(years, degree, origin)
+        weights = mask.astype(float)
+        gram = np.einsum('st,tp,tq->spq', weights, design, design)
+        forecast_design = trend_design(forecast_years, degree, origin)
+        history = -np.einsum('hp,spq,tq,st->sht', forecast_design, np.linalg.pinv(gram), design, weights)
+        future = (future_years[None, None, :] == steps[:, :, None]).astype(float)
+        return residuals, np.concatenate([history, future], axis=2), log_scale
+
+    if method in ('Naive', 'Drift'):
+        observed, counts = _observed_first(values)
+        changes = np.diff(observed, axis=1)
+        if method == 'Drift':
+            # The drift is the mean change: residuals are the centered changes
+            known = ~np.isnan(changes)
+            mean = np.where(known, changes, 0.0).sum(axis=1) / np.maximum(known.sum(axis=1), 1)
+            changes = changes - mean[:, None]
+        future = (future_years[None, None, :] <= steps[:, :, None]).astype(float)
+        return changes, np.concatenate([np.zeros(steps.shape + (n_years,)), future], axis=2), False
+
+    if method in SMOOTHING_METHODS:
+        alpha, beta, phi = holt_parameters(years, values, SMOOTHING_METHODS[method])
+        one_step = _holt_smooth(years, values, alpha[None, :], beta[None, :], phi[None, :], keep_one_step=True)[3][0]
+        # One-step errors from the third observation on (the first two set the state)
+        scored = mask & (np.cumsum(mask, axis=1) >= 3)
+        n_errors = scored.sum(axis=1)
+        # Errors are smaller than the noise by the parameters picked on them (alpha, beta, phi)
+        n_parameters = 3 if len(SMOOTHING_METHODS[method]) > 1 else 2
+        with np.errstate(divide='ignore', invalid='ignore'):
+            inflation = np.where(n_errors > n_parameters, np.sqrt(n_errors / (n_errors - n_parameters)), np.nan)
+        residuals = np.where(scored, values - one_step, np.nan) * inflation[:, None]
+
+        # c_k = alpha * (1 + beta * (phi + ... + phi^k)), k = 0 .. max step - 1
+        lags = future_years - 1
+        powers = np.where(lags[None, :] >= 1, phi[:, None] ** np.maximum(lags, 1)[None, :], 0.0)
+        weights = alpha[:, None] * (1 + beta[:, None] * np.cumsum(powers, axis=1))
+        # Noise of year j in the error of step h: 1 if j = h, c_(h-j) if j < h
+        lag = steps[:, :, None] - future_years[None, None, :]
+        future = np.take_along_axis(weights[:, None, :], np.clip(lag, 0, len(lags) - 1), axis=2)
+        future = np.where(lag == 0, 1.0, np.where(lag > 0, future, 0.0))
+        return residuals, np.concatenate([np.zeros(steps.shape + (n_years,)), future], axis=2), False
+
+    raise ValueError(f"Unknown batched method '{method}' (available: {', '.join(BATCH_METHODS)})")
+
+
+def bootstrap_intervals(years, values, forecast_years, method, predictions=None,
+                        coverage=INTERVAL_COVERAGE, simulations=INTERVAL_SIMULATIONS,
+                        max_elements=INTERVAL_CHUNK_ELEMENTS, seed=INTERVAL_SEED):
+    """
+    Residual bootstrap prediction intervals of every series.
+
+    Args:
+        years (array): Years of the matrix columns (consecutive)
+        values (ndarray): Series x years matrix (NaN: missing year)
+        forecast_years (array): Years to forecast (after the matrix years)
+        method (str): Name of a BATCH_METHODS method
+        predictions (ndarray): Series x forecast years forecasts of the
+            method (default: computed with BATCH_METHODS)
+        coverage (float): Probability of the interval
+        simulations (int): Number of bootstrap simulations
+        max_elements (int): Size cap of the simulation arrays of a chunk
+        seed (int): Seed of the draws
+
+    Returns:
+        tuple: (lower, upper) bounds, series x forecast years (NaN for
+            series with fewer than two residuals)
+    """
+    years = np.asarray(years, dtype=float)
+    values = np.atleast_2d(np.asarray(values, dtype=float))
+    forecast_years = np.asarray(forecast_years, dtype=float)
+    if predictions is None:
+        predictions = BATCH_METHODS[method](years, values, forecast_years)
+    predictions = np.atleast_2d(np.asarray(predictions, dtype=float))
+    lower = np.full(predictions.shape, np.nan)
+    upper = np.full(predictions.shape, np.nan)
+    if values.shape[0] == 0 or len(forecast_years) == 0:
+        return lower, upper
+
+    residuals, propagation, log_scale = error_model(years, values, forecast_years, method)
+    residuals, counts = _observed_first(residuals)
+    residuals = np.nan_to_num(residuals)
+
+    # Noise of the observed years by rank (1st observed year, ...), after
+    # the noise of the future years: the draw of a noise (draw column 2j
+    # for the j-th future year, 2k + 1 for the k-th observed year) does not
+    # depend on the years of the matrix nor on the other series
+    n_years = values.shape[1]
+    order = np.argsort(np.isnan(values), axis=1, kind='stable')
+    history = np.take_along_axis(propagation[:, :, :n_years], order[:, None, :], axis=2)
+    propagation = np.concatenate([propagation[:, :, n_years:], history], axis=2)
+    draw_columns = np.concatenate([2 * np.arange(propagation.shape[2] - n_years), 2 * np.arange(n_years) + 1])
+    # Noise that no forecast depends on is not simulated
+    simulated = np.abs(propagation).sum(axis=(0, 1)) > 0
+    propagation, draw_columns = propagation[:, :, simulated], draw_columns[simulated]
+    n_columns = propagation.shape[2]
+
+    # Same draws for every series: positions in its residuals, as fractions
+    # (drawn column by column, so that a column does not depend on their number)
+    uniform = np.random.default_rng(seed).random((draw_columns.max(initial=0) + 1, simulations)).T
+    uniform = uniform[:, draw_columns]
+    quantiles = [(1 - coverage) / 2, (1 + coverage) / 2]
+
+    chunk_size = max(1, max_elements // (simulations * n_columns))
+    for start in range(0, values.shape[0], chunk_size):
+        rows = slice(start, start + chunk_size)
+        count = counts[rows]
+        # Series x simulations x columns noise drawn from the residuals of every series
+        positions = np.minimum((uniform[None, :, :] * count[:, None, None]).astype(int),
+                               np.maximum(count - 1, 0)[:, None, None])
+        noise = np.take_along_axis(residuals[rows][:, None, :],
+                                   positions.reshape(len(count), 1, -1), axis=2).reshape(positions.shape)
+        errors = noise @ propagation[rows].transpose(0, 2, 1)
+        low, high = np.quantile(errors, quantiles, axis=1)
+
+        enough = (count >= 2)[:, None]
+        base = predictions[rows]
+        if log_scale:
+            with np.errstate(over='ignore'):
+                lower[rows] = np.where(enough, base * np.exp(low), np.nan)
+                upper[rows] = np.where(enough, base * np.exp(high), np.nan)
+        else:
+            lower[rows] = np.where(enough, base + low, np.nan)
+            upper[rows] = np.where(enough, base + high, np.nan)
+    return lower, upper
+
+
+def method_intervals(years, values, forecast_years, methods, predictions, **options):
+    """
+    Bootstrap intervals of series forecast with different methods.
+
+    Args:
+        years (array): Years of the matrix columns (consecutive)
+        values (ndarray): Series x years matrix (NaN: missing year)
+        forecast_years (array): Years to forecast
+        methods (array): Method of every series
+        predictions (ndarray): Series x forecast years forecasts
+        **options: Options of bootstrap_intervals
+
+    Returns:
+        tuple: (lower, upper) bounds, series x forecast years (NaN for the
+            series of methods that are not batched methods)
+    """
+    values = np.atleast_2d(np.asarray(values, dtype=float))
+    predictions = np.atleast_2d(np.asarray(predictions, dtype=float))
+    methods = np.asarray(methods, dtype=object)
+    lower = np.full(predictions.shape, np.nan)
+    upper = np.full(predictions.shape, np.nan)
+    for method in pd.unique(methods):
+        rows = np.flatnonzero(methods == method)
+        if method in BATCH_METHODS and len(rows):
+            lower[rows], upper[rows] = bootstrap_intervals(years, values[rows], forecast_years, method,
+                                                           predictions=predictions[rows], **options)
+    return lower, upper
@@ -15,15 +15,11 @@ def main():
     
     # Load data
     print("🔄 Loading data...")
-    if not analyzer.load_and_clean_data():
+    if not analyzer.load_or_restore():
         print("❌ Failed to load data")
         return
     
-    print(f"✅ Data loaded: {len(analyzer.main_data):,} records")
-    
-    # Merge with nomenclature
-    print("🔄 Merging with nomenclature...")
-    analyzer.merge_data_with_nomenclature()
+    print(f"✅ Data loaded: {analyzer.summarize_dataset()['total_records']:,} records")
     
     # Calculate staff evolution
     print("🔄 Calculating staff evolution...")
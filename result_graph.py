@@ -0,0 +1,223 @@
+"""
+Result Dependency Graph
+=======================
+
+Memoization layer for the SalaryAnalyzer results.
+
+Results are declared as nodes with explicit dependencies
+(data -> enriched -> aggregates -> forecasts -> reports). Every node is
+identified by a content key:
+- source nodes (raw data, nomenclature tables) hash their content
+- derived nodes hash their parameters and the keys of their inputs
+
+A node is computed at most once per key. When a recomputed node produces
+the same content as before, its dependants keep their key and are not
+recomputed either.
+
+Large intermediates (payroll lines) can be held weakly: the graph then
+keeps their key but not the data, which is freed as soon as its owner
+releases it and recomputed only if it is needed again.
+"""
+
+import hashlib
+import weakref
+import pandas as pd
+
+
+def content_hash(value):
+    """
+    Compute a stable hash of a result.
+
+    Args:
+        value: DataFrame, Series, dict, list/tuple or scalar
+
+    Returns:
+        str: Hexadecimal SHA-1 digest
+    """
+    digest = hashlib.sha1()
+    _update_digest(digest, value)
+    return digest.hexdigest()
+
+
+def _update_digest(digest, value):
+    """Feed a (possibly nested) result into a hash object."""
+    if isinstance(value, pd.DataFrame):
+        digest.update(repr(list(value.columns)).encode())
+        digest.update(pd.util.hash_pandas_object(value, index=True).values.tobytes())
+    elif isinstance(value, pd.Series):
+        digest.update(repr(value.name).encode())
+        digest.update(pd.util.hash_pandas_object(value, index=True).values.tobytes())
+    elif isinstance(value, dict):
+        for key in sorted(value, key=repr):
+            digest.update(repr(key).encode())
+            _update_digest(digest, value[key])
+    elif isinstance(value, (list, tuple)):
+        digest.update(b'[')
+        for item in value:
+            _update_digest(digest, item)
+        digest.update(b']')
+    else:
+        digest.update(repr(value).encode())
+
+
+class ResultNode:
+    """Declaration of one memoized result."""
+
+    def __init__(self, name, compute, depends_on=(), source_key=None,
+                 key_params=None, hash_output=True, weak=False):
+        """
+        Args:
+            name (str): Node name
+            compute (callable): Function computing the value (receives the call parameters)
+            depends_on (iterable): Names of the nodes this result is computed from
+            source_key (callable): For source nodes, function returning the content key
+            key_params (iterable): Parameters that change the result (None: all of them)
+            hash_output (bool): Hash the computed value so that unchanged
+                outputs do not invalidate dependants (disable for large frames)
+            weak (bool): Hold the value through a weak reference (the value
+                must support weak references, e.g. a DataFrame)
+        """
+        self.name = name
+        self.compute = compute
+        self.depends_on = tuple(depends_on)
+        self.source_key = source_key
+        self.key_params = None if key_params is None else tuple(key_params)
+        self.hash_output = hash_output
+        self.weak = weak
+
+
+class ResultGraph:
+    """Dependency-aware memoization of analysis results."""
+
+    def __init__(self):
+        self._nodes = {}
+        self._cache = {}  # name -> (input_key, value or weak reference, output_key)
+        self._seeds = {}  # name -> (token_function, token, value, output_key)
+        self.stats = {}   # name -> {'computed': n, 'reused': n}
+
+    def add_node(self, name, compute, depends_on=(), source_key=None,
+                 key_params=None, hash_output=True, weak=False):
+        """Register (or replace) a node. See ResultNode for the arguments."""
+        for dependency in depends_on:
+            if dependency not in self._nodes:
+                raise KeyError(f"Unknown dependency '{dependency}' for node '{name}'")
+        self._nodes[name] = ResultNode(name, compute, depends_on, source_key,
+                                       key_params, hash_output, weak)
+        self._cache.pop(name, None)
+        self._seeds.pop(name, None)
+
+    def has_node(self, name):
+        """Return True if a node with this name is registered."""
+        return name in self._nodes
+
+    def get(self, name, **params):
+        """
+        Return the value of a node, computing it only if its inputs changed.
+
+        Args:
+            name (str): Node name
+            **params: Parameters passed to the compute function
+
+        Returns:
+            The node value
+        """
+        return self._resolve(name, params)[0]
+
+    def get_with_key(self, name, **params):
+        """Return (value, content key) of a node in a single resolution."""
+        return self._resolve(name, params)
+
+    def key(self, name, **params):
+        """Return the content key of a node (computing it only if the key is unknown)."""
+        return self._resolve(name, params, need_value=False)[1]
+
+    def seed(self, name, value, token):
+        """
+        Serve a precomputed value (e.g. restored from disk) for a node.
+
+        The seeded value is returned without resolving the node inputs for
+        as long as token() returns the same value as when it was seeded.
+
+        Args:
+            name (str): Node name
+            value: Precomputed value
+            token (callable): Function identifying the inputs the value is valid for
+        """
+        if name not in self._nodes:
+            raise KeyError(f"Unknown result node '{name}'")
+        self._seeds[name] = (token, token(), value, content_hash(value))
+
+    def invalidate(self, name=None):
+        """
+        Drop memoized values of a node and of everything depending on it.
+
+        Needed only after in-place modifications that keep the same object
+        (e.g. editing analyzer.main_data without reassigning it).
+
+        Args:
+            name (str): Node to invalidate (None: all nodes)
+        """
+        if name is None:
+            self._cache.clear()
+            self._seeds.clear()
+            return
+
+        stale = {name}
+        changed = True
+        while changed:
+            changed = False
+            for node in self._nodes.values():
+                if node.name not in stale and stale.intersection(node.depends_on):
+                    stale.add(node.name)
+                    changed = True
+
+        for node_name in stale:
+            self._cache.pop(node_name, None)
+            self._seeds.pop(node_name, None)
+
+    def _resolve(self, name, params, need_value=True):
+        """
+        Return (value, output_key) of a node, computing it when needed.
+
+        With need_value=False, a weakly held node whose value was freed is
+        not recomputed when its key is still known (the value is then None).
+        """
+        if name not in self._nodes:
+            raise KeyError(f"Unknown result node '{name}'")
+        node = self._nodes[name]
+        node_stats = self.stats.setdefault(name, {'computed': 0, 'reused': 0})
+
+        seeded = self._seeds.get(name)
+        if seeded is not None:
+            if seeded[0]() == seeded[1]:
+                node_stats['reused'] += 1
+                return seeded[2], seeded[3]
+            del self._seeds[name]
+
+        if node.source_key is not None:
+            input_key = node.source_key()
+        else:
+            if node.key_params is None:
+                key_params = params
+            else:
+                key_params = {p: v for p, v in params.items() if p in node.key_params}
+            parts = [name, repr(sorted(key_params.items()))]
+            for dependency in node.depends_on:
+                parts.append(self._resolve(dependency, {}, need_value=False)[1])
+            input_key = hashlib.sha1('|'.join(parts).encode()).hexdigest()
+
+        cached = self._cache.get(name)
+        if cached is not None and cached[0] == input_key:
+            value = cached[1]
+            if node.weak and value is not None:
+                value = value()
+            if value is not None or not need_value:
+                node_stats['reused'] += 1
+                return value, cached[2]
+
+        value = node.compute(**params)
+        output_key = content_hash(value) if node.hash_output else input_key
+        held = weakref.ref(value) if node.weak and value is not None else value
+        self._cache[name] = (input_key, held, output_key)
+        node_stats['computed'] += 1
+        return value, output_key
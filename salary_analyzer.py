@@ -21,6 +21,13 @@ from statsmodels.tsa.arima.model import ARIMA
 from statsmodels.tsa.seasonal import seasonal_decompose
 import warnings
 import json
+import hashlib
+import gc
+import sys
+import time
+from collections import OrderedDict
+from functools import partial
+from contextlib import contextmanager
 from pathlib import Path
 from datetime import datetime
 import plotly.graph_objects as go
@@ -28,12 +35,279 @@ import plotly.express as px
 from plotly.subplots import make_subplots
 import plotly.offline as pyo
 
+from result_graph import ResultGraph, content_hash
+from aggregate_store import AggregateStore
+from growth_metrics import growth_metrics, year_matrix
+from batch_forecasting import (BATCH_METHODS, batch_forecast, method_forecast, naive_forecast,
+                               series_result, task_matrix)
+from forecast_executor import (cascade_forecast, predict_time_series, forecast_series, forecast_tasks,
+                               summarize_model_choices)
+from backtesting import rolling_origin_backtest
+from forecast_cache import ForecastCache
+from global_forecasting import global_forecast, global_method
+from hierarchical_forecasting import RECONCILIATION_METHODS, coherence_gaps, reconcile_forecasts, summing_matrix
+from online_forecasting import ONLINE_METHODS, state_forecasts, update_states
+from prediction_intervals import method_intervals
+
 warnings.filterwarnings('ignore')
 
 # Set plotting style
 plt.style.use('seaborn-v0_8')
 sns.set_palette("husl")
 
+# Version of the cached intermediates layout; bump when their content changes
+CACHE_VERSION = 2
+
+# Version of the analysis code, part of the persisted aggregates key
+CODE_VERSION = hashlib.sha1(Path(__file__).read_bytes()).hexdigest()[:12]
+
+# Results persisted in the aggregate store (result node -> analyzer attribute)
+PERSISTED_RESULTS = {
+    'dataset_summary': 'dataset_summary',
+    'staff_evolution': 'staff_evolution',
+    'salary_mass': 'salary_mass_evolution',
+    'allowances': 'allowance_analysis',
+    'query_cube': 'query_cube',
+    'org_hierarchy': 'org_hierarchy',
+    'budget_execution': 'budget_execution'
+}
+
+# Persisted results needed to run the analyses without the raw data
+REQUIRED_AGGREGATES = ['dataset_summary', 'staff_evolution', 'salary_mass', 'allowances']
+
+# Dimensions of the query cube (query name -> enriched column)
+QUERY_DIMENSIONS = {
+    'Year': 'Annee',
+    'Ministry': 'Ministry',
+    'Corps': 'Corps_Name_FR',
+    'Grade': 'Grade_Name_FR',
+    'Codetab': 'Codetab',
+    'Governorate': 'Gouv',
+    'Central_Regional': 'Centreg',
+    'Credit_Delegation': 'Deleg',
+    'Type': 'Type',
+    'Codind': 'Codind'
+}
+
+# Dimensions describing agents (usable with the distinct_agents measure)
+AGENT_DIMENSIONS = ['Year', 'Ministry', 'Corps', 'Grade', 'Codetab',
+                    'Governorate', 'Central_Regional', 'Credit_Delegation']
+
+QUERY_MEASURES = ['sum_amount', 'line_count', 'distinct_agents']
+
+# Levels of the budget execution tables (level -> budget imputation keys)
+BUDGET_LEVELS = {
+    'total': [],
+    'by_ministry': ['Ministry'],
+    'by_article': ['Ministry', 'Article'],
+    'by_par': ['Ministry', 'Article', 'Par']
+}
+
+# Levels of the organisation hierarchy (level -> enriched key columns)
+ORG_LEVELS = {
+    'ministry': ['Ministry'],
+    'direction': ['Ministry', 'Dire'],
+    'sub_direction': ['Ministry', 'Dire', 'Sdir'],
+    'service': ['Ministry', 'Dire', 'Sdir', 'Serv']
+}
+
+# Levels of the allowance forecast hierarchy (level -> allowance table keys)
+FORECAST_LEVELS = {
+    'total': [],
+    'ministry': ['Ministry'],
+    'corps': ['Ministry', 'Corps'],
+    'grade': ['Ministry', 'Corps', 'Grade']
+}
+
+# Keys of the allowance series of the global forecasting model (one-hot encoded)
+GLOBAL_FORECAST_KEYS = ['Ministry', 'Corps', 'Grade', 'Codind']
+
+# Columns of the main payroll file (no header line)
+MAIN_COLUMNS = [
+    'Codetab', 'Mois', 'Annee', 'Type', 'Nligne', 'Codind', 
+    'Montind', 'Article', 'Par', 'Codgrd', 'Codcorps', 'Hcorps',
+    'Codefam', 'Codsfam', 'Codnat', 'Dire', 'Sdir', 'Serv',
+    'Deleg', 'Centreg', 'Gouv', 'Id_agent'
+]
+
+# Number of months set in every 12-bit months-present mask
+MONTH_POPCOUNT = np.array([bin(mask).count('1') for mask in range(1 << 12)], dtype=np.int8)
+
+# Engines of the allowance forecasts (see _compute_allowance_trends)
+FORECAST_ENGINES = ['batch', 'per_series']
+
+# Rows of the main payroll file read (and cleaned) at a time
+PAYROLL_CHUNK_SIZE = 10000
+
+
+def memory_usage_mb():
+    """
+    Resident memory of the process in MB.
+    
+    Returns:
+        tuple: (current, peak) resident memory; current is None where only
+            the peak is available, both are None where neither is
+    """
+    try:
+        with open('/proc/self/status') as status:
+            fields = dict(line.split(':', 1) for line in status if ':' in line)
+        return int(fields['VmRSS'].split()[0]) / 1024, int(fields['VmHWM'].split()[0]) / 1024
+    except (OSError, KeyError, ValueError):
+        pass
+    
+    try:
+        import resource
+    except ImportError:
+        return None, None  # Not available on Windows
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return None, peak / 1024 ** 2 if sys.platform == 'darwin' else peak / 1024
+
+
+def reset_peak_memory():
+    """
+    Reset the peak resident memory of the process (Linux only).
+    
+    Returns:
+        bool: True if the peak was reset, False if it covers the whole process life
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as clear_refs:
+            clear_refs.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def agent_year_totals(lines):
+    """
+    Total Montind and number of payroll lines of every agent in every year.
+    
+    Args:
+        lines (DataFrame): Payroll lines (Annee, Id_agent, Montind)
+        
+    Returns:
+        DataFrame: Total_Montind and Line_Count indexed by (Annee, Id_agent)
+    """
+    grouped = lines.groupby(['Annee', 'Id_agent'])['Montind']
+    return pd.DataFrame({
+        'Total_Montind': grouped.sum(),
+        'Line_Count': grouped.size()
+    })
+
+
+def staff_tables(merged, facts):
+    """
+    Staff evolution tables from the enriched payroll lines.
+    
+    Every table is keyed by year first, so the tables of disjoint years can
+    be computed separately and concatenated.
+    
+    Args:
+        merged (DataFrame): Enriched payroll lines
+        facts (DataFrame): Agent-year facts of the same lines
+        
+    Returns:
+        dict: Staff counts (total, by ministry, corps, grade)
+    """
+    # Calculate unique staff count by year (one fact row per agent and year)
+    staff_by_year = facts.groupby('Annee').size().reset_index()
+    staff_by_year.columns = ['Year', 'Staff_Count']
+    
+    # Calculate staff by ministry and year
+    staff_by_ministry = merged.groupby(['Annee', 'Ministry'])['Id_agent'].nunique().reset_index()
+    staff_by_ministry.columns = ['Year', 'Ministry', 'Staff_Count']
+    
+    # Calculate staff by corps and year
+    staff_by_corps = merged.groupby(['Annee', 'Corps_Name_FR'])['Id_agent'].nunique().reset_index()
+    staff_by_corps.columns = ['Year', 'Corps', 'Staff_Count']
+    
+    # Calculate staff by grade and year
+    staff_by_grade = merged.groupby(['Annee', 'Grade_Name_FR'])['Id_agent'].nunique().reset_index()
+    staff_by_grade.columns = ['Year', 'Grade', 'Staff_Count']
+    
+    return {
+        'total': staff_by_year,
+        'by_ministry': staff_by_ministry,
+        'by_corps': staff_by_corps,
+        'by_grade': staff_by_grade
+    }
+
+
+def salary_mass_tables(merged, facts):
+    """
+    Salary mass tables from the enriched payroll lines (keyed by year first).
+    
+    Args:
+        merged (DataFrame): Enriched payroll lines
+        facts (DataFrame): Agent-year facts of the same lines
+        
+    Returns:
+        dict: Salary mass (total, by ministry, corps) and average per agent
+    """
+    # Calculate total salary mass by year
+    salary_mass_total = merged.groupby('Annee')['Montind'].sum().reset_index()
+    salary_mass_total.columns = ['Year', 'Total_Salary_Mass']
+    
+    # Calculate salary mass by ministry
+    salary_mass_ministry = merged.groupby(['Annee', 'Ministry'])['Montind'].sum().reset_index()
+    salary_mass_ministry.columns = ['Year', 'Ministry', 'Salary_Mass']
+    
+    # Calculate salary mass by corps
+    salary_mass_corps = merged.groupby(['Annee', 'Corps_Name_FR'])['Montind'].sum().reset_index()
+    salary_mass_corps.columns = ['Year', 'Corps', 'Salary_Mass']
+    
+    # Calculate average salary per agent
+    avg_salary_yearly = facts.groupby('Annee')['Total_Montind'].mean().reset_index()
+    avg_salary_yearly.columns = ['Year', 'Average_Salary_Per_Agent']
+    
+    return {
+        'total': salary_mass_total,
+        'by_ministry': salary_mass_ministry,
+        'by_corps': salary_mass_corps,
+        'average_per_agent': avg_salary_yearly
+    }
+
+
+def allowance_tables(merged, facts):
+    """
+    Allowance tables from the enriched payroll lines (keyed by year first).
+    
+    Args:
+        merged (DataFrame): Enriched payroll lines
+        facts (DataFrame): Agent-year facts of the same lines
+        
+    Returns:
+        dict: Allowances by type, by ministry/corps/grade(/code) and per agent
+    """
+    # Allowance amounts by year and type
+    allowance_by_type = merged.groupby(['Annee', 'Type'])['Montind'].agg(['sum', 'mean', 'count']).reset_index()
+    allowance_by_type.columns = ['Year', 'Type', 'Total_Amount', 'Average_Amount', 'Count']
+    
+    # Allowance by ministry, corps, and grade
+    allowance_detailed = merged.groupby([
+        'Annee', 'Ministry', 'Corps_Name_FR', 'Grade_Name_FR'
+    ])['Montind'].agg(['sum', 'mean', 'count']).reset_index()
+    allowance_detailed.columns = ['Year', 'Ministry', 'Corps', 'Grade', 'Total_Amount', 'Average_Amount', 'Count']
+    
+    # Allowance by ministry, corps, grade and allowance code
+    allowance_by_code = merged.groupby([
+        'Annee', 'Ministry', 'Corps_Name_FR', 'Grade_Name_FR', 'Codind'
+    ])['Montind'].agg(['sum', 'count']).reset_index()
+    allowance_by_code.columns = ['Year', 'Ministry', 'Corps', 'Grade', 'Codind', 'Total_Amount', 'Count']
+    
+    # Number of allowances per agent by year
+    avg_allowances_per_agent = facts.groupby('Annee')['Line_Count'].mean().reset_index()
+    avg_allowances_per_agent.columns = ['Year', 'Average_Allowances_Per_Agent']
+    
+    return {
+        'by_type': allowance_by_type,
+        'detailed': allowance_detailed,
+        'by_code': allowance_by_code,
+        'per_agent': avg_allowances_per_agent
+    }
+
+
 class SalaryAnalyzer:
     """
     Main class for salary analysis and prediction system.
@@ -57,12 +331,41 @@ class SalaryAnalyzer:
         self.main_data = None
         self.nomenclature_tables = {}
         self.merged_data = None
+        self.agent_year_facts = None
+        self._loaded_data_id = None
+        self._released_data = None  # (files fingerprint, content key) of released lines
+        self.backend = None
+        
+        # Resident memory (MB) at the end of every data stage
+        self.memory_profile = {}
+        self._stage_depth = 0  # Number of data stages running (nested stages)
         
         # Analysis results
+        self.dataset_summary = None
         self.staff_evolution = None
         self.salary_mass_evolution = None
         self.allowance_analysis = None
+        self.fte_metrics = None
+        self.wage_bill_decomposition = None
+        self.query_cube = None
+        self.org_hierarchy = None
+        self._org_lookup = None
+        self.budget_execution = None
+        self._budget_lookup = None
         self.prediction_results = {}
+        self.backtest_results = None
+        self.reconciled_forecasts = None
+        self.global_forecasts = None
+        self.global_comparison = None
+        # Stored states of the online forecasts (see update_forecasts)
+        self.forecast_states = None
+        self.forecast_options = {'workers': 1, 'timeout': None, 'chunk_size': None, 'time_budget': None}
+        # Models chosen by the forecasting cascade in the last runs ('trends', 'allowances')
+        self.forecast_model_usage = {}
+        
+        # Bounded LRU cache of query() results
+        self.query_cache_size = 256
+        self._query_cache = OrderedDict()
         
         # File mappings
         self.data_files = {
@@ -76,6 +379,18 @@ class SalaryAnalyzer:
             'organigramme': 'table_organigramme_5_ministeres.cleaned.txt'
         }
         
+        # Persisted intermediates (agent-year facts, aggregates, ...)
+        self.cache_dir = self.data_dir / 'cache'
+        self.aggregate_store = AggregateStore(self.cache_dir / 'aggregates')
+        # Per-series forecast results keyed by content (None: always refit)
+        self.forecast_cache = ForecastCache(self.cache_dir / 'forecasts.sqlite')
+        
+        # Memoized results and their dependencies
+        self._source_keys = {}
+        self._last_target_years = [2025, 2026, 2027, 2028, 2029, 2030]
+        self.results = ResultGraph()
+        self._register_result_nodes()
+        
         print("SalaryAnalyzer initialized successfully!")
         print(f"Data directory: {self.data_dir}")
         
@@ -90,61 +405,13 @@ class SalaryAnalyzer:
             print("Loading data files...")
             
             # Load nomenclature tables first (smaller files)
-            for table_name, filename in self.data_files.items():
-                if table_name == 'main':
-                    continue
-                    
-                file_path = self.data_dir / filename
-                if file_path.exists():
-                    print(f"Loading {table_name} table...")
-                    
-                    # Detect separator and load accordingly
-                    if table_name in ['grade', 'corps']:
-                        self.nomenclature_tables[table_name] = pd.read_csv(
-                            file_path, 
-                            sep=';', 
-                            encoding=self.encoding,
-                            header=None
-                        )
-                    else:
-                        self.nomenclature_tables[table_name] = pd.read_csv(
-                            file_path, 
-                            sep=';', 
-                            encoding=self.encoding
-                        )
-                else:
-                    print(f"Warning: {filename} not found")
+            self._load_nomenclature_tables()
             
-            # Load main payroll data
-            main_file = self.data_dir / self.data_files['main']
-            if main_file.exists():
-                print("Loading main payroll data (this may take a while)...")
-                
-                # Try to load main data with proper column names
-                main_columns = [
-                    'Codetab', 'Mois', 'Annee', 'Type', 'Nligne', 'Codind', 
-                    'Montind', 'Article', 'Par', 'Codgrd', 'Codcorps', 'Hcorps',
-                    'Codefam', 'Codsfam', 'Codnat', 'Dire', 'Sdir', 'Serv',
-                    'Deleg', 'Centreg', 'Gouv', 'Id_agent'
-                ]
-                
-                # Load in chunks to handle large file
-                chunk_list = []
-                chunk_size = 10000
-                
-                for chunk in pd.read_csv(main_file, sep=';', encoding=self.encoding, 
-                                       names=main_columns, chunksize=chunk_size):
-                    chunk_list.append(chunk)
-                
-                self.main_data = pd.concat(chunk_list, ignore_index=True)
-                print(f"Main data loaded: {len(self.main_data)} records")
-                
-            else:
-                print(f"Error: Main data file {self.data_files['main']} not found")
+            # Load and clean main payroll data
+            if not self._load_main_data():
                 return False
             
-            # Clean and prepare data
-            self._clean_main_data()
+            # Prepare nomenclature tables
             self._prepare_nomenclature_tables()
             
             print("Data loading completed successfully!")
@@ -154,136 +421,860 @@ class SalaryAnalyzer:
             print(f"Error loading data: {e}")
             return False
     
-    def _clean_main_data(self):
-        """Clean and prepare the main payroll data."""
-        print("Cleaning main data...")
+    def _load_nomenclature_tables(self):
+        """Load the nomenclature tables (everything except the main payroll file)."""
+        for table_name, filename in self.data_files.items():
+            if table_name == 'main':
+                continue
+                
+            file_path = self.data_dir / filename
+            if file_path.exists():
+                print(f"Loading {table_name} table...")
+                
+                # Detect separator and load accordingly
+                if table_name in ['grade', 'corps']:
+                    self.nomenclature_tables[table_name] = pd.read_csv(
+                        file_path, 
+                        sep=';', 
+                        encoding=self.encoding,
+                        header=None
+                    )
+                else:
+                    self.nomenclature_tables[table_name] = pd.read_csv(
+                        file_path, 
+                        sep=';', 
+                        encoding=self.encoding
+                    )
+            else:
+                print(f"Warning: {filename} not found")
+    
+    def _load_main_data(self):
+        """
+        Load and clean the main payroll data.
+        
+        Every chunk is cleaned as soon as it is read, so that only the
+        cleaned lines are kept: the raw chunks are freed one by one instead
+        of being held until the whole file is read.
+        
+        Returns:
+            bool: True if the file was loaded, False if it is missing
+        """
+        main_file = self.data_dir / self.data_files['main']
+        if not main_file.exists():
+            print(f"Error: Main data file {self.data_files['main']} not found")
+            return False
         
+        print("Loading main payroll data (this may take a while)...")
+        with self._memory_stage('load'):
+            self.main_data = None
+            raw_records = 0
+            chunk_list = []
+            for chunk in pd.read_csv(main_file, sep=';', encoding=self.encoding,
+                                     names=MAIN_COLUMNS, chunksize=PAYROLL_CHUNK_SIZE):
+                raw_records += len(chunk)
+                chunk_list.append(self._clean_payroll_frame(chunk))
+                del chunk
+            
+            self.main_data = pd.concat(chunk_list, ignore_index=True)
+            del chunk_list
+        
+        print(f"Main data loaded: {raw_records} records")
+        print(f"Main data cleaned: {len(self.main_data)} records remaining")
+        self._loaded_data_id = id(self.main_data)
+        self._released_data = None
+        return True
+    
+    def _clean_payroll_frame(self, frame):
+        """
+        Apply the cleaning rules to payroll lines (the whole file or one chunk).
+        
+        Args:
+            frame (DataFrame): Raw payroll lines with MAIN_COLUMNS
+            
+        Returns:
+            DataFrame: Cleaned payroll lines
+        """
         # Convert data types
-        self.main_data['Annee'] = pd.to_numeric(self.main_data['Annee'], errors='coerce')
-        self.main_data['Mois'] = pd.to_numeric(self.main_data['Mois'], errors='coerce')
-        self.main_data['Montind'] = pd.to_numeric(self.main_data['Montind'], errors='coerce')
-        self.main_data['Type'] = pd.to_numeric(self.main_data['Type'], errors='coerce')
+        frame['Annee'] = pd.to_numeric(frame['Annee'], errors='coerce')
+        frame['Mois'] = pd.to_numeric(frame['Mois'], errors='coerce')
+        frame['Montind'] = pd.to_numeric(frame['Montind'], errors='coerce')
+        frame['Type'] = pd.to_numeric(frame['Type'], errors='coerce')
         
         # Filter valid years (2013-2023)
-        self.main_data = self.main_data[
-            (self.main_data['Annee'] >= 2013) & 
-            (self.main_data['Annee'] <= 2023)
+        frame = frame[
+            (frame['Annee'] >= 2013) & 
+            (frame['Annee'] <= 2023)
         ]
         
         # Remove rows with missing critical data
         critical_columns = ['Annee', 'Mois', 'Montind', 'Id_agent', 'Codetab']
-        self.main_data = self.main_data.dropna(subset=critical_columns)
+        frame = frame.dropna(subset=critical_columns)
         
         # Create date column with proper error handling
         try:
             # Create a temporary DataFrame with year, month, day columns
             date_df = pd.DataFrame({
-                'year': self.main_data['Annee'],
-                'month': self.main_data['Mois'],
+                'year': frame['Annee'],
+                'month': frame['Mois'],
                 'day': 1
             })
-            self.main_data['Date'] = pd.to_datetime(date_df, errors='coerce')
+            frame['Date'] = pd.to_datetime(date_df, errors='coerce')
         except Exception as e:
             print(f"Warning: Could not create datetime column: {e}")
             # Create a simple date string instead
-            self.main_data['Date'] = self.main_data['Annee'].astype(str) + '-' + self.main_data['Mois'].astype(str).str.zfill(2) + '-01'
+            frame['Date'] = frame['Annee'].astype(str) + '-' + frame['Mois'].astype(str).str.zfill(2) + '-01'
         
-        print(f"Main data cleaned: {len(self.main_data)} records remaining")
+        # Month bit (January = bit 0) used to build the months-present masks
+        months = frame['Mois'].to_numpy()
+        valid_month = (months >= 1) & (months <= 12)
+        month_shift = np.where(valid_month, months - 1, 0).astype(np.uint16)
+        frame['Month_Bit'] = np.where(valid_month, np.left_shift(np.uint16(1), month_shift), 0).astype(np.uint16)
+        
+        return frame
     
     def _prepare_nomenclature_tables(self):
-        """Prepare nomenclature tables with proper column names."""
+        """
+        Prepare nomenclature tables with proper column names.
+        
+        A table with two extra trailing columns is effective-dated: they hold
+        the validity period (Valid_From, Valid_To; empty means open-ended) of
+        every row, and a code may have one row per period.
+        """
         print("Preparing nomenclature tables...")
         
         # Grade table
         if 'grade' in self.nomenclature_tables:
-            self.nomenclature_tables['grade'].columns = [
+            self._name_nomenclature_columns('grade', [
                 'Codgrd', 'Code2', 'Level', 'Grade_Name_FR', 'Grade_Name_AR', 'Ministry'
-            ]
+            ])
         
         # Corps table
         if 'corps' in self.nomenclature_tables:
-            self.nomenclature_tables['corps'].columns = [
+            self._name_nomenclature_columns('corps', [
                 'Codcorps', 'Corps_Name_FR', 'Corps_Name_AR'
-            ]
+            ])
         
         # Establishment table
         if 'establishment' in self.nomenclature_tables:
-            self.nomenclature_tables['establishment'].columns = [
+            self._name_nomenclature_columns('establishment', [
                 'Codetab', 'Establishment_Name_FR', 'Establishment_Name_AR', 'Type'
-            ]
+            ])
         
         print("Nomenclature tables prepared successfully!")
     
+    def _name_nomenclature_columns(self, table_name, columns):
+        """Name the columns of a nomenclature table and parse its validity period if any."""
+        table = self.nomenclature_tables[table_name]
+        if len(table.columns) == len(columns) + 2:
+            table.columns = columns + ['Valid_From', 'Valid_To']
+            table['Valid_From'] = pd.to_datetime(table['Valid_From'], errors='coerce')
+            table['Valid_To'] = pd.to_datetime(table['Valid_To'], errors='coerce')
+            print(f"{table_name.capitalize()} table is effective-dated ({len(table)} periods)")
+        else:
+            table.columns = columns
+    
+    def _join_nomenclature(self, lines, table_name, key, columns, date_column='Date'):
+        """
+        Attach nomenclature columns to payroll lines (same rows, same order).
+        
+        Static tables are merged on the code. Effective-dated tables are
+        joined as of the date of every line: a sorted merge_asof on the
+        validity start, then rows past their validity end are blanked, so
+        every line gets the labels valid at its pay date without row
+        explosion.
+        
+        Args:
+            lines (DataFrame): Payroll lines with the key and date columns
+            table_name (str): Nomenclature table
+            key (str): Code column shared by the lines and the table
+            columns (list): Table columns to attach
+            date_column (str): Date of the lines
+            
+        Returns:
+            DataFrame: Lines with the columns attached
+        """
+        table = self.nomenclature_tables[table_name]
+        if 'Valid_From' not in table.columns:
+            return pd.merge(lines, table[[key] + columns], on=key, how='left')
+        
+        periods = table[[key, 'Valid_From', 'Valid_To'] + columns].dropna(subset=[key]).copy()
+        periods['Valid_From'] = periods['Valid_From'].fillna(pd.Timestamp('1900-01-01')).astype('datetime64[ns]')
+        periods['Valid_To'] = periods['Valid_To'].astype('datetime64[ns]')
+        if pd.api.types.is_numeric_dtype(lines[key]) and pd.api.types.is_numeric_dtype(periods[key]):
+            periods[key] = periods[key].astype(lines[key].dtype)
+        periods = periods.sort_values('Valid_From', kind='mergesort')
+        
+        dated = pd.DataFrame({
+            key: lines[key].to_numpy(),
+            '_date': pd.to_datetime(lines[date_column], errors='coerce').astype('datetime64[ns]').to_numpy(),
+            '_row': np.arange(len(lines))
+        }).dropna(subset=[key, '_date']).sort_values('_date', kind='mergesort')
+        
+        joined = pd.merge_asof(dated, periods, left_on='_date', right_on='Valid_From',
+                               by=key, direction='backward')
+        expired = joined['Valid_To'].notna() & (joined['_date'] > joined['Valid_To'])
+        joined.loc[expired, columns] = np.nan
+        
+        attached = joined.set_index('_row')[columns].reindex(np.arange(len(lines)))
+        return pd.concat([lines.reset_index(drop=True), attached.reset_index(drop=True)], axis=1)
+    
+    def _labels_at_mid_year(self, frame):
+        """
+        Ministry, grade and corps labels of agent-year rows (Annee, Codgrd, Codcorps).
+        
+        Labels are the ones valid on July 1st of the year of every row.
+        
+        Returns:
+            DataFrame: Ministry, Grade and Corps columns aligned with the rows
+        """
+        rows = frame[['Annee', 'Codgrd', 'Codcorps']].reset_index(drop=True)
+        rows['Date'] = pd.to_datetime(pd.DataFrame({'year': rows['Annee'], 'month': 7, 'day': 1}),
+                                      errors='coerce')
+        labels = pd.DataFrame(index=rows.index, columns=['Ministry', 'Grade', 'Corps'], dtype=object)
+        
+        # One row per code in static tables (duplicated codes must not duplicate agents)
+        if 'grade' in self.nomenclature_tables:
+            grades = self._join_nomenclature(rows, 'grade', 'Codgrd', ['Ministry', 'Grade_Name_FR']) \
+                if 'Valid_From' in self.nomenclature_tables['grade'].columns else \
+                rows.merge(self.nomenclature_tables['grade'].drop_duplicates('Codgrd')[['Codgrd', 'Ministry', 'Grade_Name_FR']],
+                           on='Codgrd', how='left')
+            labels['Ministry'] = grades['Ministry'].to_numpy()
+            labels['Grade'] = grades['Grade_Name_FR'].to_numpy()
+        if 'corps' in self.nomenclature_tables:
+            corps = self._join_nomenclature(rows, 'corps', 'Codcorps', ['Corps_Name_FR']) \
+                if 'Valid_From' in self.nomenclature_tables['corps'].columns else \
+                rows.merge(self.nomenclature_tables['corps'].drop_duplicates('Codcorps')[['Codcorps', 'Corps_Name_FR']],
+                           on='Codcorps', how='left')
+            labels['Corps'] = corps['Corps_Name_FR'].to_numpy()
+        return labels
+    
+    def _register_result_nodes(self):
+        """Declare the analysis results and their dependencies."""
+        graph = self.results
+        # The payroll lines are held weakly: they are freed by release_data()
+        graph.add_node('data', self._payroll_lines,
+                       source_key=self._data_source_key,
+                       hash_output=False, weak=True)
+        graph.add_node('nomenclature', lambda: self.nomenclature_tables,
+                       source_key=lambda: self._source_key('nomenclature', self.nomenclature_tables),
+                       hash_output=False)
+        graph.add_node('enriched', self._staged('enriched', self._merge_data_with_nomenclature),
+                       depends_on=['data', 'nomenclature'], hash_output=False, weak=True)
+        graph.add_node('dataset_summary', self._persisted('dataset_summary', self._summarize_dataset),
+                       depends_on=['data'])
+        graph.add_node('agent_year_facts', self._staged('agent_year_facts', self._build_agent_year_facts),
+                       depends_on=['data'], key_params=[])
+        graph.add_node('fte_metrics', self._calculate_fte_metrics,
+                       depends_on=['agent_year_facts', 'nomenclature'])
+        graph.add_node('staff_evolution', self._persisted('staff_evolution', self._staged('staff_evolution', self._calculate_staff_evolution)),
+                       depends_on=['enriched', 'agent_year_facts'])
+        graph.add_node('salary_mass', self._persisted('salary_mass', self._staged('salary_mass', self._calculate_salary_mass)),
+                       depends_on=['enriched', 'agent_year_facts'])
+        graph.add_node('allowances', self._persisted('allowances', self._staged('allowances', self._analyze_allowances)),
+                       depends_on=['enriched', 'agent_year_facts'])
+        graph.add_node('query_cube', self._persisted('query_cube', self._staged('query_cube', self._build_query_cube)),
+                       depends_on=['enriched'])
+        graph.add_node('org_hierarchy', self._persisted('org_hierarchy', self._staged('org_hierarchy', self._build_org_hierarchy)),
+                       depends_on=['enriched'])
+        graph.add_node('budget_execution', self._persisted('budget_execution', self._staged('budget_execution', self._build_budget_execution)),
+                       depends_on=['enriched'])
+        graph.add_node('wage_bill_decomposition', self._decompose_salary_mass_change,
+                       depends_on=['agent_year_facts', 'nomenclature'])
+        # Options of the per-series forecasts (use_forecast_executor, set_forecast_time_budget)
+        graph.add_node('forecast_options', lambda: self.forecast_options,
+                       source_key=lambda: content_hash(self.forecast_options), hash_output=False)
+        graph.add_node('forecasts', self._predict_future_trends,
+                       depends_on=['staff_evolution', 'salary_mass', 'forecast_options'])
+        graph.add_node('allowance_forecasts', self._compute_allowance_trends,
+                       depends_on=['allowances', 'forecast_options'])
+        graph.add_node('backtest', self._backtest_forecasts,
+                       depends_on=['allowances'])
+        graph.add_node('global_forecasts', self._global_allowance_forecasts,
+                       depends_on=['allowances'])
+        graph.add_node('global_comparison', self._compare_global_model,
+                       depends_on=['allowances', 'forecast_options'])
+        graph.add_node('online_forecasts', self._update_forecasts,
+                       depends_on=['staff_evolution', 'salary_mass', 'allowances'])
+        graph.add_node('forecast_hierarchy', self._build_forecast_hierarchy,
+                       depends_on=['allowances'])
+        graph.add_node('reconciled_forecasts', self._reconcile_allowance_forecasts,
+                       depends_on=['allowances', 'forecast_hierarchy'])
+        graph.add_node('allowance_report', self._generate_allowance_report,
+                       depends_on=['allowances', 'allowance_forecasts'])
+    
+    def _source_key(self, name, value):
+        """Content key of a source result, rehashed only when the object is replaced."""
+        if value is None:
+            return f"{name}:none"
+        if isinstance(value, dict):
+            token = tuple((k, id(v), getattr(v, 'shape', None)) for k, v in value.items())
+        else:
+            token = (id(value), getattr(value, 'shape', None))
+        cached = self._source_keys.get(name)
+        if cached is None or cached[0] != token:
+            cached = (token, content_hash(value))
+            self._source_keys[name] = cached
+        return cached[1]
+    
+    def _payroll_lines(self):
+        """Cleaned payroll lines, reloaded from the files if they were released."""
+        if self.main_data is None and self._released_data is not None:
+            print("Reloading released payroll data...")
+            if not self._load_main_data():
+                raise RuntimeError("Could not reload the released payroll data")
+        return self.main_data
+    
+    def _data_source_key(self):
+        """Content key of the payroll lines (kept while released lines are unchanged on disk)."""
+        if self.main_data is None and self._released_data is not None:
+            fingerprint, key = self._released_data
+            if fingerprint == self._dataset_fingerprint():
+                return key
+        return self._source_key('data', self._payroll_lines())
+    
+    def release_data(self, enriched=True):
+        """
+        Release the payroll lines held in memory.
+        
+        The cleaned lines (main_data) are only read to build the enriched
+        lines, the dataset summary and the agent-year facts, and the
+        enriched lines (merged_data) only to build the aggregates: once
+        these are computed, the lines can be released. The result graph
+        holds them weakly, so they are then freed. Computed results stay
+        memoized, and released lines are reloaded from the files only if a
+        later result needs them.
+        
+        Args:
+            enriched (bool): Release the enriched lines too (False: only the
+                cleaned lines, e.g. right after the enrichment)
+            
+        Returns:
+            bool: True if the lines were released
+        """
+        if self.main_data is not None:
+            if id(self.main_data) != self._loaded_data_id:
+                print("Warning: main_data was modified in memory and cannot be reloaded; not released")
+                return False
+            self._released_data = (self._dataset_fingerprint(), self.results.key('data'))
+        
+        with self._memory_stage('release'):
+            self.main_data = None
+            if enriched:
+                self.merged_data = None
+            gc.collect()
+        
+        print("Payroll data released" + (" (enriched lines kept)" if not enriched else ""))
+        return True
+    
+    @contextmanager
+    def _memory_stage(self, stage):
+        """
+        Record the resident memory of a data stage in memory_profile.
+        
+        The peak is reset at the start of the outermost stage where the
+        platform allows it (Linux); elsewhere it is the peak of the process
+        so far. Stages run inside another stage (e.g. the enriched lines
+        computed for an aggregate) do not reset it: the peak of the outer
+        stage includes the peaks of its nested stages, and the peak of a
+        nested stage is the peak since the outermost stage started.
+        
+        Args:
+            stage (str): Stage name
+        """
+        if self._stage_depth == 0:
+            reset_peak_memory()
+        self._stage_depth += 1
+        try:
+            yield
+        finally:
+            self._stage_depth -= 1
+        current, peak = memory_usage_mb()
+        self.memory_profile[stage] = {'rss_mb': current, 'peak_rss_mb': peak}
+        if peak is not None:
+            current_text = f"{current:,.0f} MB" if current is not None else "n/a"
+            print(f"Memory after {stage}: {current_text} resident, peak {peak:,.0f} MB")
+    
+    def _staged(self, stage, compute):
+        """Wrap a result computation so that its memory is recorded as a stage."""
+        def compute_in_stage(**params):
+            with self._memory_stage(stage):
+                return compute(**params)
+        return compute_in_stage
+    
+    def _dataset_fingerprint(self):
+        """Key of the data files version (name, size, modification time) and of the code version."""
+        digest = hashlib.sha1(f"{CODE_VERSION};".encode())
+        for table_name, filename in sorted(self.data_files.items()):
+            file_path = self.data_dir / filename
+            if file_path.exists():
+                stat = file_path.stat()
+                digest.update(f"{filename}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+        return digest.hexdigest()[:16]
+    
+    def _files_token(self):
+        """Dataset fingerprint while the data in memory is the one loaded from the files."""
+        if self.main_data is not None and id(self.main_data) != self._loaded_data_id:
+            return f"modified:{id(self.main_data)}"
+        return self._dataset_fingerprint()
+    
+    def _persisted(self, name, compute):
+        """Wrap a result computation so that its output is saved in the aggregate store."""
+        def compute_and_store(**params):
+            value = compute(**params)
+            token = self._files_token()
+            if self._loaded_data_id is not None and not token.startswith('modified:'):
+                tables = value if isinstance(value, dict) else {'summary': value}
+                self.aggregate_store.put(f"{token}_{name}", tables)
+            return value
+        return compute_and_store
+    
+    def restore_aggregates(self):
+        """
+        Reload the staff, salary mass and allowance aggregates of a previous run.
+        
+        The aggregates are restored only if the data files and the analysis
+        code are unchanged, and are then served without loading the raw data.
+        The payroll lines are then treated as released: results that need
+        them (agent-year facts, FTE metrics, queries, ...) reload the files.
+        
+        Returns:
+            bool: True if all persisted aggregates were restored
+        """
+        token = self._files_token()
+        if token.startswith('modified:'):
+            return False
+        
+        restored = {}
+        for name in PERSISTED_RESULTS:
+            tables = self.aggregate_store.get(f"{token}_{name}")
+            if tables is None:
+                if name in REQUIRED_AGGREGATES:
+                    return False
+                continue
+            restored[name] = tables['summary'] if name == 'dataset_summary' else tables
+        
+        for name, value in restored.items():
+            setattr(self, PERSISTED_RESULTS[name], value)
+            self.results.seed(name, value, self._files_token)
+        
+        # Lines are reloaded on demand; the nomenclature tables are small
+        if self.main_data is None:
+            self._released_data = (token, f"files:{token}")
+        if not self.nomenclature_tables:
+            self._load_nomenclature_tables()
+            self._prepare_nomenclature_tables()
+        
+        print("Aggregates restored from cache (data files unchanged)")
+        return True
+    
+    def load_or_restore(self):
+        """
+        Restore the persisted aggregates, or load, clean and enrich the raw data.
+        
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        if self.restore_aggregates():
+            return True
+        
+        if not self.load_and_clean_data():
+            return False
+        
+        self.merge_data_with_nomenclature()
+        return True
+    
+    def use_database(self, db_path='cache/payroll.sqlite'):
+        """
+        Compute the aggregates in SQL on an embedded analytical database.
+        
+        The database is built once by analytical_database.build_database().
+        The dataset summary, staff, salary mass and allowance aggregates are
+        then pushed down as SQL queries: the raw payroll lines are never
+        loaded in memory and several processes can query the same file.
+        
+        Args:
+            db_path (str): Database file, relative to the data directory
+        """
+        from analytical_database import SQLiteBackend
+        
+        db_file = Path(db_path)
+        if not db_file.is_absolute():
+            db_file = self.data_dir / db_file
+        print(f"Using analytical database: {db_file}")
+        self._use_backend(SQLiteBackend(db_file), 'in the analytical database')
+    
+    def use_engine(self, engine='pandas', **options):
+        """
+        Select the execution engine of the load/clean/merge/aggregate pipeline.
+        
+        'pandas' (default) runs the pipeline in memory on pandas DataFrames.
+        'polars' runs it on Polars lazy frames: the payroll file is scanned,
+        cleaned, joined and aggregated in one multi-threaded query plan, and
+        the results are returned as the same pandas tables.
+        'parallel' runs the pandas aggregations of every year in a pool of
+        processes (option workers) and concatenates the yearly tables.
+        
+        Args:
+            engine (str): Name of the engine ('pandas', 'polars' or 'parallel')
+            **options: Engine options
+        """
+        if engine == 'pandas':
+            self.backend = None
+            self._register_result_nodes()
+            print("Using the pandas engine")
+            return
+        
+        from execution_backends import get_backend
+        
+        self._use_backend(get_backend(engine, self, **options), f"with the {engine} engine")
+        print(f"Using the {engine} engine")
+    
+    def _use_backend(self, backend, description):
+        """Compute the summary, staff, salary mass and allowance results with a backend."""
+        self.backend = backend
+        
+        def from_backend(name, query):
+            def compute():
+                print(f"Computing {name.replace('_', ' ')} {description}...")
+                value = query()
+                setattr(self, PERSISTED_RESULTS[name], value)
+                return value
+            return compute
+        
+        graph = self.results
+        graph.add_node('backend', lambda: backend,
+                       source_key=backend.version, hash_output=False)
+        for name in REQUIRED_AGGREGATES:
+            graph.add_node(name, from_backend(name, getattr(backend, name)),
+                           depends_on=['backend'])
+    
+    def invalidate_results(self, name=None):
+        """
+        Forget memoized results after an in-place change of the data.
+        
+        Reassigning main_data or the nomenclature tables is detected
+        automatically; in-place edits of the same objects are not.
+        
+        Args:
+            name (str): Result to invalidate with its dependants (None: all)
+        """
+        if name is None:
+            self._source_keys.clear()
+        else:
+            self._source_keys.pop(name, None)
+        self.results.invalidate(name)
+    
     def merge_data_with_nomenclature(self):
         """Merge main data with nomenclature tables for enriched analysis."""
+        return self.results.get('enriched')
+    
+    def _merge_data_with_nomenclature(self):
+        """Compute the enriched (merged) payroll lines."""
         print("Merging data with nomenclature tables...")
         
-        self.merged_data = self.main_data.copy()
+        # Shallow copy: the joins below build the enriched frame, the
+        # cleaned lines are not copied first
+        self.merged_data = self.results.get('data').copy(deep=False)
         
         # Merge with grade table
         if 'grade' in self.nomenclature_tables:
-            self.merged_data = pd.merge(
-                self.merged_data,
-                self.nomenclature_tables['grade'][['Codgrd', 'Grade_Name_FR', 'Level', 'Ministry']],
-                on='Codgrd',
-                how='left'
+            self.merged_data = self._join_nomenclature(
+                self.merged_data, 'grade', 'Codgrd', ['Grade_Name_FR', 'Level', 'Ministry']
             )
         
         # Merge with corps table
         if 'corps' in self.nomenclature_tables:
-            self.merged_data = pd.merge(
-                self.merged_data,
-                self.nomenclature_tables['corps'][['Codcorps', 'Corps_Name_FR']],
-                on='Codcorps',
-                how='left'
+            self.merged_data = self._join_nomenclature(
+                self.merged_data, 'corps', 'Codcorps', ['Corps_Name_FR']
             )
         
         # Merge with establishment table
         if 'establishment' in self.nomenclature_tables:
-            self.merged_data = pd.merge(
-                self.merged_data,
-                self.nomenclature_tables['establishment'][['Codetab', 'Establishment_Name_FR']],
-                on='Codetab',
-                how='left'
+            self.merged_data = self._join_nomenclature(
+                self.merged_data, 'establishment', 'Codetab', ['Establishment_Name_FR']
             )
         
         print(f"Data merged successfully: {len(self.merged_data)} records")
         return self.merged_data
+
+    def summarize_dataset(self):
+        """
+        Summarize the cleaned payroll data (records, years, agents, establishments).
+        
+        Returns:
+            dict: Dataset overview
+        """
+        return self.results.get('dataset_summary').iloc[0].to_dict()
     
-    def calculate_staff_evolution(self):
+    def _summarize_dataset(self):
+        """Compute the dataset overview as a one-row table."""
+        lines = self.results.get('data')
+        self.dataset_summary = pd.DataFrame([{
+            'total_records': int(len(lines)),
+            'first_year': int(lines['Annee'].min()),
+            'last_year': int(lines['Annee'].max()),
+            'unique_agents': int(lines['Id_agent'].nunique()),
+            'unique_establishments': int(lines['Codetab'].nunique())
+        }])
+        return self.dataset_summary
+    
+    def build_agent_year_facts(self, persist=True):
         """
-        Calculate staff evolution over time by department, corps, and grade.
+        Build the agent-year fact table (one row per agent per year).
+
+        The table holds the Montind totals by payroll Type, the number of
+        payroll lines, the 12-bit months-present mask and the modal
+        Codgrd/Codcorps/Codetab of every agent in every year. Per-agent
+        metrics and headcounts are read from this table instead of grouping
+        the raw payroll lines again.
+
+        Args:
+            persist (bool): Save the table in the cache directory and reload
+                it on later runs while the payroll content is unchanged
+
+        Returns:
+            DataFrame: Agent-year fact table
+        """
+        return self.results.get('agent_year_facts', persist=persist)
+
+    def _build_agent_year_facts(self, persist=True):
+        """Compute (or reload) the agent-year fact table."""
+        facts_file = self.cache_dir / f"agent_year_facts_{self._data_cache_key()}.parquet"
+        if persist and facts_file.exists():
+            try:
+                self.agent_year_facts = pd.read_parquet(facts_file)
+                print(f"Agent-year facts loaded from cache: {len(self.agent_year_facts)} rows")
+                return self.agent_year_facts
+            except Exception as e:
+                print(f"Warning: Could not read cached agent-year facts: {e}")
+
+        print("Building agent-year fact table...")
+        keys = ['Annee', 'Id_agent']
+        lines = self.results.get('data')
+
+        facts = agent_year_totals(lines)
+
+        # Montind totals by payroll type, one column per type
+        by_type = lines.groupby(keys + ['Type'])['Montind'].sum().unstack('Type', fill_value=0)
+        by_type.columns = [f"Montind_Type_{int(t)}" for t in by_type.columns]
+        facts = facts.join(by_type).fillna({col: 0 for col in by_type.columns})
+
+        # Months-present mask: OR of the month bits (sum of the distinct bits)
+        month_bits = lines[keys + ['Month_Bit']].drop_duplicates()
+        facts['Months_Mask'] = month_bits.groupby(keys)['Month_Bit'].sum().astype(np.uint16)
+
+        # Modal classification codes of the agent in the year
+        for column in ['Codgrd', 'Codcorps', 'Codetab']:
+            facts[column] = self._modal_value(lines, keys, column)
+
+        self.agent_year_facts = facts.reset_index()
+        print(f"Agent-year fact table built: {len(self.agent_year_facts)} rows")
+
+        if persist:
+            try:
+                self.cache_dir.mkdir(parents=True, exist_ok=True)
+                self.agent_year_facts.to_parquet(facts_file, index=False)
+            except Exception as e:
+                print(f"Warning: Could not persist agent-year facts: {e}")
+
+        return self.agent_year_facts
+
+    def calculate_fte_metrics(self):
+        """
+        Calculate full-time-equivalent staff metrics from the months-present masks.
+        
+        An agent paid for k months of a year counts as k/12 FTE. Entries are
+        agents absent in January and exits agents absent in December of the
+        year. Agents are attributed to the ministry, corps and grade of their
+        modal Codgrd/Codcorps in the year.
         
         Returns:
-            dict: Dictionary containing staff evolution data
+            dict: Dictionary containing FTE metrics (total, by ministry, corps, grade)
         """
-        print("Calculating staff evolution...")
+        return self.results.get('fte_metrics')
+    
+    def _calculate_fte_metrics(self):
+        """Compute the FTE staff metrics."""
+        print("Calculating FTE staff metrics...")
+        
+        facts = self.build_agent_year_facts()
+        masks = facts['Months_Mask'].to_numpy(dtype=np.uint16)
+        
+        agents = pd.DataFrame({
+            'Year': facts['Annee'],
+            'Months': MONTH_POPCOUNT[masks],
+            'Entries': (masks & 1) == 0,
+            'Exits': (masks & (1 << 11)) == 0
+        })
+        
+        # Attach labels of the modal grade and corps
+        labels = self._labels_at_mid_year(facts)
+        if 'grade' in self.nomenclature_tables:
+            agents['Ministry'] = labels['Ministry'].to_numpy()
+            agents['Grade'] = labels['Grade'].to_numpy()
+        if 'corps' in self.nomenclature_tables:
+            agents['Corps'] = labels['Corps'].to_numpy()
+        
+        def summarize(keys):
+            summary = agents.groupby(keys).agg(
+                Staff_Count=('Months', 'size'),
+                Months_Worked=('Months', 'sum'),
+                Entries=('Entries', 'sum'),
+                Exits=('Exits', 'sum')
+            ).reset_index()
+            summary['FTE'] = summary['Months_Worked'] / 12
+            summary['Average_Months_Worked'] = summary['Months_Worked'] / summary['Staff_Count']
+            return summary[keys + ['Staff_Count', 'FTE', 'Average_Months_Worked', 'Entries', 'Exits']]
+        
+        self.fte_metrics = {'total': summarize(['Year'])}
+        for dimension in ['Ministry', 'Corps', 'Grade']:
+            if dimension in agents.columns:
+                self.fte_metrics[f"by_{dimension.lower()}"] = summarize(['Year', dimension])
+        
+        print("FTE staff metrics calculation completed!")
+        return self.fte_metrics
+    
+    def decompose_salary_mass_change(self, start_year=2013, end_year=2023):
+        """
+        Decompose the salary mass change between two years.
         
-        if self.merged_data is None:
-            self.merge_data_with_nomenclature()
+        For every group (total, ministry, corps, grade) the change is split
+        into three effects that add up exactly to it (midpoint shift-share
+        over the grades of the group, agents attributed to their modal grade):
+        - Headcount_Effect: change in the number of agents at constant pay
+        - Grade_Mix_Effect: change in the grade composition of the agents
+        - Average_Pay_Effect: change in the average pay within each grade
         
-        # Calculate unique staff count by year
-        staff_by_year = self.merged_data.groupby('Annee')['Id_agent'].nunique().reset_index()
-        staff_by_year.columns = ['Year', 'Staff_Count']
+        Args:
+            start_year (int): Reference year
+            end_year (int): Compared year
+            
+        Returns:
+            dict: One table per level (total, by_ministry, by_corps, by_grade)
+        """
+        return self.results.get('wage_bill_decomposition', start_year=int(start_year), end_year=int(end_year))
+    
+    def _decompose_salary_mass_change(self, start_year, end_year):
+        """Compute the salary mass change decomposition from the agent-year facts."""
+        print(f"Decomposing salary mass change {start_year}-{end_year}...")
+        
+        facts = self.build_agent_year_facts()
+        facts = facts[facts['Annee'].isin([start_year, end_year])]
+        
+        # Agents and salary mass of every (year, grade, corps) cell
+        cells = facts.groupby(['Annee', 'Codgrd', 'Codcorps'], dropna=False).agg(
+            Staff=('Total_Montind', 'size'),
+            Mass=('Total_Montind', 'sum')
+        ).reset_index()
+        
+        # Labels of the grades and corps (valid in the year of the cell)
+        labels = self._labels_at_mid_year(cells)
+        cells['Ministry'] = labels['Ministry'].to_numpy()
+        cells['Grade'] = labels['Grade'].to_numpy()
+        cells['Corps'] = labels['Corps'].to_numpy()
+        
+        levels = {
+            'total': [],
+            'by_ministry': ['Ministry'],
+            'by_corps': ['Corps'],
+            'by_grade': ['Grade']
+        }
+        self.wage_bill_decomposition = {
+            level: self._shift_share(cells, keys, start_year, end_year)
+            for level, keys in levels.items()
+        }
         
-        # Calculate staff by ministry and year
-        staff_by_ministry = self.merged_data.groupby(['Annee', 'Ministry'])['Id_agent'].nunique().reset_index()
-        staff_by_ministry.columns = ['Year', 'Ministry', 'Staff_Count']
+        print("Salary mass change decomposition completed!")
+        return self.wage_bill_decomposition
+    
+    def _shift_share(self, cells, group_keys, start_year, end_year):
+        """Midpoint shift-share decomposition of every group over its grade cells."""
+        cells = cells.copy()
+        cells['_group'] = 0
+        keys = group_keys or ['_group']
+        if group_keys:
+            cells = cells.dropna(subset=group_keys)
+        
+        # One row per (group, grade) cell, start and end year side by side
+        table = cells.groupby(keys + ['Codgrd', 'Annee'], dropna=False)[['Staff', 'Mass']].sum()
+        table = table.unstack('Annee', fill_value=0).reindex(
+            columns=pd.MultiIndex.from_product([['Staff', 'Mass'], [start_year, end_year]]), fill_value=0
+        )
+        staff0 = table[('Staff', start_year)].to_numpy(dtype=float)
+        staff1 = table[('Staff', end_year)].to_numpy(dtype=float)
+        mass0 = table[('Mass', start_year)].to_numpy(dtype=float)
+        mass1 = table[('Mass', end_year)].to_numpy(dtype=float)
+        
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # Average pay of every cell (taken from the other year when the cell is empty)
+            pay0 = np.where(staff0 > 0, mass0 / staff0, np.nan)
+            pay1 = np.where(staff1 > 0, mass1 / staff1, np.nan)
+            pay0 = np.where(np.isnan(pay0), pay1, pay0)
+            pay1 = np.where(np.isnan(pay1), pay0, pay1)
+            pay0 = np.nan_to_num(pay0)
+            pay1 = np.nan_to_num(pay1)
+            
+            group_index = table.index.droplevel('Codgrd')
+            total0 = pd.Series(staff0, index=group_index).groupby(level=keys).transform('sum').to_numpy()
+            total1 = pd.Series(staff1, index=group_index).groupby(level=keys).transform('sum').to_numpy()
+            share0 = np.where(total0 > 0, staff0 / total0, 0.0)
+            share1 = np.where(total1 > 0, staff1 / total1, 0.0)
+        
+        terms = pd.DataFrame({
+            'Staff_Start': staff0,
+            'Staff_End': staff1,
+            'Salary_Mass_Start': mass0,
+            'Salary_Mass_End': mass1,
+            'Pay_Start': share0 * pay0,
+            'Pay_End': share1 * pay1,
+            'Mix': (share1 - share0) * (pay0 + pay1) / 2,
+            'Pay': (share0 + share1) / 2 * (pay1 - pay0)
+        }, index=group_index).groupby(level=keys).sum()
+        
+        # Average pay per agent of the group: P = sum of share * cell pay
+        mean_staff = (terms['Staff_Start'] + terms['Staff_End']) / 2
+        result = pd.DataFrame({
+            'Start_Year': start_year,
+            'End_Year': end_year,
+            'Staff_Start': terms['Staff_Start'].astype(int),
+            'Staff_End': terms['Staff_End'].astype(int),
+            'Salary_Mass_Start': terms['Salary_Mass_Start'],
+            'Salary_Mass_End': terms['Salary_Mass_End'],
+            'Salary_Mass_Change': terms['Salary_Mass_End'] - terms['Salary_Mass_Start'],
+            'Headcount_Effect': (terms['Staff_End'] - terms['Staff_Start']) * (terms['Pay_Start'] + terms['Pay_End']) / 2,
+            'Grade_Mix_Effect': mean_staff * terms['Mix'],
+            'Average_Pay_Effect': mean_staff * terms['Pay']
+        })
+        return result.reset_index(drop=not group_keys)
+    
+    def _modal_value(self, data, keys, column):
+        """Most frequent value of a column within each key group (ties: smallest value)."""
+        counts = data.groupby(keys + [column]).size().reset_index(name='_count')
+        counts = counts.sort_values('_count', ascending=False, kind='mergesort')
+        return counts.drop_duplicates(subset=keys).set_index(keys)[column]
+
+    def _data_cache_key(self):
+        """Short key identifying the cleaned payroll content and the cache layout version."""
+        key = f"v{CACHE_VERSION};{self.results.key('data')}"
+        return hashlib.sha1(key.encode()).hexdigest()[:16]
+
+    def calculate_staff_evolution(self):
+        """
+        Calculate staff evolution over time by department, corps, and grade.
         
-        # Calculate staff by corps and year
-        staff_by_corps = self.merged_data.groupby(['Annee', 'Corps_Name_FR'])['Id_agent'].nunique().reset_index()
-        staff_by_corps.columns = ['Year', 'Corps', 'Staff_Count']
+        Returns:
+            dict: Dictionary containing staff evolution data
+        """
+        return self.results.get('staff_evolution')
+    
+    def _calculate_staff_evolution(self):
+        """Compute the staff evolution tables."""
+        print("Calculating staff evolution...")
         
-        # Calculate staff by grade and year
-        staff_by_grade = self.merged_data.groupby(['Annee', 'Grade_Name_FR'])['Id_agent'].nunique().reset_index()
-        staff_by_grade.columns = ['Year', 'Grade', 'Staff_Count']
+        merged = self.merge_data_with_nomenclature()
+        facts = self.build_agent_year_facts()
         
-        self.staff_evolution = {
-            'total': staff_by_year,
-            'by_ministry': staff_by_ministry,
-            'by_corps': staff_by_corps,
-            'by_grade': staff_by_grade
-        }
+        self.staff_evolution = staff_tables(merged, facts)
         
         print("Staff evolution calculation completed!")
         return self.staff_evolution
@@ -295,34 +1286,16 @@ class SalaryAnalyzer:
         Returns:
             dict: Dictionary containing salary mass data
         """
+        return self.results.get('salary_mass')
+    
+    def _calculate_salary_mass(self):
+        """Compute the salary mass tables."""
         print("Calculating salary mass evolution...")
         
-        if self.merged_data is None:
-            self.merge_data_with_nomenclature()
-        
-        # Calculate total salary mass by year
-        salary_mass_total = self.merged_data.groupby('Annee')['Montind'].sum().reset_index()
-        salary_mass_total.columns = ['Year', 'Total_Salary_Mass']
-        
-        # Calculate salary mass by ministry
-        salary_mass_ministry = self.merged_data.groupby(['Annee', 'Ministry'])['Montind'].sum().reset_index()
-        salary_mass_ministry.columns = ['Year', 'Ministry', 'Salary_Mass']
-        
-        # Calculate salary mass by corps
-        salary_mass_corps = self.merged_data.groupby(['Annee', 'Corps_Name_FR'])['Montind'].sum().reset_index()
-        salary_mass_corps.columns = ['Year', 'Corps', 'Salary_Mass']
+        merged = self.merge_data_with_nomenclature()
+        facts = self.build_agent_year_facts()
         
-        # Calculate average salary per agent
-        avg_salary_per_agent = self.merged_data.groupby(['Annee', 'Id_agent'])['Montind'].sum().reset_index()
-        avg_salary_yearly = avg_salary_per_agent.groupby('Annee')['Montind'].mean().reset_index()
-        avg_salary_yearly.columns = ['Year', 'Average_Salary_Per_Agent']
-        
-        self.salary_mass_evolution = {
-            'total': salary_mass_total,
-            'by_ministry': salary_mass_ministry,
-            'by_corps': salary_mass_corps,
-            'average_per_agent': avg_salary_yearly
-        }
+        self.salary_mass_evolution = salary_mass_tables(merged, facts)
         
         print("Salary mass calculation completed!")
         return self.salary_mass_evolution
@@ -334,88 +1307,482 @@ class SalaryAnalyzer:
         Returns:
             dict: Dictionary containing allowance analysis
         """
+        return self.results.get('allowances')
+    
+    def _analyze_allowances(self):
+        """Compute the allowance analysis tables."""
         print("Analyzing allowance evolution...")
         
-        if self.merged_data is None:
-            self.merge_data_with_nomenclature()
+        merged = self.merge_data_with_nomenclature()
+        facts = self.build_agent_year_facts()
+        
+        self.allowance_analysis = allowance_tables(merged, facts)
         
-        # Allowance amounts by year and type
-        allowance_by_type = self.merged_data.groupby(['Annee', 'Type'])['Montind'].agg(['sum', 'mean', 'count']).reset_index()
-        allowance_by_type.columns = ['Year', 'Type', 'Total_Amount', 'Average_Amount', 'Count']
+        print("Allowance analysis completed!")
+        return self.allowance_analysis
         
-        # Allowance by ministry, corps, and grade
-        allowance_detailed = self.merged_data.groupby([
-            'Annee', 'Ministry', 'Corps_Name_FR', 'Grade_Name_FR'
-        ])['Montind'].agg(['sum', 'mean', 'count']).reset_index()
-        allowance_detailed.columns = ['Year', 'Ministry', 'Corps', 'Grade', 'Total_Amount', 'Average_Amount', 'Count']
+    def query(self, dimensions=None, measures=('sum_amount',), filters=None, years=None):
+        """
+        Answer an aggregate question from the pre-aggregated query cube.
         
-        # Number of allowances per agent by year
-        allowances_per_agent = self.merged_data.groupby(['Annee', 'Id_agent']).size().reset_index(name='Allowance_Count')
-        avg_allowances_per_agent = allowances_per_agent.groupby('Annee')['Allowance_Count'].mean().reset_index()
-        avg_allowances_per_agent.columns = ['Year', 'Average_Allowances_Per_Agent']
+        Results are kept in a bounded LRU cache, so repeated questions are
+        answered without touching the cube again. Example:
+            analyzer.query(['Year', 'Ministry'], ['sum_amount', 'distinct_agents'],
+                           filters={'Corps': ['Corps A', 'Corps B']}, years=range(2019, 2024))
         
-        self.allowance_analysis = {
-            'by_type': allowance_by_type,
-            'detailed': allowance_detailed,
-            'per_agent': avg_allowances_per_agent
+        Args:
+            dimensions (list): Columns to group by, among Year, Ministry, Corps,
+                Grade, Codetab, Governorate, Central_Regional, Credit_Delegation,
+                Type and Codind (empty: grand total)
+            measures (list): One or more of sum_amount, line_count and distinct_agents
+            filters (dict): Dimension -> accepted value or list of accepted values
+            years (int or iterable): Years to keep (shortcut for a Year filter)
+            
+        Returns:
+            DataFrame: One row per combination of the dimensions with the measures
+            
+        Raises:
+            ValueError: Unknown dimension or measure, or no measure
+        """
+        dimensions = list(dimensions or [])
+        measures = list(measures)
+        filters = dict(filters or {})
+        if years is not None:
+            filters['Year'] = years
+        
+        for name in dimensions + list(filters):
+            if name not in QUERY_DIMENSIONS:
+                raise ValueError(f"Unknown query dimension '{name}' (expected one of {list(QUERY_DIMENSIONS)})")
+        if not measures:
+            raise ValueError(f"query() needs at least one measure among {QUERY_MEASURES}")
+        for measure in measures:
+            if measure not in QUERY_MEASURES:
+                raise ValueError(f"Unknown query measure '{measure}' (expected one of {QUERY_MEASURES})")
+        if 'distinct_agents' in measures and not set(dimensions + list(filters)) <= set(AGENT_DIMENSIONS):
+            raise ValueError(f"distinct_agents can only be broken down and filtered by {AGENT_DIMENSIONS}")
+        
+        accepted = {}
+        for name, value in filters.items():
+            values = list(value) if isinstance(value, (list, tuple, set, range)) else [value]
+            accepted[name] = tuple(sorted(values, key=repr))
+        
+        cube, cube_key = self.results.get_with_key('query_cube')
+        cache_key = (cube_key, tuple(dimensions), tuple(measures), tuple(sorted(accepted.items())))
+        cached = self._query_cache.get(cache_key)
+        if cached is not None:
+            self._query_cache.move_to_end(cache_key)
+            return cached.copy()
+        
+        def select(table):
+            mask = np.ones(len(table), dtype=bool)
+            for name, values in accepted.items():
+                mask &= table[name].isin(values).to_numpy()
+            return table[mask]
+        
+        parts = []
+        line_measures = {
+            'sum_amount': ('Total_Amount', 'sum'),
+            'line_count': ('Line_Count', 'sum')
         }
+        requested = {m: line_measures[m] for m in measures if m in line_measures}
+        if requested:
+            lines = select(cube['lines'])
+            if dimensions:
+                parts.append(lines.groupby(dimensions).agg(**requested))
+            else:
+                parts.append(pd.DataFrame({m: [lines[col].sum()] for m, (col, _) in requested.items()}))
         
-        print("Allowance analysis completed!")
-        return self.allowance_analysis
+        if 'distinct_agents' in measures:
+            agents = select(cube['agents'])
+            if dimensions:
+                parts.append(agents.groupby(dimensions)['Id_agent'].nunique().to_frame('distinct_agents'))
+            else:
+                parts.append(pd.DataFrame({'distinct_agents': [agents['Id_agent'].nunique()]}))
+        
+        result = pd.concat(parts, axis=1) if len(parts) > 1 else parts[0]
+        result = result.reset_index() if dimensions else result.reset_index(drop=True)
+        result = result[dimensions + measures]
         
-    def predict_future_trends(self, target_years=[2025, 2026, 2027, 2028, 2029, 2030]):
+        self._query_cache[cache_key] = result
+        if len(self._query_cache) > self.query_cache_size:
+            self._query_cache.popitem(last=False)
+        return result.copy()
+    
+    def _build_query_cube(self):
         """
-        Predict future trends using multiple forecasting methods.
+        Pre-aggregate the enriched lines for query().
+        
+        'lines' holds the amount and line count of every combination of the
+        query dimensions; 'agents' the distinct agents of every combination
+        of the agent dimensions (distinct counts cannot be summed).
+        """
+        print("Building query cube...")
+        merged = self.merge_data_with_nomenclature()
+        
+        columns = list(QUERY_DIMENSIONS.values())
+        lines = merged.groupby(columns, dropna=False)['Montind'].agg(['sum', 'count']).reset_index()
+        lines.columns = list(QUERY_DIMENSIONS) + ['Total_Amount', 'Line_Count']
+        
+        agent_columns = [QUERY_DIMENSIONS[name] for name in AGENT_DIMENSIONS] + ['Id_agent']
+        agents = merged[agent_columns].drop_duplicates()
+        agents.columns = AGENT_DIMENSIONS + ['Id_agent']
+        
+        self.query_cube = {'lines': lines, 'agents': agents.reset_index(drop=True)}
+        print(f"Query cube built: {len(lines)} cells, {len(agents)} agent rows")
+        return self.query_cube
+    
+    def calculate_growth_metrics(self, result='staff_evolution', table='by_corps',
+                                 value_column=None, window=3):
+        """
+        YoY growth, rolling averages, total growth and CAGR of every member of a dimension.
+        
+        Example: analyzer.calculate_growth_metrics('salary_mass', 'by_ministry')
         
         Args:
-            target_years (list): Years to predict for
+            result (str): Result holding the table ('staff_evolution', 'salary_mass',
+                'allowances', 'fte_metrics')
+            table (str): Table of the result (e.g. 'total', 'by_ministry', 'by_grade')
+            value_column (str): Value column (default: the last column of the table)
+            window (int): Number of years of the rolling average
             
         Returns:
-            dict: Dictionary containing prediction results
+            dict: 'matrix', 'yoy_growth', 'rolling_average' and 'summary' (see growth_metrics)
         """
-        print(f"Predicting trends for years: {target_years}")
+        data = self.results.get(result)[table]
+        if value_column is None:
+            value_column = data.columns[-1]
+        numeric = data.select_dtypes(include='number').columns
+        dimensions = [c for c in data.columns if c != 'Year' and c not in numeric]
+        return growth_metrics(data, dimensions, value_column, window=window)
+    
+    def compare_governorates(self, years=None):
+        """
+        Compare the governorates (Gouv) for regional budget reviews.
         
-        if self.staff_evolution is None:
-            self.calculate_staff_evolution()
+        Served from the query cube: after the first call, comparisons for
+        other years are answered from the cached cube and query results.
         
-        if self.salary_mass_evolution is None:
-            self.calculate_salary_mass()
+        Args:
+            years (int or iterable): Years to compare (default: all)
+            
+        Returns:
+            DataFrame: Salary mass, distinct agents, average salary per agent
+                and share of the salary mass of every governorate and year
+        """
+        comparison = self.query(['Year', 'Governorate'], ['sum_amount', 'distinct_agents'], years=years)
+        comparison.columns = ['Year', 'Governorate', 'Salary_Mass', 'Staff_Count']
+        comparison['Average_Salary_Per_Agent'] = comparison['Salary_Mass'] / comparison['Staff_Count']
+        yearly_mass = comparison.groupby('Year')['Salary_Mass'].transform('sum')
+        comparison['Salary_Mass_Share'] = comparison['Salary_Mass'] / yearly_mass * 100
+        comparison['Salary_Mass_Rank'] = comparison.groupby('Year')['Salary_Mass'].rank(
+            ascending=False, method='min').astype(int)
+        return comparison
+    
+    def build_budget_execution(self):
+        """
+        Build the monthly budget execution tables by Article/Par imputation.
         
-        predictions = {}
+        Every table (total, by ministry, by article, by par) holds the amount
+        of every month of every year with its cumulative (year-to-date)
+        amount, so month-range consumption is a difference of two prefix
+        sums (see budget_consumption()).
         
-        # Predict staff evolution
-        predictions['staff'] = self._predict_time_series(
-            self.staff_evolution['total'], 'Staff_Count', target_years
-        )
+        Returns:
+            dict: One table per level of BUDGET_LEVELS
+        """
+        return self.results.get('budget_execution')
+    
+    def _build_budget_execution(self):
+        """Compute the monthly execution tables with their prefix sums."""
+        print("Building budget execution tables...")
+        merged = self.merge_data_with_nomenclature()
+        
+        # Lines with an unknown ministry or a blank Article/Par are kept (NaN
+        # keys) so that every level adds up to the amount paid
+        lines = merged[merged['Mois'].between(1, 12)]
+        monthly = lines.groupby(BUDGET_LEVELS['by_par'] + ['Annee', 'Mois'], dropna=False)['Montind'].sum()
+        
+        self.budget_execution = {}
+        for level, keys in BUDGET_LEVELS.items():
+            # One row per imputation and year, one column per month (0 when no payment)
+            amounts = monthly.groupby(level=keys + ['Annee', 'Mois'], dropna=False).sum().unstack('Mois', fill_value=0)
+            amounts = amounts.reindex(columns=range(1, 13), fill_value=0)
+            cumulative = amounts.cumsum(axis=1)
+            
+            table = pd.DataFrame({
+                'Amount': amounts.stack(),
+                'Cumulative_Amount': cumulative.stack()
+            }).reset_index()
+            table.columns = keys + ['Year', 'Month', 'Amount', 'Cumulative_Amount']
+            self.budget_execution[level] = table[['Year'] + keys + ['Month', 'Amount', 'Cumulative_Amount']]
+        
+        print(f"Budget execution tables built: {len(self.budget_execution['by_par']) // 12} imputation-years")
+        return self.budget_execution
+    
+    def _budget_prefix_sums(self, ministry, article, par):
+        """Level, key prefix and prefix-sum lookup of a budget imputation."""
+        path = [ministry, article, par]
+        depth = sum(1 for value in path if value is not None)
+        if any(value is None for value in path[:depth]):
+            raise ValueError("A budget Par needs its Article, and an Article its ministry")
+        level = list(BUDGET_LEVELS)[depth]
+        
+        tables, tables_key = self.results.get_with_key('budget_execution')
+        if self._budget_lookup is None or self._budget_lookup[0] != tables_key:
+            # (imputation keys..., year) -> 13 prefix sums (months 0..12)
+            lookup = {}
+            for name, keys in BUDGET_LEVELS.items():
+                table = tables[name]
+                cumulative = table['Cumulative_Amount'].to_numpy(dtype=float).reshape(-1, 12)
+                prefix = np.hstack([np.zeros((len(cumulative), 1)), cumulative])
+                rows = table.iloc[::12][keys + ['Year']].itertuples(index=False, name=None)
+                lookup[name] = dict(zip(rows, prefix))
+            self._budget_lookup = (tables_key, lookup)
+        
+        return level, tuple(path[:depth]), self._budget_lookup[1][level]
+    
+    def budget_consumption(self, year, ministry=None, article=None, par=None,
+                           start_month=1, end_month=12):
+        """
+        Amount paid on a budget imputation over a range of months.
         
-        # Predict salary mass
-        predictions['salary_mass'] = self._predict_time_series(
-            self.salary_mass_evolution['total'], 'Total_Salary_Mass', target_years
-        )
+        Answered in constant time from the prefix sums: the amount of months
+        start_month..end_month is cumulative[end_month] - cumulative[start_month - 1].
+        Example (year-to-date at the end of June): analyzer.budget_consumption(2023, 'X', 12, end_month=6)
         
-        # Predict average salary per agent
-        predictions['avg_salary'] = self._predict_time_series(
-            self.salary_mass_evolution['average_per_agent'], 'Average_Salary_Per_Agent', target_years
-        )
+        Args:
+            year (int): Budget year
+            ministry (str): Ministry (None: all ministries)
+            article: Budget Article (None: all articles of the ministry)
+            par: Budget Par (None: all Pars of the article)
+            start_month (int): First month of the range (1-12)
+            end_month (int): Last month of the range (1-12)
+            
+        Returns:
+            float: Amount paid (0 if the imputation has no payment that year)
+        """
+        if not 1 <= start_month <= end_month <= 12:
+            raise ValueError("Months must satisfy 1 <= start_month <= end_month <= 12")
+        level, path, lookup = self._budget_prefix_sums(ministry, article, par)
+        prefix = lookup.get(path + (year,))
+        if prefix is None:
+            return 0.0
+        return float(prefix[end_month] - prefix[start_month - 1])
+    
+    def budget_execution_pace(self, year, ministry=None, article=None, par=None):
+        """
+        Monthly execution of a budget imputation against the previous years.
+        
+        Args:
+            year (int): Budget year
+            ministry (str): Ministry (None: all ministries)
+            article: Budget Article (None: all articles of the ministry)
+            par: Budget Par (None: all Pars of the article)
+            
+        Returns:
+            DataFrame: For every month, the amount and year-to-date amount,
+                the year-to-date share of the previous year total, the
+                average year-to-date share of the annual total in previous
+                years, and the year-end total projected from the year-to-date
+                amount at that pace (for a partial year, read the row of the
+                last month paid)
+        """
+        level, path, lookup = self._budget_prefix_sums(ministry, article, par)
+        previous_years = sorted(key[-1] for key in lookup if key[:-1] == path and key[-1] < year)
+        
+        empty = np.zeros(13)
+        prefix = lookup.get(path + (year,), empty)
+        pace = pd.DataFrame({
+            'Month': range(1, 13),
+            'Amount': np.diff(prefix),
+            'Cumulative_Amount': prefix[1:]
+        })
+        
+        if previous_years:
+            previous = np.array([lookup[path + (y,)] for y in previous_years])[:, 1:]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                shares = previous / previous[:, -1:] * 100
+            last_total = previous[-1, -1]
+            pace['Share_Of_Previous_Year_Total'] = pace['Cumulative_Amount'] / last_total * 100 if last_total else np.nan
+            pace['Previous_Years_Average_Share'] = pd.DataFrame(shares).mean().to_numpy()
+            pace['Previous_Years_Average_Cumulative'] = previous.mean(axis=0)
+        else:
+            pace['Share_Of_Previous_Year_Total'] = np.nan
+            pace['Previous_Years_Average_Share'] = np.nan
+            pace['Previous_Years_Average_Cumulative'] = np.nan
+        
+        pace['Pace_Ratio'] = pace['Cumulative_Amount'] / pace['Previous_Years_Average_Cumulative'].replace(0, np.nan)
+        pace['Projected_Year_End'] = pace['Cumulative_Amount'] / (pace['Previous_Years_Average_Share'] / 100).replace(0, np.nan)
+        pace.insert(0, 'Year', year)
+        return pace
+    
+    def build_org_hierarchy(self):
+        """
+        Pre-aggregate the payroll along the organisation hierarchy.
+        
+        Every node of the hierarchy ministry -> direction (Dire) ->
+        sub-direction (Sdir) -> service (Serv) gets its salary mass,
+        headcount (distinct agents) and allowance totals per year, so
+        drill_down() answers with index lookups.
+        
+        Returns:
+            dict: One table per level (ministry, direction, sub_direction, service)
+        """
+        return self.results.get('org_hierarchy')
+    
+    def _build_org_hierarchy(self):
+        """Compute the hierarchy tables in one pass over the enriched lines."""
+        print("Building organisation hierarchy...")
+        merged = self.merge_data_with_nomenclature()
+        
+        # Finest level once: amounts and lines per service, agents per service
+        service_keys = ['Annee'] + ORG_LEVELS['service']
+        services = merged.groupby(service_keys, dropna=False)['Montind'].agg(['sum', 'count'])
+        agents = merged[service_keys + ['Id_agent']].drop_duplicates()
+        
+        # Coarser levels are rolled up from the service totals; distinct
+        # agents cannot be summed and are counted at every level
+        self.org_hierarchy = {}
+        for level, keys in ORG_LEVELS.items():
+            group = ['Annee'] + keys
+            table = services.groupby(level=group).sum()
+            table['Staff_Count'] = agents.groupby(group)['Id_agent'].nunique()
+            table = table.reset_index()
+            table.columns = ['Year'] + keys + ['Salary_Mass', 'Allowance_Count', 'Staff_Count']
+            table['Average_Allowance'] = table['Salary_Mass'] / table['Allowance_Count']
+            self.org_hierarchy[level] = table
+        
+        # Service names from the organigramme table (first text column); unit
+        # codes are only unique within a ministry
+        organigramme = self.nomenclature_tables.get('organigramme')
+        unit_keys = ORG_LEVELS['service']
+        if organigramme is not None and set(unit_keys) <= set(organigramme.columns):
+            names = [c for c in organigramme.columns
+                     if c not in unit_keys and pd.api.types.is_string_dtype(organigramme[c])]
+            if names:
+                units = organigramme[unit_keys + names[:1]].drop_duplicates(subset=unit_keys)
+                units.columns = unit_keys + ['Unit_Name']
+                self.org_hierarchy['service'] = self.org_hierarchy['service'].merge(units, on=unit_keys, how='left')
+        
+        print(f"Organisation hierarchy built: {len(self.org_hierarchy['service'])} service rows")
+        return self.org_hierarchy
+    
+    def drill_down(self, ministry=None, direction=None, sub_direction=None, years=None):
+        """
+        Totals of the children of a node of the organisation hierarchy.
+        
+        drill_down() lists the ministries, drill_down('X') the directions of
+        ministry X, drill_down('X', 3) the sub-directions of its direction 3,
+        and drill_down('X', 3, 1) the services of that sub-direction.
+        
+        Args:
+            ministry (str): Ministry of the node
+            direction: Dire code of the node
+            sub_direction: Sdir code of the node
+            years (int or iterable): Years to keep (default: all)
+            
+        Returns:
+            DataFrame: One row per child node and year
+        """
+        path = [ministry, direction, sub_direction]
+        depth = sum(1 for value in path if value is not None)
+        if any(value is None for value in path[:depth]):
+            raise ValueError("drill_down() needs the parent nodes of the requested node")
+        
+        hierarchy, hierarchy_key = self.results.get_with_key('org_hierarchy')
+        if self._org_lookup is None or self._org_lookup[0] != hierarchy_key:
+            self._org_lookup = (hierarchy_key, {
+                level: hierarchy[level].set_index(keys + ['Year']).sort_index()
+                for level, keys in ORG_LEVELS.items()
+            })
+        
+        level = list(ORG_LEVELS)[depth]
+        table = self._org_lookup[1][level]
+        if depth:
+            try:
+                table = table.xs(tuple(path[:depth]), level=list(range(depth)), drop_level=False)
+            except KeyError:
+                table = table.iloc[:0]
+        if years is not None:
+            years = list(years) if isinstance(years, (list, tuple, set, range)) else [years]
+            table = table[table.index.get_level_values('Year').isin(years)]
+        return table.reset_index()
+    
+    def predict_future_trends(self, target_years=[2025, 2026, 2027, 2028, 2029, 2030], method=None):
+        """
+        Predict future trends using multiple forecasting methods.
+        
+        Args:
+            target_years (list): Years to predict for
+            method (str): Batched method applied to every series at once
+                (batch_forecasting.BATCH_METHODS, e.g. 'Damped Trend');
+                None: model cascade of every series
+            
+        Returns:
+            dict: Dictionary containing prediction results
+        """
+        if method is not None and method not in BATCH_METHODS:
+            raise ValueError(f"Unknown forecasting method '{method}' (available: {', '.join(BATCH_METHODS)})")
+        self._last_target_years = list(target_years)
+        return self.results.get('forecasts', target_years=tuple(target_years), method=method)
+    
+    def _predict_future_trends(self, target_years, method=None):
+        """Compute the forecasts for the given years."""
+        target_years = list(target_years)
+        print(f"Predicting trends for years: {target_years}" + (f" ({method})" if method else ""))
+        
+        # All series of the run share the executor and the time budget
+        tasks = self._trend_tasks()
+        if method is not None:
+            results = forecast_tasks(tasks, target_years, method,
+                                     cache=self.forecast_cache, cache_run='trends')
+        else:
+            results = forecast_series(tasks, target_years, cache=self.forecast_cache,
+                                      cache_run='trends', **self.forecast_options)
+        self.forecast_model_usage['trends'] = summarize_model_choices(results)
+        
+        predictions = self._trend_predictions(results)
+        self.prediction_results = predictions
+        print("Future trend predictions completed!")
+        return predictions
+    
+    def _trend_tasks(self):
+        """Forecasting tasks (key, data, value_column) of the staff and salary mass series."""
+        self.calculate_staff_evolution()
+        self.calculate_salary_mass()
+        
+        tasks = [
+            # Staff evolution, salary mass and average salary per agent
+            ('staff', self.staff_evolution['total'], 'Staff_Count'),
+            ('salary_mass', self.salary_mass_evolution['total'], 'Total_Salary_Mass'),
+            ('avg_salary', self.salary_mass_evolution['average_per_agent'], 'Average_Salary_Per_Agent')
+        ]
         
         # Predict by ministry
-        predictions['by_ministry'] = {}
         for ministry in self.staff_evolution['by_ministry']['Ministry'].unique():
             if pd.notna(ministry):
                 ministry_data = self.staff_evolution['by_ministry'][
                     self.staff_evolution['by_ministry']['Ministry'] == ministry
                 ]
-                predictions['by_ministry'][ministry] = self._predict_time_series(
-                    ministry_data, 'Staff_Count', target_years
-                )
-        
-        self.prediction_results = predictions
-        print("Future trend predictions completed!")
+                tasks.append((('by_ministry', ministry), ministry_data, 'Staff_Count'))
+        return tasks
+    
+    def _trend_predictions(self, results):
+        """Arrange the results of the trend tasks (by_ministry results under one key)."""
+        predictions = {'by_ministry': {}}
+        for key, result in results.items():
+            if isinstance(key, tuple):
+                predictions['by_ministry'][key[1]] = result
+            else:
+                predictions[key] = result
         return predictions
     
     def _predict_time_series(self, data, value_column, target_years):
         """
-        Predict time series using multiple methods and return best result.
+        Predict time series with the cost-aware model cascade.
+        
+        See forecast_executor.predict_time_series: cheap models first,
+        ARIMA only when they miss the holdout years.
         
         Args:
             data (DataFrame): Historical data
@@ -425,84 +1792,128 @@ class SalaryAnalyzer:
         Returns:
             dict: Prediction results with confidence intervals
         """
-        try:
-            # Prepare data
-            X = data['Year'].values.reshape(-1, 1)
-            y = data[value_column].values
-            
-            # Method 1: Linear Regression
-            lr_model = LinearRegression()
-            lr_model.fit(X, y)
-            lr_predictions = lr_model.predict(np.array(target_years).reshape(-1, 1))
-            lr_score = lr_model.score(X, y)
-            
-            # Method 2: Random Forest
-            rf_model = RandomForestRegressor(n_estimators=100, random_state=42)
-            rf_model.fit(X, y)
-            rf_predictions = rf_model.predict(np.array(target_years).reshape(-1, 1))
-            rf_score = rf_model.score(X, y)
-            
-            # Method 3: ARIMA (if enough data points)
-            arima_predictions = None
-            arima_score = 0
-            
-            if len(data) >= 8:  # Need enough data for ARIMA
-                try:
-                    # Create time series
-                    ts_data = pd.Series(y, index=pd.to_datetime(data['Year'], format='%Y'))
-                    
-                    # Fit ARIMA model
-                    arima_model = ARIMA(ts_data, order=(1, 1, 1))
-                    arima_fitted = arima_model.fit()
-                    
-                    # Forecast
-                    n_periods = len(target_years)
-                    arima_forecast = arima_fitted.forecast(steps=n_periods)
-                    arima_predictions = arima_forecast.values
-                    arima_score = 1 - (arima_fitted.aic / 1000)  # Normalized AIC score
-                    
-                except:
-                    arima_predictions = None
-                    arima_score = 0
-            
-            # Choose best method based on score
-            methods = {
-                'Linear Regression': (lr_predictions, lr_score),
-                'Random Forest': (rf_predictions, rf_score),
-                'ARIMA': (arima_predictions, arima_score) if arima_predictions is not None else (None, 0)
-            }
-            
-            best_method = max(methods.items(), key=lambda x: x[1][1] if x[1][0] is not None else -1)
-            best_predictions = best_method[1][0]
-            best_score = best_method[1][1]
-            
-            # Calculate confidence intervals (simple approach)
-            historical_std = np.std(y)
-            confidence_lower = best_predictions - 1.96 * historical_std
-            confidence_upper = best_predictions + 1.96 * historical_std
-            
-            return {
-                'years': target_years,
-                'predictions': best_predictions.tolist() if best_predictions is not None else [],
-                'confidence_lower': confidence_lower.tolist() if best_predictions is not None else [],
-                'confidence_upper': confidence_upper.tolist() if best_predictions is not None else [],
-                'method': best_method[0],
-                'score': best_score,
-                'all_methods': {name: pred[0].tolist() if pred[0] is not None else [] 
-                               for name, pred in methods.items()}
-            }
+        return predict_time_series(data, value_column, target_years)
+    
+    def use_forecast_executor(self, workers=None, timeout=60, chunk_size=None):
+        """
+        Run the per-series forecasts in a pool of processes.
+        
+        Applies to the by-ministry forecasts of predict_future_trends and to
+        the per-series allowance forecasts. Results are identical to the
+        serial path, except for series exceeding the timeout, which are
+        forecast without ARIMA.
+        
+        Args:
+            workers (int): Number of worker processes (None: number of CPUs, 1: serial)
+            timeout (float): Timeout of every series fit in seconds (None: no timeout)
+            chunk_size (int): Series per task (None: a few tasks per worker)
+        """
+        # Timeouts can change the forecasts: the forecasting results depend
+        # on the 'forecast_options' node and are recomputed
+        self.forecast_options.update(workers=workers, timeout=timeout, chunk_size=chunk_size)
+        print(f"Forecasting with {workers or 'all CPU'} worker(s), timeout {timeout}s per series")
+    
+    def set_forecast_time_budget(self, seconds):
+        """
+        Limit the time of every forecasting run (predict_future_trends, allowance forecasts,
+        compare_global_model).
+        
+        Once the budget of a run is spent, the remaining series are forecast
+        with the cheap models of the cascade only.
+        
+        Args:
+            seconds (float): Time budget of a run (None: no budget)
+        """
+        self.forecast_options['time_budget'] = seconds
+        print(f"Forecast time budget: {seconds}s per run" if seconds is not None else "No forecast time budget")
+    
+    def update_forecasts(self, method='Damped Trend', target_years=[2025, 2026, 2027, 2028, 2029, 2030],
+                         refit=False):
+        """
+        Update the staff, salary mass and allowance forecasts with the new observations.
+        
+        The state of every series (smoothing level and trend, or the sums
+        of the linear trend) is stored after each run, in the cache
+        directory. When data is appended, the states are advanced through
+        the new years only; a revised last year (new month of the current
+        year) is rolled back and advanced again. Only new series and
+        series whose older history changed are refit. The smoothing
+        parameters are those of the last full fit: refit from time to time
+        to pick them again.
+        
+        Args:
+            method (str): 'Holt', 'Damped Trend' or 'Linear Regression'
+            target_years (list): Years to predict
+            refit (bool): Refit every series on its full history
             
+        Returns:
+            dict: 'trends' (same structure as predict_future_trends),
+                'allowances' (same structure as the allowance forecasts) and
+                'status' (update status of every series)
+        """
+        if method not in ONLINE_METHODS:
+            raise ValueError(f"Unknown online method '{method}' (available: {', '.join(ONLINE_METHODS)})")
+        return self.results.get('online_forecasts', method=method, target_years=tuple(target_years),
+                                refit=refit)
+    
+    def _update_forecasts(self, method, target_years, refit):
+        """Advance the stored forecast states and forecast from them."""
+        target_years = list(target_years)
+        print(f"Updating {method} forecasts for years: {target_years}")
+        self.analyze_allowances()
+        
+        tasks = ([(('trends', key), data, column) for key, data, column in self._trend_tasks()]
+                 + [(('allowances', key), data, column)
+                    for key, data, column in self._allowance_tasks(self.allowance_analysis['detailed'])])
+        matrix = task_matrix(tasks)
+        series = [repr(key) for key, _, _ in tasks]
+        
+        state_file = self.cache_dir / 'forecast_states.parquet'
+        if self.forecast_states is None and state_file.exists():
+            try:
+                self.forecast_states = pd.read_parquet(state_file)
+            except Exception as e:
+                print(f"Warning: Could not read stored forecast states: {e}")
+        
+        start = time.perf_counter()
+        states, status = update_states(None if refit else self.forecast_states, series, matrix.columns,
+                                       matrix.to_numpy(dtype=float), method)
+        forecasts = state_forecasts(states, target_years)
+        elapsed = time.perf_counter() - start
+        
+        # States of the other methods are kept
+        if self.forecast_states is not None:
+            states = pd.concat([self.forecast_states[self.forecast_states['Method'] != method], states])
+        self.forecast_states = states
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            states.to_parquet(state_file)
         except Exception as e:
-            print(f"Error in time series prediction: {e}")
-            return {
-                'years': target_years,
-                'predictions': [],
-                'confidence_lower': [],
-                'confidence_upper': [],
-                'method': 'None',
-                'score': 0,
-                'all_methods': {}
-            }
+            print(f"Warning: Could not store forecast states: {e}")
+        
+        results = {'trends': {}, 'allowances': {}}
+        for row, ((group, key), _, _) in enumerate(tasks):
+            results[group][key] = series_result(target_years, forecasts['predictions'][row],
+                                                forecasts['std'][row], method,
+                                                score=float(forecasts['score'][row]),
+                                                lower=forecasts['lower'][row], upper=forecasts['upper'][row])
+        
+        counts = pd.Series(status).value_counts()
+        print(f"  {len(series)} series: " + ", ".join(f"{counts.get(name, 0)} {name}"
+                                                     for name in ['updated', 'revised', 'unchanged', 'refit'])
+              + f" ({elapsed:.2f}s)")
+        
+        predictions = self._trend_predictions(results['trends'])
+        self.prediction_results = predictions
+        self.forecast_model_usage['trends'] = summarize_model_choices(results['trends'])
+        self.forecast_model_usage['allowances'] = summarize_model_choices(results['allowances'])
+        print("Forecast update completed!")
+        return {
+            'trends': predictions,
+            'allowances': self._allowance_predictions(results['allowances']),
+            'status': pd.DataFrame({'Group': [key[0] for key, _, _ in tasks], 'Series': series,
+                                    'Status': status})
+        }
     
     def generate_allowance_report(self):
         """
@@ -511,10 +1922,13 @@ class SalaryAnalyzer:
         Returns:
             dict: Structured allowance report
         """
+        return self.results.get('allowance_report')
+    
+    def _generate_allowance_report(self):
+        """Build the Ministry -> Corps -> Grade allowance report."""
         print("Generating allowance report...")
         
-        if self.allowance_analysis is None:
-            self.analyze_allowances()
+        self.analyze_allowances()
         
         # Predict allowance trends
         allowance_predictions = self._predict_allowance_trends()
@@ -560,32 +1974,346 @@ class SalaryAnalyzer:
         print("Allowance report generated successfully!")
         return report
     
-    def _predict_allowance_trends(self):
-        """Predict allowance trends for future years."""
-        predictions = {}
+    def backtest_forecasts(self, measure='Total_Amount', horizon=5, origins=None):
+        """
+        Backtest the batched forecasting methods with rolling forecast origins.
         
-        if self.allowance_analysis is None:
-            return predictions
+        The allowance series of every level of the hierarchy (total,
+        ministry, corps, grade) are forecast from every origin (train up
+        to 2018, predict 2019-2023, and so on), all series and origins of
+        a level at once.
+        
+        Args:
+            measure (str): Allowance measure ('Total_Amount' or 'Count')
+            horizon (int): Number of years forecast from every origin
+            origins (list): Forecast origins (None: every year with enough history)
+            
+        Returns:
+            dict: 'accuracy' (MAPE, bias and fit time per level and method),
+                'by_horizon' (per level, method and horizon), 'timing' (fit
+                time per method) and 'forecasts' (every backtest forecast)
+        """
+        return self.results.get('backtest', measure=measure, horizon=horizon,
+                                origins=tuple(origins) if origins is not None else None)
+    
+    def _backtest_forecasts(self, measure, horizon, origins):
+        """Run the rolling-origin backtest on every level of the allowance hierarchy."""
+        print(f"Backtesting forecasting methods on {measure} (horizon {horizon} years)...")
+        self.analyze_allowances()
+        detailed = self.allowance_analysis['detailed']
+        
+        tables = {'accuracy': [], 'by_horizon': [], 'forecasts': []}
+        for level, keys in FORECAST_LEVELS.items():
+            matrix = year_matrix(detailed, keys, measure)
+            backtest = rolling_origin_backtest(matrix, origins=origins, horizon=horizon)
+            for name, table in backtest.items():
+                table.insert(0, 'Level', level)
+                tables[name].append(table)
+        
+        self.backtest_results = {name: pd.concat(parts, ignore_index=True) for name, parts in tables.items()}
+        accuracy = self.backtest_results['accuracy']
+        self.backtest_results['timing'] = accuracy.groupby('Method', sort=False).agg(
+            Fit_Seconds=('Fit_Seconds', 'sum'), Series=('Series', 'sum')
+        ).reset_index()
+        
+        best = accuracy.loc[accuracy.groupby('Level', sort=False)['MAPE'].idxmin()]
+        for _, row in best.iterrows():
+            print(f"  {row['Level']}: best method {row['Method']} (MAPE {row['MAPE']:.1f}%, bias {row['Bias']:+.1f}%)")
+        print("Backtest completed!")
+        return self.backtest_results
+    
+    def global_allowance_forecasts(self, measure='Total_Amount',
+                                   target_years=[2025, 2026, 2027, 2028, 2029, 2030]):
+        """
+        Forecast every allowance series with one model trained across all of them.
+        
+        A single ridge regression on lagged growth, year trend and the
+        ministry, corps, grade and allowance code of the series is fitted
+        once on every (ministry, corps, grade, code) series, and forecasts
+        them all in one predict call (see global_forecasting).
+        
+        Args:
+            measure (str): Allowance measure ('Total_Amount' or 'Count')
+            target_years (list): Years to predict
+            
+        Returns:
+            dict: 'forecasts' (one row per series, one column per target
+                year) and 'timing' (series, fit time)
+        """
+        return self.results.get('global_forecasts', measure=measure, target_years=tuple(target_years))
+    
+    def _global_allowance_forecasts(self, measure, target_years):
+        """Fit the global model on every allowance series and forecast them."""
+        target_years = list(target_years)
+        print(f"Forecasting {measure} of every allowance series with the global model...")
+        self.analyze_allowances()
+        matrix = year_matrix(self.allowance_analysis['by_code'], GLOBAL_FORECAST_KEYS, measure)
+        
+        start = time.perf_counter()
+        predictions = global_forecast(matrix.columns, matrix.to_numpy(dtype=float), target_years,
+                                      members=matrix.index.to_frame(index=False))
+        elapsed = time.perf_counter() - start
+        
+        forecasts = pd.DataFrame(predictions, index=matrix.index, columns=target_years)
+        self.global_forecasts = {
+            'forecasts': forecasts,
+            'timing': pd.DataFrame([{'Series': len(matrix), 'Forecast': int(forecasts.notna().all(axis=1).sum()),
+                                     'Fit_Seconds': elapsed}])
+        }
+        print(f"Global model: {len(matrix)} series forecast in {elapsed:.2f}s")
+        return self.global_forecasts
+    
+    def compare_global_model(self, measure='Total_Amount', horizon=3, origins=None):
+        """
+        Backtest the global model against the per-series model cascade.
+        
+        Both are backtested with rolling forecast origins on every
+        (ministry, corps, grade, code) allowance series: the global model
+        is trained once per origin on all series, the cascade fits every
+        series on its own (with the options of use_forecast_executor and
+        set_forecast_time_budget).
+        
+        Args:
+            measure (str): Allowance measure ('Total_Amount' or 'Count')
+            horizon (int): Number of years forecast from every origin
+            origins (list): Forecast origins (None: every year with enough history)
+            
+        Returns:
+            dict: 'accuracy' (MAPE, bias and fit time of both paths),
+                'by_horizon' (per path and horizon) and 'forecasts' (every
+                backtest forecast)
+        """
+        return self.results.get('global_comparison', measure=measure, horizon=horizon,
+                                origins=tuple(origins) if origins is not None else None)
+    
+    def _compare_global_model(self, measure, horizon, origins):
+        """Backtest the global model and the per-series cascade on the allowance series."""
+        print(f"Comparing the global model with per-series forecasts on {measure} (horizon {horizon} years)...")
+        self.analyze_allowances()
+        matrix = year_matrix(self.allowance_analysis['by_code'], GLOBAL_FORECAST_KEYS, measure)
+        methods = {
+            'Global Ridge': global_method(matrix.index.to_frame(index=False)),
+            'Per-Series Cascade': partial(cascade_forecast, **self.forecast_options)
+        }
+        self.global_comparison = rolling_origin_backtest(matrix, methods=methods, origins=origins, horizon=horizon)
+        
+        accuracy = self.global_comparison['accuracy']
+        for _, row in accuracy.iterrows():
+            print(f"  {row['Method']}: MAPE {row['MAPE']:.1f}%, bias {row['Bias']:+.1f}%, "
+                  f"{row['Forecasts']} forecasts, fit {row['Fit_Seconds']:.2f}s")
+        seconds = accuracy.set_index('Method')['Fit_Seconds']
+        if len(seconds) == 2 and seconds['Global Ridge'] > 0:
+            print(f"  Global model fit {seconds['Per-Series Cascade'] / seconds['Global Ridge']:.0f}x faster")
+        print("Global model comparison completed!")
+        return self.global_comparison
+    
+    def reconcile_allowance_forecasts(self, measure='Total_Amount', method='mint',
+                                      base_method='Linear Regression',
+                                      target_years=[2025, 2026, 2027, 2028, 2029, 2030]):
+        """
+        Forecast every level of the allowance hierarchy and make the forecasts add up.
+        
+        The total, ministry, corps and grade series are forecast
+        independently (base forecasts, all series in one batch), then
+        reconciled in one sparse solve over the summing matrix of the
+        hierarchy.
+        
+        Args:
+            measure (str): Allowance measure ('Total_Amount' or 'Count')
+            method (str): Reconciliation method ('bottom_up', 'ols' or 'mint')
+            base_method (str): Batched method of the base forecasts
+                (batch_forecasting.BATCH_METHODS)
+            target_years (list): Years to predict
+            
+        Returns:
+            dict: 'forecasts' (base and reconciled forecast of every node
+                and year) and 'coherence' (largest gap between the sum of
+                every level and the total, before and after reconciliation)
+        """
+        if method not in RECONCILIATION_METHODS:
+            raise ValueError(f"Unknown reconciliation method '{method}' (available: {', '.join(RECONCILIATION_METHODS)})")
+        if base_method not in BATCH_METHODS:
+            raise ValueError(f"Unknown forecasting method '{base_method}' (available: {', '.join(BATCH_METHODS)})")
+        return self.results.get('reconciled_forecasts', measure=measure, method=method,
+                                base_method=base_method, target_years=tuple(target_years))
+    
+    def _build_forecast_hierarchy(self):
+        """Build the summing matrix of the allowance hierarchy (total > ministry > corps > grade)."""
+        self.analyze_allowances()
+        bottom_keys = FORECAST_LEVELS['grade']
+        members = self.allowance_analysis['detailed'][bottom_keys].drop_duplicates()
+        members = members.sort_values(bottom_keys).reset_index(drop=True)
+        summing, nodes = summing_matrix(members, FORECAST_LEVELS)
+        print(f"Forecast hierarchy: {len(nodes)} nodes, {len(members)} bottom series")
+        return {'summing': summing, 'nodes': nodes, 'members': members}
+    
+    def _reconcile_allowance_forecasts(self, measure, method, base_method, target_years):
+        """Compute the base forecasts of every node and reconcile them."""
+        target_years = list(target_years)
+        hierarchy = self.results.get('forecast_hierarchy')
+        summing, nodes = hierarchy['summing'], hierarchy['nodes']
+        bottom_keys = FORECAST_LEVELS['grade']
+        print(f"Reconciling {len(nodes)} {measure} forecasts ({base_method} base, {method})...")
+        
+        # History of every node: sums of the bottom series (NaN where none is observed)
+        bottom = year_matrix(self.allowance_analysis['detailed'], bottom_keys, measure)
+        bottom = bottom.reindex(pd.MultiIndex.from_frame(hierarchy['members']))
+        observed = ~np.isnan(bottom.to_numpy(dtype=float))
+        history = summing @ np.nan_to_num(bottom.to_numpy(dtype=float))
+        history = np.where(summing @ observed.astype(float) > 0, history, np.nan)
+        years = bottom.columns
+        
+        base = method_forecast(years, history, target_years, base_method)
+        predictions = base['predictions']
+        # Series the method cannot forecast: last observed value (0 if none)
+        missing = ~np.isfinite(predictions)
+        if missing.any():
+            fallback = np.nan_to_num(naive_forecast(years, history, target_years))
+            predictions = np.where(missing, fallback, predictions)
+        
+        reconciled = reconcile_forecasts(predictions, summing, method=method,
+                                         variances=base['holdout_mse'])
+        
+        forecasts = nodes.loc[nodes.index.repeat(len(target_years))].reset_index(drop=True)
+        forecasts['Year'] = np.tile(target_years, len(nodes))
+        forecasts['Base_Forecast'] = predictions.ravel()
+        forecasts['Reconciled_Forecast'] = np.asarray(reconciled).ravel()
+        coherence = pd.DataFrame({
+            'Base_Gap_Percent': coherence_gaps(predictions, nodes),
+            'Reconciled_Gap_Percent': coherence_gaps(reconciled, nodes)
+        }).rename_axis('Level').reset_index()
+        
+        for _, row in coherence.iloc[1:].iterrows():
+            print(f"  {row['Level']}: gap to total {row['Base_Gap_Percent']:.2f}% -> {row['Reconciled_Gap_Percent']:.2f}%")
+        print("Forecast reconciliation completed!")
+        self.reconciled_forecasts = {'forecasts': forecasts, 'coherence': coherence}
+        return self.reconciled_forecasts
+    
+    def _predict_allowance_trends(self, engine='batch', method=None):
+        """
+        Predict allowance trends for future years.
+        
+        Args:
+            engine (str): 'batch' (closed-form trends of all series in one
+                batched least-squares fit) or 'per_series' (_predict_time_series
+                on every series)
+            method (str): Batched method applied to every series at once
+                (batch_forecasting.BATCH_METHODS, e.g. 'Damped Trend');
+                replaces the model selection of the engine
+        """
+        if engine not in FORECAST_ENGINES:
+            raise ValueError(f"Unknown forecast engine '{engine}' (available: {', '.join(FORECAST_ENGINES)})")
+        if method is not None and method not in BATCH_METHODS:
+            raise ValueError(f"Unknown forecasting method '{method}' (available: {', '.join(BATCH_METHODS)})")
+        return self.results.get('allowance_forecasts', engine=engine, method=method)
+    
+    def _compute_allowance_trends(self, engine='batch', method=None):
+        """Fit the allowance forecasts of every (ministry, corps, grade)."""
+        self.analyze_allowances()
         
         detailed_data = self.allowance_analysis['detailed']
         target_years = [2025, 2026, 2027, 2028, 2029, 2030]
         
+        if engine == 'batch' and method is None:
+            return self._batch_allowance_trends(detailed_data, target_years)
+        
+        tasks = self._allowance_tasks(detailed_data)
+        if method is not None:
+            print(f"Forecasting {len(tasks)} allowance series with {method} in batch...")
+            results = forecast_tasks(tasks, target_years, method,
+                                     cache=self.forecast_cache, cache_run='allowances')
+        else:
+            results = forecast_series(tasks, target_years, cache=self.forecast_cache,
+                                      cache_run='allowances', **self.forecast_options)
+        self.forecast_model_usage['allowances'] = summarize_model_choices(results)
+        return self._allowance_predictions(results)
+    
+    def _allowance_tasks(self, detailed_data):
+        """Forecasting tasks of the amount and count of every (ministry, corps, grade)."""
         # Group predictions by ministry, corps, grade
+        tasks = []
         for (ministry, corps, grade), group in detailed_data.groupby(['Ministry', 'Corps', 'Grade']):
             if len(group) >= 3:  # Need enough data points
                 key = f"{ministry}_{corps}_{grade}"
                 
-                # Predict total amount
-                amount_pred = self._predict_time_series(group, 'Total_Amount', target_years)
-                
-                # Predict count
-                count_pred = self._predict_time_series(group, 'Count', target_years)
-                
-                predictions[key] = {
+                # Predict total amount and count
+                tasks.append(((key, 'amount'), group, 'Total_Amount'))
+                tasks.append(((key, 'count'), group, 'Count'))
+        return tasks
+    
+    def _allowance_predictions(self, results):
+        """Arrange the results of the allowance tasks (amount and count under the series key)."""
+        predictions = {}
+        for (key, measure), result in results.items():
+            predictions.setdefault(key, {})[measure] = result
+        return predictions
+    
+    def _batch_allowance_trends(self, detailed_data, target_years):
+        """
+        Forecast the amount and count of every (ministry, corps, grade) at once.
+        
+        The amount and count series are stacked in one series x years matrix
+        (missing years are masked) and every trend model is fitted to all of
+        them in a single batched least-squares call. Series unchanged since
+        a previous run are served from the forecast cache and not refit.
+        
+        Args:
+            detailed_data (DataFrame): Allowances by Year, Ministry, Corps and Grade
+            target_years (list): Years to predict
+            
+        Returns:
+            dict: Same structure as the per-series forecasts
+        """
+        keys = ['Ministry', 'Corps', 'Grade']
+        amounts = year_matrix(detailed_data, keys, 'Total_Amount')
+        counts = year_matrix(detailed_data, keys, 'Count').reindex(index=amounts.index, columns=amounts.columns)
+        n_series = len(amounts)
+        print(f"Forecasting {n_series} allowance series in batch...")
+        values = np.vstack([amounts.to_numpy(dtype=float), counts.to_numpy(dtype=float)])
+        
+        # Series unchanged since a previous run are served from the cache
+        cached = {}
+        if self.forecast_cache is not None:
+            content_keys = [self.forecast_cache.series_key(amounts.columns, row, 'batch_forecast', {}, target_years)
+                            for row in values]
+            cached = self.forecast_cache.lookup(content_keys, run='allowances')
+        fitted = [row for row in range(len(values))
+                  if self.forecast_cache is None or content_keys[row] not in cached]
+        forecasts = batch_forecast(amounts.columns, values[fitted], target_years)
+        # Bootstrap intervals of the model chosen for every series
+        lower, upper = method_intervals(amounts.columns, values[fitted], target_years,
+                                        forecasts['method'], forecasts['predictions'])
+        position = {row: i for i, row in enumerate(fitted)}
+        
+        def fit_result(i):
+            if forecasts['method'][i] is None:
+                return None
+            # Bounds fall back to ±1.96 std when too few years to bootstrap
+            return series_result(target_years, forecasts['predictions'][i], forecasts['std'][i],
+                                 forecasts['method'][i], float(forecasts['score'][i]),
+                                 lower=lower[i], upper=upper[i],
+                                 all_methods={name: method_values[i].tolist()
+                                              for name, method_values in forecasts['all_methods'].items()
+                                              if not np.isnan(method_values[i]).all()})
+        
+        fitted_results = {row: fit_result(i) for row, i in position.items()}
+        if self.forecast_cache is not None:
+            self.forecast_cache.store({content_keys[row]: result for row, result in fitted_results.items()})
+        
+        def row_result(row):
+            return fitted_results[row] if row in fitted_results else cached[content_keys[row]]
+        
+        predictions = {}
+        for row, (ministry, corps, grade) in enumerate(amounts.index):
+            amount_pred = row_result(row)
+            count_pred = row_result(n_series + row)
+            if amount_pred is not None and count_pred is not None:
+                predictions[f"{ministry}_{corps}_{grade}"] = {
                     'amount': amount_pred,
                     'count': count_pred
                 }
         
+        print(f"Allowance forecasts completed: {len(predictions)} series")
         return predictions
     
     def _get_grade_predictions(self, ministry, corps, grade, allowance_predictions):
@@ -827,7 +2555,7 @@ class SalaryAnalyzer:
             axes[1, 1].bar(metrics, scores, alpha=0.7, color='green')
             axes[1, 1].set_title('Prediction Model Accuracy')
             axes[1, 1].set_xlabel('Metric')
-            axes[1, 1].set_ylabel('R² Score')
+            axes[1, 1].set_ylabel('Score (1 - holdout error)')
             axes[1, 1].tick_params(axis='x', rotation=45)
             axes[1, 1].grid(True, alpha=0.3)
         
@@ -844,9 +2572,9 @@ class SalaryAnalyzer:
         
         # Ministry staff comparison (latest year)
         latest_year = self.staff_evolution['by_ministry']['Year'].max()
-        latest_ministry_staff = self.staff_evolution['by_ministry'](
+        latest_ministry_staff = self.staff_evolution['by_ministry'][
             self.staff_evolution['by_ministry']['Year'] == latest_year
-        )
+        ]
         
         ministries = latest_ministry_staff['Ministry'].fillna('Unknown')
         staff_counts = latest_ministry_staff['Staff_Count']
@@ -857,55 +2585,40 @@ class SalaryAnalyzer:
         axes[0, 0].grid(True, alpha=0.3)
         
         # Ministry salary mass comparison
-        latest_ministry_salary = self.salary_mass_evolution['by_ministry'](
+        latest_ministry_salary = self.salary_mass_evolution['by_ministry'][
             self.salary_mass_evolution['by_ministry']['Year'] == latest_year
-        )
+        ]
         
         salary_masses = latest_ministry_salary['Salary_Mass'] / 1e6
-        axes[0, 1].barh(ministries, salary_masses, alpha=0.7, color='orange')
+        axes[0, 1].barh(latest_ministry_salary['Ministry'].fillna('Unknown'), salary_masses,
+                        alpha=0.7, color='orange')
         axes[0, 1].set_title(f'Salary Mass by Ministry ({latest_year})')
         axes[0, 1].set_xlabel('Salary Mass (Millions)')
         axes[0, 1].grid(True, alpha=0.3)
         
-        # Growth rate by ministry
-        ministry_growth = {}
-        for ministry in self.staff_evolution['by_ministry']['Ministry'].unique():
-            if pd.notna(ministry):
-                m_data = self.staff_evolution['by_ministry'](
-                    self.staff_evolution['by_ministry']['Ministry'] == ministry
-                ).sort_values('Year')
-                
-                if len(m_data) > 1:
-                    first_year = m_data.iloc[0]['Staff_Count']
-                    last_year = m_data.iloc[-1]['Staff_Count']
-                    growth_rate = ((last_year - first_year) / first_year) * 100
-                    ministry_growth[ministry] = growth_rate
-        
-        if ministry_growth:
-            ministries_growth = list(ministry_growth.keys())
-            growth_rates = list(ministry_growth.values())
+        # Growth rate by ministry (first to last year of every ministry)
+        ministry_growth = growth_metrics(self.staff_evolution['by_ministry'], ['Ministry'], 'Staff_Count')['summary']
+        ministry_growth = ministry_growth.dropna(subset=['Total_Growth'])
+        ministry_growth = ministry_growth[ministry_growth['Last_Year'] > ministry_growth['First_Year']]
+        
+        if len(ministry_growth) > 0:
+            growth_rates = ministry_growth['Total_Growth']
             colors = ['green' if rate >= 0 else 'red' for rate in growth_rates]
             
-            axes[1, 0].barh(ministries_growth, growth_rates, alpha=0.7, color=colors)
+            axes[1, 0].barh(ministry_growth['Ministry'], growth_rates, alpha=0.7, color=colors)
             axes[1, 0].set_title('Staff Growth Rate by Ministry (2013-2023)')
             axes[1, 0].set_xlabel('Growth Rate (%)')
             axes[1, 0].axvline(x=0, color='black', linestyle='-', alpha=0.3)
             axes[1, 0].grid(True, alpha=0.3)
         
         # Average salary per ministry
-        ministry_avg_salary = {}
-        for ministry in latest_ministry_staff['Ministry'].unique():
-            if pd.notna(ministry):
-                m_staff = latest_ministry_staff[latest_ministry_staff['Ministry'] == ministry]['Staff_Count'].iloc[0]
-                m_salary = latest_ministry_salary[latest_ministry_salary['Ministry'] == ministry]['Salary_Mass'].iloc[0]
-                if m_staff > 0:
-                    ministry_avg_salary[ministry] = m_salary / m_staff
-        
-        if ministry_avg_salary:
-            ministries_avg = list(ministry_avg_salary.keys())
-            avg_salaries = list(ministry_avg_salary.values())
+        ministry_avg = latest_ministry_staff.merge(latest_ministry_salary, on=['Year', 'Ministry'])
+        ministry_avg = ministry_avg[ministry_avg['Staff_Count'] > 0]
+        
+        if len(ministry_avg) > 0:
+            avg_salaries = ministry_avg['Salary_Mass'] / ministry_avg['Staff_Count']
             
-            axes[1, 1].barh(ministries_avg, avg_salaries, alpha=0.7, color='purple')
+            axes[1, 1].barh(ministry_avg['Ministry'], avg_salaries, alpha=0.7, color='purple')
             axes[1, 1].set_title(f'Average Salary per Agent by Ministry ({latest_year})')
             axes[1, 1].set_xlabel('Average Salary')
             axes[1, 1].grid(True, alpha=0.3)
@@ -972,18 +2685,11 @@ class SalaryAnalyzer:
         """
         print("Generating final comprehensive report...")
         
-        # Ensure all analyses are completed
-        if self.staff_evolution is None:
-            self.calculate_staff_evolution()
-        
-        if self.salary_mass_evolution is None:
-            self.calculate_salary_mass()
-        
-        if self.allowance_analysis is None:
-            self.analyze_allowances()
-        
-        if not self.prediction_results:
-            self.predict_future_trends()
+        # Ensure all analyses are up to date (memoized, recomputed only if the data changed)
+        self.calculate_staff_evolution()
+        self.calculate_salary_mass()
+        self.analyze_allowances()
+        self.predict_future_trends(self._last_target_years)
         
         allowance_report = self.generate_allowance_report()
         
@@ -993,7 +2699,7 @@ class SalaryAnalyzer:
                 'generated_date': datetime.now().isoformat(),
                 'data_period': '2013-2023',
                 'prediction_period': '2025-2030',
-                'total_records': len(self.main_data) if self.main_data is not None else 0
+                'total_records': self.summarize_dataset()['total_records']
             },
             'executive_summary': self._generate_executive_summary(),
             'staff_evolution': {
@@ -1124,7 +2830,7 @@ class SalaryAnalyzer:
                 
                 if count > 0:
                     avg_confidence /= count
-                    findings.append(f"Average prediction model confidence: {avg_confidence:.2f} (R² score)")
+                    findings.append(f"Average prediction model confidence: {avg_confidence:.2f} (1 - holdout error)")
             
         except Exception as e:
             print(f"Error generating key findings: {e}")
@@ -1179,13 +2885,9 @@ def main():
     # Initialize analyzer
     analyzer = SalaryAnalyzer(data_directory=".", encoding='utf-8')
     
-    # Load and process data
-    if analyzer.load_and_clean_data():
-        print("\nStep 1: Data loading completed successfully!")
-        
-        # Merge data with nomenclature
-        analyzer.merge_data_with_nomenclature()
-        print("Step 2: Data merged with nomenclature tables!")
+    # Load and process data (or reuse the aggregates of a previous run)
+    if analyzer.load_or_restore():
+        print("\nStep 1-2: Data loaded and merged with nomenclature tables!")
         
         # Calculate staff evolution
         analyzer.calculate_staff_evolution()
@@ -1198,7 +2900,11 @@ def main():
         # Analyze allowances
         analyzer.analyze_allowances()
         print("Step 5: Allowance analysis completed!")
-        
+
+        # The next steps only read the aggregates: release the payroll lines
+        analyzer.summarize_dataset()
+        analyzer.release_data()
+
         # Predict future trends
         analyzer.predict_future_trends()
         print("Step 6: Future trends prediction completed!")
@@ -0,0 +1,46 @@
+"""
+Aggregate Store Test
+====================
+
+Checks that stored tables are reloaded by a new store on the same
+directory (through index.json), and that the least recently used entry
+is evicted when the store exceeds its size cap.
+"""
+
+import pandas as pd
+import pytest
+
+from aggregate_store import AggregateStore
+
+
+def tables(value):
+    """Tables of one entry."""
+    return {'total': pd.DataFrame({'Year': [2022, 2023], 'Amount': [value, value + 1.0]})}
+
+
+def test_index_is_reloaded(tmp_path):
+    AggregateStore(tmp_path).put('salary_mass', tables(10.0))
+
+    store = AggregateStore(tmp_path)
+
+    assert (tmp_path / AggregateStore.INDEX_FILE).exists()
+    pd.testing.assert_frame_equal(store.get('salary_mass')['total'], tables(10.0)['total'])
+    assert store.get('staff') is None
+
+
+def test_least_recently_used_entry_is_evicted(tmp_path):
+    store = AggregateStore(tmp_path)
+    store.put('a', tables(1.0))
+    entry_size = store.total_size()
+    store.max_bytes = 2 * entry_size
+    store.put('b', tables(2.0))
+    assert store.get('a') is not None  # 'b' is now the least recently used
+
+    store.put('c', tables(3.0))
+
+    reloaded = AggregateStore(tmp_path, max_bytes=2 * entry_size)
+    assert reloaded.get('b') is None
+    assert not (tmp_path / 'b').exists()
+    assert reloaded.get('a')['total']['Amount'].tolist() == pytest.approx([1.0, 2.0])
+    assert reloaded.get('c') is not None
+    assert reloaded.total_size() <= 2 * entry_size
@@ -0,0 +1,81 @@
+"""
+Backtesting Test
+================
+
+Checks that the rolling-origin backtest hides the years after every origin
+from the methods, the Origin/Horizon bookkeeping, the exclusion of series
+with too little history, and the MAPE and bias of a known-error case.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from backtesting import rolling_origin_backtest
+from batch_forecasting import naive_forecast
+
+YEARS = list(range(2010, 2018))
+
+
+@pytest.fixture
+def matrix():
+    """Two linear series: 100 + 10 a year and 50 + 5 a year, 2013 missing in the second."""
+    t = np.arange(len(YEARS))
+    values = np.vstack([100 + 10.0 * t, 50 + 5.0 * t])
+    values[1, 3] = np.nan
+    return pd.DataFrame(values, columns=YEARS, index=pd.Index(['A', 'B'], name='Ministry'))
+
+
+def test_training_years_stop_at_the_origin(matrix):
+    seen = {}
+
+    def spy(years, values, forecast_years):
+        seen['years'], seen['values'] = years, values
+        return naive_forecast(years, values, forecast_years)
+
+    rolling_origin_backtest(matrix, methods={'Spy': spy}, origins=[2013, 2015], horizon=2)
+
+    training = seen['values'].reshape(2, 2, len(YEARS))
+    for block, origin in zip(training, [2013, 2015]):
+        after = seen['years'] > origin
+        assert np.isnan(block[:, after]).all()
+        assert np.array_equal(block[:, ~after], matrix.to_numpy()[:, ~after], equal_nan=True)
+
+
+def test_origin_and_horizon_columns(matrix):
+    forecasts = rolling_origin_backtest(matrix, methods={'Naive': naive_forecast}, horizon=2,
+                                        min_training_years=3)['forecasts']
+
+    assert list(forecasts.columns[:3]) == ['Ministry', 'Method', 'Origin']
+    assert (forecasts['Horizon'] == forecasts['Year'] - forecasts['Origin']).all()
+    assert set(forecasts['Horizon']) == {1, 2}
+    assert set(forecasts['Origin']) == set(range(2012, 2017))
+    assert (forecasts['Year'] <= 2017).all()
+    # 2013 is missing in series B: never an evaluated year
+    assert not ((forecasts['Ministry'] == 'B') & (forecasts['Year'] == 2013)).any()
+
+
+def test_series_with_too_little_history_are_excluded(matrix):
+    forecasts = rolling_origin_backtest(matrix, methods={'Naive': naive_forecast}, horizon=1,
+                                        min_training_years=4)['forecasts']
+
+    # Series B has 3 observed years up to 2013 and 4 up to 2014
+    origins = forecasts.groupby('Ministry')['Origin'].agg(set)
+    assert origins['A'] == {2013, 2014, 2015, 2016}
+    assert origins['B'] == {2014, 2015, 2016}
+
+
+def test_naive_error_on_a_linear_series(matrix):
+    backtest = rolling_origin_backtest(matrix.loc[['A']], methods={'Naive': naive_forecast}, horizon=2)
+
+    # The naive forecast repeats the origin value: error -10 h / actual
+    errors = {(origin, h): -10 * h / (100 + 10 * (origin + h - 2010)) * 100
+              for origin in range(2013, 2017) for h in (1, 2) if origin + h <= 2017}
+    accuracy = backtest['accuracy'].iloc[0]
+    assert accuracy['Forecasts'] == len(errors) == 7
+    assert accuracy['MAPE'] == pytest.approx(np.mean(np.abs(list(errors.values()))))
+    assert accuracy['Bias'] == pytest.approx(np.mean(list(errors.values())))
+    by_horizon = backtest['by_horizon'].set_index('Horizon')
+    assert by_horizon.loc[2, 'Bias'] == pytest.approx(
+        np.mean([error for (_, h), error in errors.items() if h == 2]))
+    assert (backtest['forecasts']['Percentage_Error'] < 0).all()
@@ -0,0 +1,82 @@
+"""
+Batch Forecasting Test
+======================
+
+Checks the batched trend fits against one np.polyfit call per series, on
+series with missing years, and the batched Holt smoothing against a scalar
+implementation of the recursion with fixed parameters.
+"""
+
+import numpy as np
+import pytest
+
+from batch_forecasting import batch_forecast, fit_trends, holt_forecast
+
+YEARS = np.arange(2010, 2024)
+TARGET_YEARS = [2024, 2025]
+
+
+@pytest.fixture
+def values():
+    """Positive noisy series with a few missing years each."""
+    rng = np.random.default_rng(0)
+    t = YEARS - YEARS[0]
+    values = (1000 + rng.uniform(10, 50, (20, 1)) * t + rng.uniform(0, 2, (20, 1)) * t ** 2
+              + rng.normal(0, 20, (20, len(YEARS))))
+    missing = rng.random(values.shape) < 0.25
+    missing[:, :2] = False
+    return np.where(missing, np.nan, values)
+
+
+def polyfit_rows(values, degree, log_scale=False):
+    """Coefficients (highest power first) of one np.polyfit call per series."""
+    fits = []
+    for row in values:
+        observed = ~np.isnan(row)
+        y = np.log(row[observed]) if log_scale else row[observed]
+        fits.append(np.polyfit(YEARS[observed] - YEARS.mean(), y, degree))
+    return fits
+
+
+@pytest.mark.parametrize('degree', [1, 2])
+def test_fit_trends_matches_polyfit(values, degree):
+    coefficients, origin, fitted, n_points = fit_trends(YEARS, values, degree)
+
+    assert origin == pytest.approx(YEARS.mean())
+    assert (n_points == (~np.isnan(values)).sum(axis=1)).all()
+    for row, expected in enumerate(polyfit_rows(values, degree)):
+        assert np.allclose(coefficients[row], expected[::-1])
+        assert np.allclose(fitted[row], np.polyval(expected, YEARS - origin))
+
+
+def test_batch_forecast_matches_polyfit(values):
+    forecasts = batch_forecast(YEARS, values, TARGET_YEARS)
+
+    t = np.asarray(TARGET_YEARS) - YEARS.mean()
+    for name, degree, log_scale in [('Linear Regression', 1, False), ('Quadratic Trend', 2, False),
+                                    ('Exponential Trend', 1, True)]:
+        expected = np.vstack([np.polyval(fit, t) for fit in polyfit_rows(values, degree, log_scale)])
+        assert np.allclose(forecasts['all_methods'][name], np.exp(expected) if log_scale else expected)
+
+
+def scalar_holt(row, alpha, beta, phi, steps):
+    """Holt's damped-trend recursion on one series, one year at a time."""
+    observed = [value for value in row if not np.isnan(value)]
+    level, trend = observed[0], observed[1] - observed[0]
+    first = int(np.flatnonzero(~np.isnan(row))[0])
+    for value in row[first + 1:]:
+        predicted = level + phi * trend
+        if np.isnan(value):
+            level, trend = predicted, phi * trend
+        else:
+            new_level = predicted + alpha * (value - predicted)
+            level, trend = new_level, beta * (new_level - level) + (1 - beta) * phi * trend
+    return [level + sum(phi ** i for i in range(1, h + 1)) * trend for h in steps]
+
+
+@pytest.mark.parametrize('alpha, beta, phi', [(0.5, 0.2, 1.0), (0.8, 0.1, 0.9)])
+def test_holt_matches_scalar_recursion(values, alpha, beta, phi):
+    forecasts = holt_forecast(YEARS, values, TARGET_YEARS, damping=[phi], alphas=[alpha], betas=[beta])
+
+    for row, forecast in zip(values, forecasts):
+        assert np.allclose(forecast, scalar_holt(row, alpha, beta, phi, [1, 2]))
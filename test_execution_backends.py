@@ -0,0 +1,143 @@
+"""
+Execution Backends Test
+=======================
+
+Checks that the Polars and year-sharded parallel engines, and the SQLite
+analytical database, produce the same tables as the pandas pipeline on a
+small generated dataset, with static and effective-dated nomenclature
+tables.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from analytical_database import build_database
+from salary_analyzer import SalaryAnalyzer
+
+# Options of the engines under test
+ENGINE_OPTIONS = {
+    'pandas': {},
+    'polars': {},
+    'parallel': {'workers': 2}
+}
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    """Write a small payroll dataset with its grade and corps tables."""
+    rng = np.random.default_rng(0)
+    grades = [(100 + i, 0, i % 3, f'Grade {i}', f'G{i}', f'Ministere {i % 3}') for i in range(6)]
+    corps = [(200 + i, f'Corps {i}', f'C{i}') for i in range(4)]
+    pd.DataFrame(grades).to_csv(tmp_path / 'table_grade.cleaned.txt', sep=';', header=False, index=False)
+    pd.DataFrame(corps).to_csv(tmp_path / 'table_corps.cleaned.txt', sep=';', header=False, index=False)
+
+    rows = []
+    for agent in range(60):
+        start = 2013 + int(rng.integers(0, 6))
+        for year in range(start, min(2023, start + 5) + 1):
+            for month in range(1, 13):
+                for line, codind in enumerate([1, 5, 9][: 1 + agent % 3]):
+                    rows.append((
+                        300 + agent % 4, month, year, 1 + line % 2, line, codind,
+                        round(800 + 50 * (year - 2013) + rng.normal(0, 10), 3),
+                        10, 20, 100 + agent % 7, 200 + agent % 5, 0, 1, 1, 1, 1, 1, 1, 40, 0, 10,
+                        f'A{agent:06d}'
+                    ))
+    # Lines removed by the cleaning rules: out-of-range year, missing amount
+    rows.append((300, 1, 2012, 1, 0, 1, 900.0, 10, 20, 100, 200, 0, 1, 1, 1, 1, 1, 1, 40, 0, 10, 'A000000'))
+    rows.append((300, 1, 2020, 1, 0, 1, None, 10, 20, 100, 200, 0, 1, 1, 1, 1, 1, 1, 40, 0, 10, 'A000000'))
+    pd.DataFrame(rows).to_csv(tmp_path / 'tab_paie_13_23.cleaned.txt', sep=';', header=False, index=False)
+    return tmp_path
+
+
+@pytest.fixture
+def dated_data_dir(data_dir):
+    """The dataset with effective-dated grade and corps tables."""
+    grades = [(100, 0, 0, 'Grade 0', 'G0', 'Ministere 0', None, '2018-06-30'),
+              (100, 0, 0, 'Grade 0 bis', 'G0', 'Ministere 1', '2018-07-01', None),
+              (101, 0, 1, 'Grade 1', 'G1', 'Ministere 1', None, '2016-12-31')]
+    grades += [(100 + i, 0, i % 3, f'Grade {i}', f'G{i}', f'Ministere {i % 3}', None, None) for i in range(2, 6)]
+    corps = [(200, 'Corps 0', 'C0', None, '2019-12-31'), (200, 'Corps 0 new', 'C0', '2020-01-01', None)]
+    corps += [(200 + i, f'Corps {i}', f'C{i}', None, None) for i in range(1, 4)]
+    pd.DataFrame(grades).to_csv(data_dir / 'table_grade.cleaned.txt', sep=';', header=False, index=False)
+    pd.DataFrame(corps).to_csv(data_dir / 'table_corps.cleaned.txt', sep=';', header=False, index=False)
+    return data_dir
+
+
+def run_pipeline(data_dir, engine):
+    """Compute the summary, staff, salary mass and allowance tables with one engine."""
+    analyzer = SalaryAnalyzer(data_directory=data_dir)
+    if engine == 'sqlite':
+        build_database(analyzer, data_dir / 'payroll.sqlite')
+        analyzer.use_database('payroll.sqlite')
+    else:
+        analyzer.use_engine(engine, **ENGINE_OPTIONS[engine])
+    if engine == 'pandas':
+        assert analyzer.load_and_clean_data()
+    return {
+        'dataset_summary': {'summary': analyzer.results.get('dataset_summary')},
+        'staff_evolution': analyzer.calculate_staff_evolution(),
+        'salary_mass': analyzer.calculate_salary_mass(),
+        'allowances': analyzer.analyze_allowances()
+    }
+
+
+@pytest.mark.parametrize('engine', ['polars', 'parallel'])
+def test_engine_matches_pandas(data_dir, engine):
+    if engine == 'polars':
+        pytest.importorskip('polars')
+    expected = run_pipeline(data_dir, 'pandas')
+    result = run_pipeline(data_dir, engine)
+
+    for name, tables in expected.items():
+        assert list(result[name]) == list(tables)
+        for table_name, table in tables.items():
+            # Float sums may differ in the last bits (summation order)
+            pd.testing.assert_frame_equal(result[name][table_name], table,
+                                          check_exact=False, rtol=1e-12)
+
+
+@pytest.mark.parametrize('engine', ['polars', 'parallel', 'sqlite'])
+def test_effective_dated_tables_match_pandas(dated_data_dir, engine):
+    if engine == 'polars':
+        pytest.importorskip('polars')
+    expected = run_pipeline(dated_data_dir, 'pandas')
+    result = run_pipeline(dated_data_dir, engine)
+
+    # Grade 100 has two periods: its lines are counted once, under the label of their date
+    by_ministry = expected['salary_mass']['by_ministry'].groupby('Year')['Salary_Mass'].sum()
+    total = expected['salary_mass']['total'].set_index('Year')['Total_Salary_Mass']
+    assert (by_ministry <= total.loc[by_ministry.index] + 1e-6).all()
+    assert {'Grade 0', 'Grade 0 bis'} <= set(expected['staff_evolution']['by_grade']['Grade'])
+    assert {'Corps 0', 'Corps 0 new'} <= set(expected['staff_evolution']['by_corps']['Corps'])
+    for name in ['staff_evolution', 'salary_mass', 'allowances']:
+        for table_name, table in expected[name].items():
+            pd.testing.assert_frame_equal(result[name][table_name], table,
+                                          check_exact=False, rtol=1e-12)
+
+
+def test_database_matches_pandas(data_dir):
+    expected = run_pipeline(data_dir, 'pandas')
+    analyzer = SalaryAnalyzer(data_directory=data_dir)
+    build_database(analyzer, data_dir / 'payroll.sqlite')
+    analyzer.use_database('payroll.sqlite')
+
+    result = {
+        'staff_evolution': analyzer.calculate_staff_evolution(),
+        'salary_mass': analyzer.calculate_salary_mass(),
+        'allowances': analyzer.analyze_allowances()
+    }
+
+    assert analyzer.main_data is None
+    for name, tables in result.items():
+        assert list(tables) == list(expected[name])
+        for table_name, table in tables.items():
+            pd.testing.assert_frame_equal(table, expected[name][table_name],
+                                          check_exact=False, rtol=1e-12)
+
+
+def test_unknown_engine(data_dir):
+    analyzer = SalaryAnalyzer(data_directory=data_dir)
+    with pytest.raises(ValueError):
+        analyzer.use_engine('spark')
@@ -0,0 +1,102 @@
+"""
+Forecast Executor Test
+======================
+
+Checks that the process-pool forecasts are identical to the serial path,
+that a series exceeding its timeout is forecast without ARIMA, and that
+the model cascade only escalates to ARIMA when needed and in budget, and
+that the forecast cache only refits the series that changed, and misses
+when the cascade settings change.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import forecast_executor
+from forecast_cache import ForecastCache
+from forecast_executor import (CHEAP_MODELS, ESCALATION_ERROR, forecast_series,
+                               summarize_model_choices)
+
+TARGET_YEARS = [2025, 2026, 2027]
+
+
+@pytest.fixture
+def tasks():
+    """Staff series of a few ministries over 2013-2023 (noisy enough to escalate to ARIMA)."""
+    rng = np.random.default_rng(0)
+    years = np.arange(2013, 2024)
+    tasks = []
+    for i in range(6):
+        values = 1000 + 20 * i * (years - 2013) + rng.normal(0, 80, len(years))
+        data = pd.DataFrame({'Year': years, 'Ministry': f'Ministere {i}', 'Staff_Count': values})
+        tasks.append((f'Ministere {i}', data, 'Staff_Count'))
+    return tasks
+
+
+def test_parallel_matches_serial(tasks):
+    serial = forecast_series(tasks, TARGET_YEARS, workers=1)
+    parallel = forecast_series(tasks, TARGET_YEARS, workers=2, chunk_size=2)
+
+    assert list(parallel) == list(serial)
+    assert parallel == serial
+
+
+def test_timeout_falls_back_without_arima(tasks):
+    results = forecast_series(tasks[:1], TARGET_YEARS, workers=1, timeout=1e-6)
+
+    result = results['Ministere 0']
+    assert len(result['predictions']) == len(TARGET_YEARS)
+    assert 'ARIMA' not in result['models_tried']
+
+
+def test_cascade_escalates_only_when_cheap_models_miss(tasks):
+    results = forecast_series(tasks, TARGET_YEARS, workers=1)
+
+    for result in results.values():
+        assert result['models_tried'][:2] == CHEAP_MODELS
+        assert result['escalated'] == ('ARIMA' in result['models_tried'])
+        if not result['escalated']:
+            assert result['validation_error'] <= ESCALATION_ERROR
+    assert any(result['escalated'] for result in results.values())
+
+
+def test_exhausted_time_budget_skips_expensive_models(tasks):
+    results = forecast_series(tasks, TARGET_YEARS, workers=1, time_budget=0)
+
+    for result in results.values():
+        assert 'ARIMA' not in result['models_tried']
+    usage = summarize_model_choices(results)
+    assert usage['Series'].sum() == len(tasks)
+    assert usage['Escalated'].sum() == 0
+
+
+def test_cache_refits_only_changed_series(tasks, tmp_path):
+    cache = ForecastCache(tmp_path / 'forecasts.sqlite')
+    first = forecast_series(tasks, TARGET_YEARS, cache=cache)
+    key, data, value_column = tasks[0]
+    changed = [(key, data.assign(Staff_Count=data['Staff_Count'] * 2), value_column)] + tasks[1:]
+    second = forecast_series(changed, TARGET_YEARS, cache=cache)
+
+    rates = cache.hit_rates()
+    assert rates['Hits'].tolist() == [0, len(tasks) - 1]
+    assert len(cache) == len(tasks) + 1
+    assert list(second) == list(first)
+    assert all(second[key] == first[key] for key, _, _ in tasks[1:])
+    assert second['Ministere 0'] != first['Ministere 0']
+
+
+def test_cache_misses_when_cascade_settings_change(tasks, tmp_path, monkeypatch):
+    cache = ForecastCache(tmp_path / 'forecasts.sqlite')
+    forecast_series(tasks, TARGET_YEARS, cache=cache)
+    forecast_series(tasks, TARGET_YEARS, cache=cache, workers=2, chunk_size=1)
+
+    forecast_series(tasks, TARGET_YEARS, cache=cache, time_budget=600)
+    monkeypatch.setattr(forecast_executor, 'ESCALATION_ERROR', 1.0)
+    forecast_series(tasks, TARGET_YEARS, cache=cache)
+    monkeypatch.setattr(forecast_executor, 'HOLDOUT_YEARS', 2)
+    forecast_series(tasks, TARGET_YEARS, cache=cache)
+
+    # The workers and the chunk size do not change the results
+    assert cache.hit_rates()['Hits'].tolist() == [0, len(tasks), 0, 0, 0]
+    assert len(cache) == 4 * len(tasks)
@@ -0,0 +1,64 @@
+"""
+Global Forecasting Test
+=======================
+
+Checks that the pooled model learns the growth shared by the series of a
+group, that it only forecasts the years after the last observed year of
+a series, and that the backtest method fits one model per origin on the
+years up to that origin.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from global_forecasting import global_forecast, global_method
+
+YEARS = np.arange(2010, 2025)
+TARGET_YEARS = [2025, 2026, 2027]
+GROWTH = [0.02, 0.06, -0.03]
+
+
+@pytest.fixture
+def series():
+    """Series of three corps growing at the rate of their corps, at very different scales."""
+    rng = np.random.default_rng(0)
+    corps = np.repeat(np.arange(3), 30)
+    all_years = np.concatenate([YEARS, TARGET_YEARS])
+    scale = rng.uniform(1e3, 1e6, len(corps))
+    values = scale[:, None] * np.exp(np.array(GROWTH)[corps][:, None] * (all_years - all_years[0])[None, :]
+                                     + rng.normal(0, 0.01, (len(corps), len(all_years))))
+    members = pd.DataFrame({'Corps': [f'Corps {c}' for c in corps], 'Grade': [f'Grade {i}' for i in range(len(corps))]})
+    return values[:, :len(YEARS)], values[:, len(YEARS):], members
+
+
+def test_pooled_model_learns_group_growth(series):
+    history, future, members = series
+
+    forecasts = global_forecast(YEARS, history, TARGET_YEARS, members)
+
+    assert np.abs(forecasts / future - 1).mean() < 0.03
+
+
+def test_only_years_after_the_last_observation(series):
+    history, _, members = series
+    history = history.copy()
+    history[0, -2:] = np.nan
+    history[1] = np.nan
+
+    forecasts = global_forecast(YEARS, history, [2023, 2024, 2025], members)
+
+    assert np.isfinite(forecasts[0]).all()
+    assert np.isnan(forecasts[1]).all()
+    assert np.isnan(forecasts[2:, :2]).all() and np.isfinite(forecasts[2:, 2]).all()
+
+
+def test_backtest_method_fits_one_model_per_origin(series):
+    history, _, members = series
+    blocks = [np.where(YEARS[None, :] <= origin, history, np.nan) for origin in (2018, 2021)]
+
+    stacked = global_method(members)(YEARS, np.vstack(blocks), YEARS)
+
+    for i, block in enumerate(blocks):
+        expected = global_forecast(YEARS, block, YEARS, members)
+        assert np.allclose(stacked[i * len(members):(i + 1) * len(members)], expected, equal_nan=True)
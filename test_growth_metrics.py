@@ -0,0 +1,59 @@
+"""
+Growth Metrics Test
+===================
+
+Checks the year matrix, year-over-year growth, rolling average and CAGR
+on a small table with a missing year and a zero base year.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from growth_metrics import growth_metrics, year_matrix
+
+
+@pytest.fixture
+def table():
+    """
+    Amounts of three corps:
+
+    - A: +10% a year from 100 in 2020 to 133.1 in 2023
+    - B: 0 in 2020 (zero base), 50 in 2021, missing in 2022, 72 in 2023
+    - C: missing value in 2020, 200 in 2021 and 242 in 2023; the only 2024 row is missing
+    """
+    rows = [('A', 2020, 100.0), ('A', 2021, 110.0), ('A', 2022, 121.0), ('A', 2023, 133.1),
+            ('B', 2020, 0.0), ('B', 2021, 50.0), ('B', 2023, 72.0),
+            ('C', 2020, np.nan), ('C', 2021, 200.0), ('C', 2023, 242.0), ('C', 2024, np.nan)]
+    return pd.DataFrame(rows, columns=['Corps', 'Year', 'Amount'])
+
+
+def test_year_matrix_keeps_missing_years_missing(table):
+    by_corps = year_matrix(table, ['Corps'], 'Amount')
+    total = year_matrix(table, [], 'Amount')
+
+    assert list(by_corps.columns) == [2020, 2021, 2022, 2023, 2024]
+    assert np.isnan(by_corps.loc['B', 2022]) and np.isnan(by_corps.loc['C', 2020])
+    assert by_corps.loc['B', 2020] == 0
+    # Years with only missing values are missing in the total, not 0
+    assert total.loc['Total'].tolist()[:4] == pytest.approx([100.0, 360.0, 121.0, 447.1])
+    assert np.isnan(total.loc['Total', 2024])
+
+
+def test_yoy_growth_and_cagr(table):
+    metrics = growth_metrics(table, ['Corps'], 'Amount', window=3)
+
+    yoy = metrics['yoy_growth']
+    summary = metrics['summary'].set_index('Corps')
+    assert yoy.loc['A', [2021, 2022, 2023]].tolist() == pytest.approx([10.0, 10.0, 10.0])
+    assert np.isnan(yoy.loc['A', 2020])
+    # Zero base year and missing previous years have no growth
+    assert yoy.loc['B'].isna().all()
+    assert summary.loc['A', 'CAGR'] == pytest.approx(10.0)
+    assert summary.loc['A', 'Total_Growth'] == pytest.approx(33.1)
+    assert summary.loc['A', 'Rolling_3Y_Average'] == pytest.approx((110 + 121 + 133.1) / 3)
+    assert np.isnan(summary.loc['B', 'CAGR']) and np.isnan(summary.loc['B', 'Total_Growth'])
+    # C: first observed year 2021, CAGR over the two years to 2023
+    assert (summary.loc['C', 'First_Year'], summary.loc['C', 'Last_Year']) == (2021, 2023)
+    assert summary.loc['C', 'CAGR'] == pytest.approx(10.0)
+    assert np.isnan(summary.loc['C', 'Rolling_3Y_Average'])
@@ -0,0 +1,62 @@
+"""
+Hierarchical Forecasting Test
+=============================
+
+Checks the summing matrix of a small ministry > corps > grade hierarchy,
+and that every reconciliation method gives coherent forecasts equal to
+the dense closed form S (S' W^-1 S)^-1 S' W^-1 y.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from hierarchical_forecasting import (RECONCILIATION_METHODS, coherence_gaps,
+                                      reconcile_forecasts, summing_matrix)
+
+LEVELS = {
+    'total': [],
+    'ministry': ['Ministry'],
+    'corps': ['Ministry', 'Corps'],
+    'grade': ['Ministry', 'Corps', 'Grade']
+}
+
+
+@pytest.fixture
+def hierarchy():
+    members = pd.DataFrame({
+        'Ministry': ['A', 'A', 'A', 'B', 'B', 'C'],
+        'Corps': ['x', 'x', 'y', 'z', 'z', 'w'],
+        'Grade': ['1', '2', '3', '4', '5', '6']
+    })
+    return summing_matrix(members, LEVELS)
+
+
+def test_summing_matrix(hierarchy):
+    summing, nodes = hierarchy
+
+    assert summing.shape == (14, 6)
+    assert nodes['Level'].value_counts().to_dict() == {'total': 1, 'ministry': 3, 'corps': 4, 'grade': 6}
+    dense = summing.toarray()
+    assert (dense[0] == 1).all()
+    assert (dense[-6:] == np.eye(6)).all()
+    ministry_a = nodes.index[(nodes['Level'] == 'ministry') & (nodes['Ministry'] == 'A')][0]
+    assert dense[ministry_a].tolist() == [1, 1, 1, 0, 0, 0]
+
+
+@pytest.mark.parametrize('method', RECONCILIATION_METHODS)
+def test_reconciled_forecasts_are_coherent(hierarchy, method):
+    summing, nodes = hierarchy
+    rng = np.random.default_rng(0)
+    base = rng.normal(100, 30, (summing.shape[0], 3))
+    variances = rng.uniform(1, 50, summing.shape[0])
+
+    reconciled = reconcile_forecasts(base, summing, method=method, variances=variances)
+
+    assert coherence_gaps(base, nodes).max() > 1
+    assert np.allclose(summing @ reconciled[-6:], reconciled)
+    if method != 'bottom_up':
+        dense = summing.toarray()
+        inverse = np.diag(1 / variances) if method == 'mint' else np.eye(len(variances))
+        projection = dense @ np.linalg.solve(dense.T @ inverse @ dense, dense.T @ inverse)
+        assert np.allclose(reconciled, projection @ base)
@@ -0,0 +1,72 @@
+"""
+Online Forecasting Test
+=======================
+
+Checks that states advanced through new years give the forecasts of a
+full fit (linear trend) or of the smoothing of the full history with the
+stored parameters (Holt), and that a revised last year is rolled back
+rather than refit.
+"""
+
+import numpy as np
+import pytest
+
+from batch_forecasting import BATCH_METHODS, _holt_smooth
+from online_forecasting import ONLINE_METHODS, state_forecasts, update_states
+
+YEARS = np.arange(2013, 2025)
+TARGET_YEARS = [2025, 2026, 2027]
+
+
+@pytest.fixture
+def values():
+    """Trending series over 2013-2024, with missing years."""
+    rng = np.random.default_rng(0)
+    values = np.cumsum(rng.normal(10, 5, (50, len(YEARS))), axis=1) + 1000
+    values[rng.random(values.shape) < 0.1] = np.nan
+    return values
+
+
+@pytest.fixture
+def series(values):
+    return [f'Series {i}' for i in range(len(values))]
+
+
+@pytest.mark.parametrize('method', list(ONLINE_METHODS))
+def test_full_fit_matches_batch_method(values, series, method):
+    states, status = update_states(None, series, YEARS, values, method)
+
+    forecasts = state_forecasts(states, TARGET_YEARS)['predictions']
+    assert (status == 'refit').all()
+    assert np.allclose(forecasts, BATCH_METHODS[method](YEARS, values, TARGET_YEARS), equal_nan=True)
+
+
+@pytest.mark.parametrize('method', list(ONLINE_METHODS))
+def test_new_years_advance_the_states(values, series, method):
+    previous, _ = update_states(None, series, YEARS[:-2], values[:, :-2], method)
+    states, status = update_states(previous, series, YEARS, values, method)
+
+    assert (status == 'updated').all()
+    if method == 'Linear Regression':
+        expected = BATCH_METHODS[method](YEARS, values, TARGET_YEARS)
+        assert np.allclose(state_forecasts(states, TARGET_YEARS)['predictions'], expected)
+    else:
+        parameters = [previous[column].to_numpy()[None, :] for column in ('Alpha', 'Beta', 'Phi')]
+        _, level, trend, _ = _holt_smooth(YEARS.astype(float), values, *parameters)
+        assert np.allclose(states['Level'], level[0])
+        assert np.allclose(states['Trend'], trend[0])
+
+
+def test_revised_last_year_is_rolled_back(values, series):
+    previous, _ = update_states(None, series, YEARS, values, 'Linear Regression')
+    revised = values.copy()
+    revised[0, -1] = 2000.0
+    revised[1, 3] = 2000.0
+
+    states, status = update_states(previous, series, YEARS, revised, 'Linear Regression')
+
+    assert status[0] == 'revised'
+    assert status[1] == 'refit'
+    assert (status[2:] == 'unchanged').all()
+    expected = BATCH_METHODS['Linear Regression'](YEARS, revised, TARGET_YEARS)
+    assert np.allclose(state_forecasts(states, TARGET_YEARS)['predictions'], expected)
@@ -0,0 +1,87 @@
+"""
+Prediction Intervals Test
+=========================
+
+Checks that the bootstrap intervals of every batched method cover about
+the expected share of simulated future values (multiplicative noise for
+the exponential trend), and that the interval of a series does not depend
+on the other series of the matrix.
+"""
+
+import numpy as np
+import pytest
+
+from batch_forecasting import BATCH_METHODS
+from prediction_intervals import bootstrap_intervals, method_intervals
+
+YEARS = np.arange(2005, 2025)
+TARGET_YEARS = np.arange(2025, 2029)
+
+
+def simulate(method, n_series=400, seed=0):
+    """History and future of series following the error model of a method."""
+    rng = np.random.default_rng(seed)
+    all_years = np.concatenate([YEARS, TARGET_YEARS])
+    t = (all_years - all_years[0])[None, :]
+    if method in ('Naive', 'Drift', 'Holt', 'Damped Trend'):
+        drift = 0 if method == 'Naive' else 5
+        values = 1000 + np.cumsum(rng.normal(drift, 10, (n_series, len(all_years))), axis=1)
+    elif method == 'Exponential Trend':
+        # Multiplicative noise: log-linear trend with normal noise on the logs
+        values = 1000 * np.exp(0.05 * t + rng.normal(0, 0.03, (n_series, len(all_years))))
+    else:
+        values = 1000 + 8 * t + rng.normal(0, 10, (n_series, len(all_years)))
+    return values[:, :len(YEARS)], values[:, len(YEARS):]
+
+
+@pytest.mark.parametrize('method', list(BATCH_METHODS))
+def test_intervals_cover_future_values(method):
+    history, future = simulate(method)
+
+    lower, upper = bootstrap_intervals(YEARS, history, TARGET_YEARS, method)
+
+    predictions = BATCH_METHODS[method](YEARS, history, TARGET_YEARS)
+    assert (lower <= predictions).all() and (predictions <= upper).all()
+    coverage = ((future >= lower) & (future <= upper)).mean()
+    assert 0.85 <= coverage <= 0.99
+
+
+def test_interval_does_not_depend_on_the_matrix():
+    history, _ = simulate('Drift', n_series=10)
+    history[3, :4] = np.nan
+    batched = bootstrap_intervals(YEARS, history, TARGET_YEARS, 'Drift', max_elements=1000)
+
+    alone = bootstrap_intervals(YEARS[4:], history[3:4, 4:], TARGET_YEARS, 'Drift')
+
+    assert np.allclose(batched[0][3], alone[0][0])
+    assert np.allclose(batched[1][3], alone[1][0])
+
+
+def test_method_intervals_by_series():
+    history, _ = simulate('Linear Regression', n_series=6)
+    methods = np.array(['Linear Regression', 'Drift', 'ARIMA'] * 2, dtype=object)
+    predictions = np.vstack([BATCH_METHODS[name](YEARS, row[None, :], TARGET_YEARS)[0]
+                             if name in BATCH_METHODS else np.zeros(len(TARGET_YEARS))
+                             for name, row in zip(methods, history)])
+
+    lower, upper = method_intervals(YEARS, history, TARGET_YEARS, methods, predictions)
+
+    drift = bootstrap_intervals(YEARS, history[methods == 'Drift'], TARGET_YEARS, 'Drift')
+    assert np.allclose(lower[methods == 'Drift'], drift[0])
+    assert np.isnan(lower[methods == 'ARIMA']).all()
+    assert np.isfinite(upper[methods != 'ARIMA']).all()
+
+
+def test_exponential_trend_intervals_are_multiplicative():
+    rng = np.random.default_rng(1)
+    t = np.arange(len(YEARS) + len(TARGET_YEARS))[None, :]
+    values = 1000 * np.exp(0.05 * t + rng.normal(0, 0.3, (200, t.shape[1])))
+    history, future = values[:, :len(YEARS)], values[:, len(YEARS):]
+
+    lower, upper = bootstrap_intervals(YEARS, history, TARGET_YEARS, 'Exponential Trend')
+
+    # Noise on the logs: positive bounds, wider above the forecast than below
+    predictions = BATCH_METHODS['Exponential Trend'](YEARS, history, TARGET_YEARS)
+    assert (lower > 0).all()
+    assert ((upper - predictions) > (predictions - lower)).mean() > 0.95
+    assert 0.85 <= ((future >= lower) & (future <= upper)).mean() <= 0.99
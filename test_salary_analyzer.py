@@ -0,0 +1,369 @@
+"""
+Salary Analyzer Test
+====================
+
+Checks the analyzer results on a small hand-made payroll whose expected
+values are computed by hand:
+
+- A1: 2022 grade 100 (Ministere X), 100 a month all year plus a Type 2
+  allowance of 10 in June; 2023 grade 101, 120 a month all year
+- A2: 2022 grade 100, 100 a month from January to June
+- A3: 2023 grade 102 (Ministere Y), 200 a month from April to December
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from salary_analyzer import MAIN_COLUMNS, SalaryAnalyzer
+
+GRADES = [
+    (100, 0, 1, 'Grade A', 'GA', 'Ministere X'),
+    (101, 0, 2, 'Grade B', 'GB', 'Ministere X'),
+    (102, 0, 1, 'Grade C', 'GC', 'Ministere Y')
+]
+CORPS = [(200, 'Corps A', 'CA'), (201, 'Corps B', 'CB')]
+
+
+def payroll_line(agent, year, month, amount, grade, corps, line_type=1, codind=1,
+                 article=10, par=20, dire=1, sdir=1, serv=1, gouv=11):
+    """One payroll line in the column order of the main file."""
+    values = {
+        'Codetab': 300, 'Mois': month, 'Annee': year, 'Type': line_type, 'Nligne': 0,
+        'Codind': codind, 'Montind': amount, 'Article': article, 'Par': par,
+        'Codgrd': grade, 'Codcorps': corps, 'Hcorps': 0, 'Codefam': 1, 'Codsfam': 1,
+        'Codnat': 1, 'Dire': dire, 'Sdir': sdir, 'Serv': serv, 'Deleg': 40,
+        'Centreg': 0, 'Gouv': gouv, 'Id_agent': agent
+    }
+    return tuple(values[column] for column in MAIN_COLUMNS)
+
+
+def base_lines():
+    """Payroll lines of the three agents of the module docstring."""
+    lines = [payroll_line('A1', 2022, month, 100.0, 100, 200) for month in range(1, 13)]
+    lines.append(payroll_line('A1', 2022, 6, 10.0, 100, 200, line_type=2, codind=5))
+    lines += [payroll_line('A1', 2023, month, 120.0, 101, 200) for month in range(1, 13)]
+    lines += [payroll_line('A2', 2022, month, 100.0, 100, 200, gouv=12) for month in range(1, 7)]
+    lines += [payroll_line('A3', 2023, month, 200.0, 102, 201, gouv=12) for month in range(4, 13)]
+    return lines
+
+
+def write_dataset(directory, lines=None, grades=GRADES, corps=CORPS):
+    """Write the payroll file and the grade and corps tables to a directory."""
+    pd.DataFrame(grades).to_csv(directory / 'table_grade.cleaned.txt', sep=';', header=False, index=False)
+    pd.DataFrame(corps).to_csv(directory / 'table_corps.cleaned.txt', sep=';', header=False, index=False)
+    pd.DataFrame(base_lines() if lines is None else lines).to_csv(
+        directory / 'tab_paie_13_23.cleaned.txt', sep=';', header=False, index=False)
+    return directory
+
+
+@pytest.fixture
+def analyzer(tmp_path):
+    """Analyzer with the hand-made payroll loaded."""
+    analyzer = SalaryAnalyzer(data_directory=write_dataset(tmp_path))
+    assert analyzer.load_and_clean_data()
+    return analyzer
+
+
+def test_agent_year_facts(analyzer):
+    facts = analyzer.build_agent_year_facts().set_index(['Annee', 'Id_agent'])
+
+    assert len(facts) == 4
+    a1 = facts.loc[(2022, 'A1')]
+    assert a1['Total_Montind'] == pytest.approx(1210.0)
+    assert a1['Line_Count'] == 13
+    assert a1['Montind_Type_1'] == pytest.approx(1200.0)
+    assert a1['Montind_Type_2'] == pytest.approx(10.0)
+    assert a1['Codgrd'] == 100
+    assert facts.loc[(2023, 'A1'), 'Codgrd'] == 101
+    assert facts.loc[(2022, 'A2'), 'Total_Montind'] == pytest.approx(600.0)
+    assert facts.loc[(2023, 'A3'), 'Montind_Type_2'] == 0
+
+
+def test_months_mask_and_fte(analyzer):
+    facts = analyzer.build_agent_year_facts().set_index(['Annee', 'Id_agent'])
+    assert facts.loc[(2022, 'A1'), 'Months_Mask'] == 0b111111111111
+    assert facts.loc[(2022, 'A2'), 'Months_Mask'] == 0b000000111111
+    assert facts.loc[(2023, 'A3'), 'Months_Mask'] == 0b111111111000
+
+    total = analyzer.calculate_fte_metrics()['total'].set_index('Year')
+
+    # 2022: 12 + 6 months, A2 leaves in June; 2023: 12 + 9 months, A3 enters in April
+    assert total.loc[2022, 'Staff_Count'] == 2
+    assert total.loc[2022, 'FTE'] == pytest.approx(18 / 12)
+    assert total.loc[2022, 'Average_Months_Worked'] == pytest.approx(9.0)
+    assert (total.loc[2022, 'Entries'], total.loc[2022, 'Exits']) == (0, 1)
+    assert total.loc[2023, 'FTE'] == pytest.approx(21 / 12)
+    assert (total.loc[2023, 'Entries'], total.loc[2023, 'Exits']) == (1, 0)
+
+    by_ministry = analyzer.fte_metrics['by_ministry'].set_index(['Year', 'Ministry'])
+    assert by_ministry.loc[(2023, 'Ministere Y'), 'FTE'] == pytest.approx(9 / 12)
+
+
+def test_results_are_memoized_until_the_data_changes(analyzer):
+    staff = analyzer.calculate_staff_evolution()
+    assert staff['total'].set_index('Year')['Staff_Count'].to_dict() == {2022: 2, 2023: 2}
+
+    assert analyzer.calculate_staff_evolution() is staff
+    assert analyzer.results.stats['staff_evolution'] == {'computed': 1, 'reused': 1}
+
+    # Same content in a new object: the aggregates are not recomputed
+    analyzer.main_data = analyzer.main_data.copy()
+    assert analyzer.calculate_staff_evolution() is staff
+
+    # Agent A3 removed: recomputed
+    analyzer.main_data = analyzer.main_data[analyzer.main_data['Id_agent'] != 'A3']
+    staff = analyzer.calculate_staff_evolution()
+    assert staff['total'].set_index('Year')['Staff_Count'].to_dict() == {2022: 2, 2023: 1}
+    assert analyzer.results.stats['staff_evolution']['computed'] == 2
+
+
+def test_restored_analyzer_reloads_the_lines(analyzer):
+    analyzer.summarize_dataset()
+    analyzer.calculate_staff_evolution()
+    analyzer.calculate_salary_mass()
+    analyzer.analyze_allowances()
+    expected = analyzer.calculate_fte_metrics()['total']
+
+    restored = SalaryAnalyzer(data_directory=analyzer.data_dir)
+    assert restored.restore_aggregates()
+    assert restored.main_data is None
+
+    fte = restored.calculate_fte_metrics()['total']
+
+    pd.testing.assert_frame_equal(fte, expected)
+    assert len(restored.main_data) == len(analyzer.main_data)
+    assert set(restored.merge_data_with_nomenclature()['Ministry']) == {'Ministere X', 'Ministere Y'}
+
+
+def test_service_names_are_matched_within_their_ministry(tmp_path):
+    # A1 (Ministere X) and A3 (Ministere Y) are both in unit 1/1/1
+    write_dataset(tmp_path)
+    pd.DataFrame({
+        'Ministry': ['Ministere X', 'Ministere Y'], 'Dire': [1, 1], 'Sdir': [1, 1], 'Serv': [1, 1],
+        'Libelle': ['Service X', 'Service Y']
+    }).to_csv(tmp_path / 'table_organigramme_5_ministeres.cleaned.txt', sep=';', index=False)
+    analyzer = SalaryAnalyzer(data_directory=tmp_path)
+    assert analyzer.load_and_clean_data()
+
+    services = analyzer.build_org_hierarchy()['service'].set_index(['Year', 'Ministry'])
+
+    assert len(services) == 3
+    assert services.loc[(2022, 'Ministere X'), 'Unit_Name'] == 'Service X'
+    assert services.loc[(2023, 'Ministere X'), 'Salary_Mass'] == pytest.approx(1440.0)
+    assert services.loc[(2023, 'Ministere Y'), 'Unit_Name'] == 'Service Y'
+    assert services.loc[(2023, 'Ministere Y'), 'Salary_Mass'] == pytest.approx(1800.0)
+
+
+def test_compare_governorates(analyzer):
+    comparison = analyzer.compare_governorates().set_index(['Year', 'Governorate'])
+
+    # 2022: A1 (1210) in governorate 11, A2 (600) in 12; 2023: A1 (1440) in 11, A3 (1800) in 12
+    assert comparison['Salary_Mass'].to_dict() == pytest.approx(
+        {(2022, 11): 1210.0, (2022, 12): 600.0, (2023, 11): 1440.0, (2023, 12): 1800.0})
+    assert (comparison['Staff_Count'] == 1).all()
+    assert comparison.loc[(2022, 11), 'Salary_Mass_Share'] == pytest.approx(1210 / 1810 * 100)
+    assert comparison.loc[(2022, 11), 'Salary_Mass_Rank'] == 1
+    assert comparison.loc[(2023, 11), 'Salary_Mass_Rank'] == 2
+    assert comparison.loc[(2023, 12), 'Average_Salary_Per_Agent'] == pytest.approx(1800.0)
+
+    delegations = analyzer.query(['Year', 'Credit_Delegation'], ['sum_amount', 'distinct_agents'], years=2023)
+    assert len(delegations) == 1
+    assert delegations.iloc[0, 1:].tolist() == pytest.approx([40, 3240.0, 2])
+
+
+def test_shift_share_effects_add_up_to_the_change(analyzer):
+    decomposition = analyzer.decompose_salary_mass_change(2022, 2023)
+
+    # Two agents both years; A1 moves from grade 100 to 101, A2 (grade 100)
+    # is replaced by A3 (grade 102): a pure grade mix change of 3240 - 1810
+    total = decomposition['total'].iloc[0]
+    assert total['Salary_Mass_Change'] == pytest.approx(1430.0)
+    assert total['Headcount_Effect'] == pytest.approx(0.0)
+    assert total['Grade_Mix_Effect'] == pytest.approx(1430.0)
+    assert total['Average_Pay_Effect'] == pytest.approx(0.0, abs=1e-9)
+
+    effects = ['Headcount_Effect', 'Grade_Mix_Effect', 'Average_Pay_Effect']
+    for table in decomposition.values():
+        assert np.allclose(table[effects].sum(axis=1), table['Salary_Mass_Change'])
+    by_ministry = decomposition['by_ministry'].set_index('Ministry')['Salary_Mass_Change']
+    assert by_ministry.to_dict() == pytest.approx({'Ministere X': -370.0, 'Ministere Y': 1800.0})
+
+
+def test_budget_execution_keeps_unknown_imputations(tmp_path):
+    # Unknown grade (no ministry) in March 2022, blank Par in May 2023
+    lines = base_lines() + [
+        payroll_line('A4', 2022, 3, 50.0, 999, 200),
+        payroll_line('A1', 2023, 5, 30.0, 101, 200, par=None)
+    ]
+    analyzer = SalaryAnalyzer(data_directory=write_dataset(tmp_path, lines))
+    assert analyzer.load_and_clean_data()
+
+    execution = analyzer.build_budget_execution()
+
+    paid = analyzer.main_data.groupby('Annee')['Montind'].sum()
+    assert paid.to_dict() == pytest.approx({2022: 1860.0, 2023: 3270.0})
+    for table in execution.values():
+        year_end = table[table['Month'] == 12].groupby('Year')['Cumulative_Amount'].sum()
+        assert year_end.to_dict() == pytest.approx(paid.to_dict())
+    assert analyzer.budget_consumption(2022, start_month=3, end_month=3) == pytest.approx(250.0)
+
+
+def test_renamed_grade_is_labelled_as_of_the_date(tmp_path):
+    # Grade 100 is renamed on 2022-09-01; A2 is paid on grade 100 in January 2023 too
+    grades = [(100, 0, 1, 'Grade Old', 'GO', 'Ministere X', None, '2022-08-31'),
+              (100, 0, 1, 'Grade New', 'GN', 'Ministere X', '2022-09-01', None)]
+    grades += [grade + (None, None) for grade in GRADES[1:]]
+    lines = base_lines() + [payroll_line('A2', 2023, 1, 100.0, 100, 200)]
+    analyzer = SalaryAnalyzer(data_directory=write_dataset(tmp_path, lines, grades=grades))
+    assert analyzer.load_and_clean_data()
+
+    by_grade = analyzer.calculate_fte_metrics()['by_grade'].set_index(['Year', 'Grade'])
+    merged = analyzer.merge_data_with_nomenclature()
+
+    # Agent-year rows take the label valid on July 1st of their year
+    assert by_grade.loc[(2022, 'Grade Old'), 'Staff_Count'] == 2
+    assert (2022, 'Grade New') not in by_grade.index
+    assert by_grade.loc[(2023, 'Grade New'), 'Staff_Count'] == 1
+    # Payroll lines take the label valid at their pay date
+    a1 = merged[(merged['Id_agent'] == 'A1') & (merged['Annee'] == 2022) & (merged['Type'] == 1)]
+    assert a1.set_index('Mois')['Grade_Name_FR'].to_dict() == {
+        month: 'Grade Old' if month <= 8 else 'Grade New' for month in range(1, 13)}
+    assert len(merged) == len(analyzer.main_data)
+
+
+def test_nested_stages_keep_the_outer_peak(analyzer, monkeypatch):
+    resets = []
+    monkeypatch.setattr('salary_analyzer.reset_peak_memory', lambda: resets.append(True))
+
+    with analyzer._memory_stage('outer'):
+        with analyzer._memory_stage('inner'):
+            pass
+        with analyzer._memory_stage('inner'):
+            pass
+
+    assert len(resets) == 1
+    assert {'outer', 'inner'} <= set(analyzer.memory_profile)
+    assert analyzer._stage_depth == 0
+
+
+def test_query_filters_and_measures(analyzer):
+    by_ministry = analyzer.query(['Year', 'Ministry'], ['sum_amount', 'line_count', 'distinct_agents'])
+    filtered = analyzer.query(['Grade'], ['sum_amount', 'line_count'],
+                              filters={'Corps': 'Corps A', 'Type': [1]}, years=[2022, 2023])
+    total = analyzer.query(measures=['sum_amount'], years=2022)
+
+    assert by_ministry.set_index(['Year', 'Ministry']).loc[(2022, 'Ministere X')].tolist() == \
+        pytest.approx([1810.0, 19, 2])
+    assert by_ministry.set_index(['Year', 'Ministry']).loc[(2023, 'Ministere Y')].tolist() == \
+        pytest.approx([1800.0, 9, 1])
+    # Corps A, salary lines only: A1 and A2 on grade A, A1 on grade B (without the June allowance)
+    assert filtered.set_index('Grade').to_dict('index') == {
+        'Grade A': {'sum_amount': 1800.0, 'line_count': 18},
+        'Grade B': {'sum_amount': 1440.0, 'line_count': 12}
+    }
+    assert total['sum_amount'].tolist() == pytest.approx([1810.0])
+
+
+@pytest.mark.parametrize('arguments', [
+    {'dimensions': ['Region']},
+    {'measures': ['average_amount']},
+    {'measures': []},
+    {'filters': {'Region': 1}},
+    {'dimensions': ['Codind'], 'measures': ['distinct_agents']}
+])
+def test_query_rejects_unknown_names(analyzer, arguments):
+    with pytest.raises(ValueError):
+        analyzer.query(**arguments)
+
+
+def test_query_cache_is_bounded_and_follows_the_data(analyzer):
+    analyzer.query_cache_size = 2
+    first = analyzer.query(['Year'])
+    analyzer.query(['Ministry'])
+    analyzer.query(['Year'])  # most recently used again
+    analyzer.query(['Grade'])
+
+    # ['Ministry'] was the least recently used entry
+    cached = [key[1] for key in analyzer._query_cache]
+    assert cached == [('Year',), ('Grade',)]
+
+    # Released lines: answered from the cache of the same cube
+    analyzer.release_data()
+    pd.testing.assert_frame_equal(analyzer.query(['Year']), first)
+    assert analyzer.main_data is None
+
+    # Changed lines: new cube, new answer
+    analyzer.main_data = analyzer._payroll_lines()
+    analyzer.main_data = analyzer.main_data[analyzer.main_data['Id_agent'] != 'A3']
+    assert analyzer.query(['Year']).set_index('Year')['sum_amount'].to_dict() == \
+        pytest.approx({2022: 1810.0, 2023: 1440.0})
+
+
+def test_drill_down_the_organisation_tree(tmp_path):
+    # A2 moved to direction 2, sub-direction 1, service 3 of Ministere X
+    lines = [line for line in base_lines() if line[-1] != 'A2']
+    lines += [payroll_line('A2', 2022, month, 100.0, 100, 200, dire=2, serv=3) for month in range(1, 7)]
+    analyzer = SalaryAnalyzer(data_directory=write_dataset(tmp_path, lines))
+    assert analyzer.load_and_clean_data()
+
+    ministries = analyzer.drill_down().set_index(['Ministry', 'Year'])
+    directions = analyzer.drill_down('Ministere X', years=2022).set_index('Dire')
+    services = analyzer.drill_down('Ministere X', 2, 1)
+
+    assert ministries['Salary_Mass'].to_dict() == pytest.approx({
+        ('Ministere X', 2022): 1810.0, ('Ministere X', 2023): 1440.0, ('Ministere Y', 2023): 1800.0})
+    assert directions['Salary_Mass'].to_dict() == pytest.approx({1: 1210.0, 2: 600.0})
+    assert directions['Staff_Count'].to_dict() == {1: 1, 2: 1}
+    # Leaf level: the services of a sub-direction
+    assert services[['Year', 'Serv', 'Salary_Mass', 'Staff_Count', 'Allowance_Count']].values.tolist() == \
+        [[2022, 3, 600.0, 1, 6]]
+
+
+def test_drill_down_unknown_and_incomplete_nodes(analyzer):
+    assert analyzer.drill_down('Ministere Z').empty
+    assert analyzer.drill_down('Ministere X', 9, 9).empty
+    assert analyzer.drill_down('Ministere Y', years=2022).empty
+
+    with pytest.raises(ValueError):
+        analyzer.drill_down(direction=1)
+
+
+def test_budget_execution_pace_of_a_partial_year(tmp_path):
+    # 2023 paid up to June only: A1 at 120 a month
+    lines = [line for line in base_lines() if line[2] == 2022]
+    lines += [payroll_line('A1', 2023, month, 120.0, 101, 200) for month in range(1, 7)]
+    analyzer = SalaryAnalyzer(data_directory=write_dataset(tmp_path, lines))
+    assert analyzer.load_and_clean_data()
+
+    pace = analyzer.budget_execution_pace(2023, 'Ministere X').set_index('Month')
+
+    # Year-to-date from the prefix sums
+    assert analyzer.budget_consumption(2023, 'Ministere X', end_month=6) == pytest.approx(720.0)
+    assert analyzer.budget_consumption(2023, 'Ministere X', 10, 20, start_month=3, end_month=5) == \
+        pytest.approx(360.0)
+    assert pace.loc[6, 'Cumulative_Amount'] == pytest.approx(720.0)
+    assert pace.loc[12, 'Cumulative_Amount'] == pytest.approx(720.0)
+    # 2022 had paid 1210 of its 1810 by the end of June
+    assert pace.loc[6, 'Previous_Years_Average_Share'] == pytest.approx(1210 / 1810 * 100)
+    assert pace.loc[6, 'Share_Of_Previous_Year_Total'] == pytest.approx(720 / 1810 * 100)
+    assert pace.loc[6, 'Pace_Ratio'] == pytest.approx(720 / 1210)
+    assert pace.loc[6, 'Projected_Year_End'] == pytest.approx(720 * 1810 / 1210)
+    assert pace.loc[12, 'Projected_Year_End'] == pytest.approx(720.0)
+
+    first_year = analyzer.budget_execution_pace(2022, 'Ministere X')
+    assert first_year['Projected_Year_End'].isna().all()
+
+
+def test_forecast_options_recompute_the_global_comparison(analyzer):
+    analyzer.compare_global_model(horizon=1)
+    analyzer.compare_global_model(horizon=1)
+    assert analyzer.results.stats['global_comparison'] == {'computed': 1, 'reused': 1}
+
+    analyzer.set_forecast_time_budget(60)
+    analyzer.compare_global_model(horizon=1)
+    analyzer.set_forecast_time_budget(60)
+    analyzer.compare_global_model(horizon=1)
+
+    # Setting the same budget again keeps the result
+    assert analyzer.results.stats['global_comparison'] == {'computed': 2, 'reused': 2}